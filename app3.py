@@ -1,110 +1,60 @@
+import time
+_inicio_execucao = time.perf_counter()
+
 import streamlit as st
 import streamlit_authenticator as stauth
 import pandas as pd
-import re
 from datetime import datetime
-import yaml
-from yaml.loader import SafeLoader
-import os
-import matplotlib.pyplot as plt
-from supabase import create_client, Client
-
-import unicodedata
-
-
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
-def carregar_historico(username):
-    resp = supabase.table("lancamentos").select("*").eq("usuario", str(username)).execute()
-    df = pd.DataFrame(resp.data)
-
-    if df.empty:
-        return pd.DataFrame(columns=["Banco", "Data", "Tipo Lançamento", "Descrição", "Valor", "Tag"])
-
-    # Renomeia corretamente as colunas vindas do Supabase para as colunas do seu DataFrame
-    df = df.rename(columns={
-        "banco": "Banco",
-        "data": "Data",
-        "tipo_lancamento": "Tipo Lançamento",
-        "descricao": "Descrição",
-        "valor": "Valor",
-        "tag": "Tag"
-    })
-
-    # Converte a coluna Data para datetime
-    df["Data"] = pd.to_datetime(df["Data"], errors="coerce")
-
-    # Retorna as colunas na ordem desejada
-    return df[["Banco", "Data", "Tipo Lançamento", "Descrição", "Valor", "Tag"]]
-
-def salvar_lancamentos(username, df):
-    for _, row in df.iterrows():
-        # Pula linhas com valor NaN para evitar problemas de serialização JSON
-        if pd.isna(row["Valor"]):
-            continue
-        # Corrige o formato da coluna Valor para salvar corretamente
-        valor_str = str(row["Valor"]).replace("R$", "").replace(".", "").replace(",", ".").strip()
-        try:
-            valor_float = float(row["Valor"])
-        except (ValueError, TypeError):
-            valor_float = 0.0
-
-        # Corrige o formato da coluna Data para salvar corretamente, tratando datas inválidas
-        data_correta = pd.to_datetime(row["Data"], format='%d/%m/%Y', errors="coerce")
-
-        # Se a data for inválida (NaT), substitui pela data atual
-        if pd.isna(data_correta):
-            data_correta = datetime.today().date()
-        else:
-            data_correta = data_correta.date()
-
-        data = {
-            "usuario": username,
-            "banco": row["Banco"],
-            "data": str(data_correta),
-            "tipo_lancamento": row["Tipo Lançamento"],
-            "descricao": row["Descrição"],
-            "valor": valor_float,
-            "tag": row.get("Tag", "Outros")
-        }
-        supabase.table("lancamentos").insert(data).execute()
-
-
-CONFIG_PATH = "config.yaml"
-
-def load_config():
-    if os.path.exists(CONFIG_PATH):
-        with open(CONFIG_PATH) as file:
-            return yaml.load(file, Loader=SafeLoader)
-    else:
-        config = {
-            "credentials": { "usernames": {}},
-            "cookie": {"expiry_days": 30, "key": "abcdef", "name": "app_financas"}
-        }
-        with open(CONFIG_PATH, "w") as file:
-            yaml.dump(config, file)
-        return config
-
-def save_config(config):
-    with open(CONFIG_PATH, "w") as file:
-        yaml.dump(config, file)
+import uuid
+
+from categorizacao import CATEGORIAS
+from regras import carregar_regras_usuario, salvar_regras_usuario, pares_descricao_tag
+from similaridade import IndiceSimilaridade
+from importacao import importar_arquivos
+from banco_dados import (
+    armazenamento, chaves_deduplicacao, marcar_ja_importados, reenviar_lotes, salvar_lancamentos,
+    diferencas_historico, salvar_edicao_historico, resumir_historico
+)
+from cache_local import sincronizar_historico, registrar_edicao, descartar_cache, filtrar_carga
+from resumos import ResumoMensal, resumir_linhas, totais, gastos_por_tag, receitas_despesas_por_mes
+from filtros import FiltroHistorico
+from exibicao import TAMANHOS_PAGINA, formatar_reais, formatar_datas, formatar_lancamentos, total_paginas, pagina
+from instrumentacao import iniciar, etapa, finalizar
+from compactacao import CENTAVOS, unir_historicos, valores_em_reais, valores_em_centavos, memoria_em_bytes
+from sessao_dados import guardar_quadro, obter_quadro, descartar_quadro, uso_sessao
+from credenciais import carregar_config, cadastrar_usuario, gerar_hash, limitar_verificacao
+# O matplotlib (via graficos.py) só é importado quando algum gráfico é desenhado
+
+# Tempo gasto com imports nesta execução (na primeira execução do processo, inclui carregar as bibliotecas)
+TEMPO_IMPORTS = time.perf_counter() - _inicio_execucao
+
+# Cópias de DataFrame só são feitas quando uma delas é alterada (evita .copy() defensivos)
+pd.set_option("mode.copy_on_write", True)
 
 st.set_page_config(page_title="Relatório Financeiro Multi-Banco", layout="wide")
-config = load_config()
+# Medições desta execução; o modo detalhado (bytes e pico de memória) acompanha o painel de desempenho
+medicoes = iniciar(detalhado=st.session_state.get("painel_desempenho", False))
+medicoes.somar("imports", TEMPO_IMPORTS)
+config = carregar_config()
 
-authenticator = stauth.Authenticate(
+# A verificação da senha (bcrypt) respeita o limite do processo (ver credenciais.py)
+authenticator = limitar_verificacao(stauth.Authenticate(
     config['credentials'],
     config['cookie']['name'],
     config['cookie']['key'],
     config['cookie']['expiry_days']
-)
+))
 
 try:
     authenticator.login()
 except Exception as e:
     st.error(e)
+
+# Tempos da primeira execução da sessão: imports e primeira tela (login) pronta
+if "tempos_inicio" not in st.session_state:
+    st.session_state["tempos_inicio"] = {"imports": TEMPO_IMPORTS, "primeira_tela": time.perf_counter() - _inicio_execucao}
+tempos_inicio = st.session_state["tempos_inicio"]
+st.sidebar.caption(f"Início: imports {tempos_inicio['imports'] * 1000:.0f} ms, primeira tela {tempos_inicio['primeira_tela'] * 1000:.0f} ms")
     
 if st.session_state.get('authentication_status'):
 
@@ -114,316 +64,246 @@ if st.session_state.get('authentication_status'):
     st.title("Relatório Financeiro Multi-Banco - Extratos OFX com Categorias e Gráficos")
 
     HISTORICO_PATH = "historico_lancamentos.csv"
-    CATEGORIA_USER_PATH = "categorias_personalizadas.csv"
-
-    def normalizar_descricao(descricao):
-            """
-            Normaliza descrições de extrato removendo datas, horários, o termo 'memo', e padronizando para manter
-            apenas a parte relevante (tipo e beneficiário).
-            Exemplos:
-            "pix  enviado  0205 1020 ipva sefaz rsmemo" -> "pix enviado ipva sefaz rs"
-            "compra com cartao 1505 1930 supermercado memo" -> "compra com cartao supermercado"
-            """
-            
-            if pd.isna(descricao):
-                return ""
-            desc = str(descricao).lower().strip()
-            # Remove acentos
-            desc = unicodedata.normalize('NFKD', desc)
-            desc = "".join([c for c in desc if not unicodedata.combining(c)])
-            # Remove caracteres especiais, exceto espaço
-            desc = re.sub(r'[^a-z0-9\s]', '', desc)
-            # Remove datas e horários (ex: 0205, 1020, 1505, 1930, 20240501, etc)
-            desc = re.sub(r'\b\d{4,8}\b', ' ', desc)   # blocos de 4 a 8 dígitos
-            # Remove padrões de horas/minutos (ex: 10:20, 19:30, 10h20)
-            desc = re.sub(r'\b\d{1,2}[:h]\d{2}\b', ' ', desc)
-            # Remove o termo "memo" isolado ou junto a outros termos
-            desc = re.sub(r'\bmemo\b', ' ', desc)
-            # Remove ocorrências de "rsmemo", "memo", "rs memo", etc
-            desc = re.sub(r'\brs\s*memo\b', ' ', desc)
-            # Remove múltiplos espaços
-            desc = re.sub(r'\s+', ' ', desc)
-            # Remove hífens isolados
-            desc = re.sub(r'\s*-\s*', ' ', desc)
-            # Remove espaços no início e fim
-            desc = desc.strip()
-            # Se sobrar datas/hora, remove de novo
-            desc = re.sub(r'\b\d{4,8}\b', '', desc)
-            # Remove múltiplos espaços novamente
-            desc = re.sub(r'\s+', ' ', desc)
-            return desc
-
-        # Função para limpar descrições do C6, removendo "memo" e "rs memo" após normalizar
-    def limpar_memo_c6(desc):
-        desc = normalizar_descricao(desc)
-        # Remove todas as ocorrências de "rs memo" e "memo" (case-insensitive)
-        desc = re.sub(r'\brs\s*memo\b', ' ', desc, flags=re.IGNORECASE)
-        desc = re.sub(r'\bmemo\b', ' ', desc, flags=re.IGNORECASE)
-        desc = re.sub(r'\s+', ' ', desc)
-        return desc.strip().title()
-
-    def extrair_tipo_e_descricao(descricao):
-        """
-        Extrai o tipo de lançamento e a descrição de um campo de descrição de extrato, de forma resiliente para bancos diferentes.
-        - Se o campo estiver vazio ou só tiver hífens/espaços, retorna ("Outros", "").
-        - Se não houver hífen, ou não houver partes válidas após split, retorna ("Outros", "").
-        - Limpa datas/horas do início da descrição.
-        - Aplica normalização e iniciais maiúsculas no resultado.
-        """
-        
-        if pd.isna(descricao):
-            return "Outros", ""
-        desc = str(descricao).strip()
-        # Remove tags e marcadores comuns de OFX/MEMO
-        desc = re.sub(r'</?MEMO>', ' ', desc, flags=re.IGNORECASE)
-        desc = re.sub(r'\bmemo\b', ' ', desc, flags=re.IGNORECASE)
-        desc = re.sub(r'\s+', ' ', desc).strip()
-        # Se o campo for vazio ou só hífens ou só espaços, retorna Outros
-        if not desc or re.fullmatch(r'-+\s*', desc) or re.fullmatch(r'\s*-+\s*', desc):
-            return "Outros", ""
-        # Procura todos os hífens (pode estar rodeado de espaços)
-        hifens = list(re.finditer(r'\s*-\s*', desc))
-        tipo = ""
-        descricao_restante = ""
-        if len(hifens) >= 2:
-            # Dois ou mais hífens: tipo é até o segundo hífen, descrição é o resto
-            tipo = desc[:hifens[1].start()].replace('-', ' ').strip()
-            descricao_restante = desc[hifens[1].end():].strip()
-        elif len(hifens) == 1:
-            # Apenas um hífen: tipo é antes do hífen, descrição é depois
-            tipo = desc[:hifens[0].start()].strip()
-            descricao_restante = desc[hifens[0].end():].strip()
-        else:
-            # Não há hífen: usa a primeira palavra como tipo, o resto como descrição
-            partes = desc.split()
-            # Se não há partes válidas, retorna Outros
-            if not partes:
-                return "Outros", ""
-            # Se só há uma palavra, mas ela é só hífen, retorna Outros
-            if len(partes) == 1:
-                if re.fullmatch(r'-+', partes[0]):
-                    return "Outros", ""
-                tipo = partes[0]
-                descricao_restante = ""
-            else:
-                tipo = partes[0]
-                descricao_restante = " ".join(partes[1:])
-        # Se tipo for vazio ou só hífens, retorna Outros
-        if not tipo or re.fullmatch(r'-+', tipo):
-            return "Outros", ""
-        # Limpa datas/horas do início da descrição
-        if descricao_restante:
-            # Remove datas e horas do início (ex: 0205, 1020, 20240501, 10:20, 10h20, etc)
-            descricao_restante = re.sub(r"^(\d{4,8}\s*)+", "", descricao_restante)
-            descricao_restante = re.sub(r"^(\d{1,2}[:h]\d{2}\s*)+", "", descricao_restante)
-            descricao_restante = re.sub(r'^\s+', '', descricao_restante)
-        # Normaliza tipo e descrição
-        tipo = normalizar_descricao(tipo)
-        descricao_restante = normalizar_descricao(descricao_restante)
-        # Se após normalizar o tipo ficou vazio ou só hífens, retorna Outros
-        if not tipo or re.fullmatch(r'-+', tipo):
-            return "Outros", ""
-        # Inicial maiúscula em cada palavra
-        tipo_fmt = tipo.title()
-        descricao_fmt = descricao_restante.title()
-        return tipo_fmt, descricao_fmt
-
-    def carregar_regras_usuario():
-        if os.path.exists(CATEGORIA_USER_PATH):
-            df_regras = pd.read_csv(CATEGORIA_USER_PATH)
-            # Normaliza as descrições ao carregar
-            df_regras['descricao'] = df_regras['descricao'].apply(normalizar_descricao)
-            return dict(zip(df_regras['descricao'], df_regras['tag']))
-        else:
-            return {}
-
-    def salvar_regras_usuario(df):
-        # Extrai pares únicos descrição-tag do dataframe e salva
-        df_regras = df[['Tipo Lançamento', 'Descrição', 'Tag']].drop_duplicates()
-        df_regras['descricao'] = (df_regras['Tipo Lançamento'].fillna('') + " " + df_regras['Descrição'].fillna('')).str.strip()
-        df_regras['descricao'] = df_regras['descricao'].apply(normalizar_descricao)
-        df_regras = df_regras[['descricao', 'Tag']]
-        df_regras.columns = ['descricao', 'tag']
-        df_regras.to_csv(CATEGORIA_USER_PATH, index=False)
-
-    CATEGORIAS = {
-        "aluguel": "Aluguel",
-        "imovel": "Aluguel",
-        "supermercado": "Mercado",
-        "mercado": "Mercado",
-        "padaria": "Mercado",
-        "farmacia": "Saúde",
-        "droga": "Saúde",
-        "hospital": "Saúde",
-        "consultorio": "Saúde",
-        "saude": "Saúde",
-        "bb rende fácil": "Investimento Automático",
-        "bb rf ref di": "Investimento Automático",
-        "rende facil": "Investimento Automático",
-        "depósito online taa": "Depósito Caixa Eletrônico",
-        "atm": "Depósito Caixa Eletrônico",
-        "samantha treib": "Pensão",
-        "rge": "Energia Elétrica",
-        "ebanx": "Lazer",
-        "pix - recebido": "PIX Recebimento",
-        "comercial zaffari": "Mercado",
-        "telecom": "Internet",
-        "pet": "Pet-Shop",
-        "impostos": "Impostos",
-        "posto": "Veículo",
-        "seguros": "Seguros",
-        "seguro": "Seguros",
-        "tarifa": "Tarifa",
-        "não identificado": "Não identificado",
-        "compras": "Compras",
-        "desenvolvimento h": "Saúde",
-        "regis gruber leivas": "Mesada",
-        "colegio maua": "Educacao",
-        "transferência entre contas": "Transferência Pessoal",
-        "empréstimo": "Empréstimo",
-        "vestuário": "Vestuário",
-        "borba imoveis": "Aluguel",
-        "manutencao": "Manutenção"
-    }
 
     BANCOS = {
         "Banco do Brasil": "BB",
         "C6": "C6"
     }
 
-    def categorizar(descricao, regras_usuario):
-        desc_norm = normalizar_descricao(descricao)
-        # Primeiro verifica regras personalizadas (normalizadas)
-        for chave_desc, categoria in regras_usuario.items():
-            if chave_desc == desc_norm:
-                return categoria
-        # Depois no dicionário fixo
-        for palavra, categoria in CATEGORIAS.items():
-            if palavra in desc_norm:
-                return categoria
-        return "Outros"
-
-    def simple_ofx_to_df(uploaded_file, banco, regras_usuario):
-        content = uploaded_file.read().decode("latin1")
-        trans_blocks = re.findall(r"<STMTTRN>(.*?)</STMTTRN>", content, re.DOTALL)
-        transactions = []
-        banco_nome = str(banco).strip().lower()
-        for block in trans_blocks:
-            date = re.search(r"<DTPOSTED>(\d+)", block)
-            amount = re.search(r"<TRNAMT>(-?\d+\.\d+)", block)
-            # Extração padrão de MEMO
-            desc = re.search(r"<MEMO>(.*)", block)
-            descricao_completa = desc.group(1).strip() if desc else ""
-            # Lógica especial para C6
-            if "c6" in banco_nome:
-                # Extrai também o tipo de transação
-                trntype_match = re.search(r"<TRNTYPE>([A-Z]+)", block)
-                trntype = trntype_match.group(1).upper() if trntype_match else ""
-                memo = descricao_completa.lower()
-                memo_norm = normalizar_descricao(memo)
-                tipo_lanc = ""
-                descricao = ""
-                # Lógica para C6
-                if trntype == "DEBIT":
-                    if "boleto" in memo:
-                        tipo_lanc = "Pagamento De Boleto"
-                        descricao = "Boleto"
-                    elif "fatura" in memo:
-                        tipo_lanc = "Pagamento Fatura Cartão"
-                        descricao = "Fatura Cartão"
-                    elif "pix" in memo or "enviado" in memo:
-                        tipo_lanc = "Pix Enviado"
-                        descricao = limpar_memo_c6(memo)
-                    else:
-                        tipo_lanc = "Compra Com Cartão"
-                        descricao = limpar_memo_c6(memo)
-                elif trntype == "CREDIT":
-                    if "pix" in memo or "recebido" in memo:
-                        tipo_lanc = "Pix Recebido"
-                        descricao = limpar_memo_c6(memo)
-                    else:
-                        tipo_lanc = "Crédito"
-                        descricao = limpar_memo_c6(memo)
-                else:
-                    # fallback para padrão
-                    tipo_lanc, descricao = extrair_tipo_e_descricao(descricao_completa)
-                # Garante maiúsculas e normalização
-                tipo_lanc = normalizar_descricao(tipo_lanc).title()
-                descricao = limpar_memo_c6(descricao)
+    def exibir_resultado_salvamento(resultados):
+        """
+        Mostra o resultado de cada lote enviado e guarda os lotes com falha na sessão,
+        para que possam ser reenviados. Retorna True se todos os lotes foram salvos.
+        """
+        falhas = [r for r in resultados if not r["sucesso"]]
+        salvos = sum(r["gravados"] for r in resultados if r["sucesso"])
+        ignorados = sum(r["quantidade"] - r["gravados"] for r in resultados if r["sucesso"] and r["operacao"] == "deduplicar")
+        if ignorados:
+            st.info(f"{ignorados} lançamentos já estavam no histórico e foram ignorados.")
+        if falhas:
+            st.session_state["lotes_pendentes"] = falhas
+            st.error(f"{len(falhas)} de {len(resultados)} lotes falharam ({salvos} lançamentos salvos).")
+            for falha in falhas:
+                st.write(f"Lote a partir da linha {falha['inicio']} ({falha['quantidade']} lançamentos): {falha['erro']}")
+            return False
+        st.session_state.pop("lotes_pendentes", None)
+        return True
+
+    def exibir_tabela(df, chave):
+        """
+        Mostra lançamentos do histórico uma página por vez: só as linhas da página
+        são formatadas e enviadas ao navegador.
+        """
+        if len(df) > TAMANHOS_PAGINA[0]:
+            col1, col2 = st.columns(2)
+            tamanho = col1.selectbox("Linhas por página", TAMANHOS_PAGINA, key=f"tamanho_{chave}")
+            paginas = total_paginas(len(df), tamanho)
+            numero = col2.number_input(f"Página (de {paginas})", min_value=1, max_value=paginas, value=1, step=1, key=f"pagina_{chave}")
+            df = pagina(df, numero, tamanho)
+        with etapa("renderizar"):
+            st.dataframe(formatar_lancamentos(df))
+
+    # Período e bancos do histórico da sessão, recortados da cópia local do histórico completo
+    st.sidebar.subheader("Histórico carregado")
+    filtros_carga = {}
+    if st.sidebar.checkbox("Carregar apenas um período"):
+        hoje = datetime.today().date()
+        filtros_carga["data_inicio"] = st.sidebar.date_input("De", hoje.replace(year=hoje.year - 1))
+        filtros_carga["data_fim"] = st.sidebar.date_input("Até", hoje)
+    bancos_carga = st.sidebar.multiselect("Bancos carregados", list(BANCOS), default=list(BANCOS))
+    if set(bancos_carga) != set(BANCOS):
+        filtros_carga["bancos"] = bancos_carga
+
+    def obter_historico():
+        """
+        Devolve o histórico do usuário guardado na sessão. Na primeira carga (ou quando muda
+        o usuário/período carregado) o histórico vem da cópia local, sincronizada com o Supabase
+        (ver cache_local.py); depois de uma gravação, só os lançamentos novos são acrescentados,
+        a não ser que algum lançamento tenha sido editado ou excluído fora do app (ou por outra
+        sessão) desde a última sincronização.
+        """
+        username = st.session_state.get("username")
+        cache = st.session_state.get("cache_historico")
+        mesma_carga = cache is not None and cache["usuario"] == username and cache["filtros"] == filtros_carga
+        if not mesma_carga or cache["desatualizado"]:
+            with etapa("carregar"):
+                completo, novos, erro = sincronizar_historico(username)
+            if mesma_carga and novos is not None:
+                novos = filtrar_carga(novos, **filtros_carga)
+                if cache["df"].empty:
+                    cache["df"] = novos
+                elif not novos.empty:
+                    cache["df"] = unir_historicos([cache["df"], novos])
+                cache["resumo"].adicionar(novos)
+                if not novos.empty:
+                    cache["filtro"] = None
+                    if cache["indice_tags"] is not None:
+                        cache["indice_tags"].atualizar(pares_descricao_tag(novos))
+                cache["desatualizado"] = False
+                cache["erro"] = erro
             else:
-                tipo_lanc, descricao = extrair_tipo_e_descricao(descricao_completa)
-            tag = categorizar(tipo_lanc + " " + descricao, regras_usuario)
-            transactions.append({
-                "Banco": banco,
-                "Data": datetime.strptime(date.group(1)[:8], "%Y%m%d") if date else None,
-                "Tipo Lançamento": tipo_lanc,
-                "Descrição": descricao,
-                "Valor": float(amount.group(1)) if amount else 0.0,
-                "Tag": tag
-            })
-        return pd.DataFrame(transactions)
-
-    historico = carregar_historico(st.session_state.get("username"))
-    
-
-    regras_usuario = carregar_regras_usuario()
-
-    uploaded_file = st.file_uploader("Selecione o arquivo OFX", type=["ofx"])
+                # Primeira carga, outro usuário/período, ou lançamentos editados/excluídos desde a
+                # última sincronização: o histórico da sessão é trocado inteiro
+                df = filtrar_carga(completo, **filtros_carga)
+                cache = {"usuario": username, "filtros": dict(filtros_carga), "df": df, "resumo": ResumoMensal(df), "filtro": None, "indice_tags": None, "desatualizado": False, "erro": erro}
+        st.session_state["cache_historico"] = cache
+        return cache["df"]
+
+    def invalidar_historico():
+        # Marca o histórico em cache para buscar os lançamentos gravados desde a última carga
+        if "cache_historico" in st.session_state:
+            st.session_state["cache_historico"]["desatualizado"] = True
+
+    def aplicar_edicao_no_cache(alterados, ids_excluidos, resultados):
+        """
+        Leva a edição salva para o histórico em cache e para a cópia local (registrar_edicao):
+        alterações e exclusões são aplicadas direto no DataFrame e as linhas incluídas (mesmo de
+        lotes com falha) vêm na próxima carga incremental. Se alguma alteração/exclusão não foi
+        gravada ou o banco mostra edições feitas fora desta gravação, descarta os dois para
+        recarregar o histórico inteiro.
+        """
+        username = st.session_state.get("username")
+        editados = sum(r["gravados"] for r in resultados if r["sucesso"] and r["operacao"] in ("atualizar", "excluir"))
+        cache = st.session_state.get("cache_historico")
+        if not registrar_edicao(username, alterados, ids_excluidos, editados) or cache is None:
+            st.session_state.pop("cache_historico", None)
+            descartar_cache(username)
+            return
+        # O resumo mensal troca a versão antiga das linhas pela nova
+        cache["resumo"].remover(cache["df"].loc[cache["df"].index.intersection(list(alterados.index) + list(ids_excluidos))])
+        # Troca as linhas inteiras: atribuir texto novo numa coluna de categoria falharia.
+        # Linhas alteradas que saíram do período/bancos carregados ficam de fora
+        restantes = cache["df"].drop(index=list(alterados.index) + list(ids_excluidos), errors="ignore")
+        na_carga = filtrar_carga(alterados, **filtros_carga)
+        cache["df"] = unir_historicos([restantes, na_carga[restantes.columns]]).sort_index()
+        cache["resumo"].adicionar(cache["df"].loc[na_carga.index])
+        cache["filtro"] = None
+        if cache["indice_tags"] is not None:
+            cache["indice_tags"].atualizar(pares_descricao_tag(alterados))
+        invalidar_historico()
+
+    def obter_filtro_historico():
+        # Índices dos filtros, montados uma vez para cada versão do histórico em cache
+        cache = st.session_state["cache_historico"]
+        if cache["filtro"] is None:
+            with etapa("filtrar"):
+                cache["filtro"] = FiltroHistorico(cache["df"])
+        return cache["filtro"]
+
+    def obter_indice_tags():
+        """
+        Índice de similaridade das descrições já categorizadas no histórico em cache, montado na
+        primeira importação; depois, as linhas gravadas e editadas são acrescentadas a ele.
+        """
+        cache = st.session_state["cache_historico"]
+        if cache["indice_tags"] is None:
+            with etapa("indexar"):
+                cache["indice_tags"] = IndiceSimilaridade(pares_descricao_tag(cache["df"]))
+        return cache["indice_tags"]
+
+    historico = obter_historico()
+    if st.session_state["cache_historico"]["erro"] is not None:
+        st.warning(f"Não foi possível atualizar o histórico pelo Supabase; exibindo a cópia salva localmente. ({st.session_state['cache_historico']['erro']})")
+    st.sidebar.caption(f"Histórico em memória: {len(historico)} lançamentos, {memoria_em_bytes(historico) / 1024 ** 2:.1f} MB")
+
+    # Reenvio apenas dos lotes que falharam no último salvamento
+    if st.session_state.get("lotes_pendentes"):
+        pendentes = st.session_state["lotes_pendentes"]
+        qtd_pendente = sum(lote["quantidade"] for lote in pendentes)
+        st.warning(f"Há {qtd_pendente} lançamentos que não foram salvos no último envio.")
+        if st.button("Reenviar lotes com falha"):
+            resultados = reenviar_lotes(pendentes)
+            invalidar_historico()
+            historico = obter_historico()
+            if exibir_resultado_salvamento(resultados):
+                st.success("Lançamentos pendentes salvos no histórico!")
+
+
+    # Identifica a sessão nos dados guardados fora do session_state (extrato em revisão)
+    if "id_sessao" not in st.session_state:
+        st.session_state["id_sessao"] = uuid.uuid4().hex
+    id_sessao = st.session_state["id_sessao"]
+
+    # Regras do usuário em memória; só são relidas quando outra gravação muda a versão
+    regras_usuario = carregar_regras_usuario(st.session_state.get("username"))
+
+    uploaded_files = st.file_uploader("Selecione os arquivos OFX", type=["ofx"], accept_multiple_files=True)
     banco = st.selectbox(
         "Selecione o banco:",
         help="Escolha um banco dentre os dispníveis",
         options=BANCOS
         )
+    # Com vários arquivos, cada um pode ser de um banco diferente
+    bancos_arquivos = [banco] * len(uploaded_files)
+    if len(uploaded_files) > 1:
+        with st.expander("Banco de cada arquivo"):
+            for i, arquivo in enumerate(uploaded_files):
+                bancos_arquivos[i] = st.selectbox(arquivo.name, options=BANCOS, index=list(BANCOS).index(banco), key=f"banco_arquivo_{i}")
     visualizar_btn = st.button("Revisar Lançamentos")
 
-    if visualizar_btn and uploaded_file and banco:
-        df = simple_ofx_to_df(uploaded_file, banco, regras_usuario)
-        st.session_state["df_novo_extrato"] = df
-        st.session_state["df_novo_extrato_raw"] = df.copy()
+    if visualizar_btn and uploaded_files and banco:
+        arquivos = [(arquivo.name, arquivo.getvalue(), banco_arquivo) for arquivo, banco_arquivo in zip(uploaded_files, bancos_arquivos)]
+        df, relatorio = importar_arquivos(arquivos, regras_usuario, indice=obter_indice_tags())
+        for item in relatorio:
+            if item["erro"]:
+                st.error(f"Erro ao importar {item['arquivo']}: {item['erro']}")
+        if len(relatorio) > 1:
+            st.dataframe(pd.DataFrame(relatorio))
+        # Marca os lançamentos que já estão no histórico (reimportação de extratos sobrepostos)
+        with etapa("deduplicar"):
+            # A chave conta as repetições no extrato inteiro: é calculada antes de tirar os já importados
+            df["Chave"] = chaves_deduplicacao(st.session_state.get("username"), df)
+            df["Já Importado"] = marcar_ja_importados(st.session_state.get("username"), df)
+        # Uma cópia só do extrato, guardada fora do session_state com limite de memória (ver sessao_dados.py)
+        guardar_quadro(id_sessao, "novo_extrato", df)
         st.subheader("Lançamentos deste extrato")
         # A edição do DataFrame será feita abaixo, fora deste bloco, junto ao controle de salvamento
     # CONTROLE DE SALVAMENTO DE LANÇAMENTOS DO EXTRATO - AGORA FORA DO IF DE REVISÃO
-    if "df_novo_extrato" in st.session_state:
-        df = st.session_state["df_novo_extrato"]
-        df_raw = st.session_state["df_novo_extrato_raw"]
-        # Sincroniza a coluna "Valor" do df com os valores numéricos corretos de df_raw antes de exibir para edição
-        df["Valor"] = df_raw["Valor"]
-        # Função para formatar valor para exibição
-        def formatar_valor(x):
-            try:
-                # Garante que o valor é float antes de formatar
-                x_float = float(x)
-                return f"R$ {x_float:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-            except:
-                return x
-
-        df["Valor"] = pd.to_numeric(df["Valor"], errors="coerce")
-        df["Valor"] = df["Valor"].apply(formatar_valor)
-        # Formata a coluna Data para DD-MM-YYYY de maneira mais segura
-        df["Data"] = pd.to_datetime(df["Data"], dayfirst=True, errors="coerce")
-        df["Data"] = df["Data"].apply(lambda x: x.strftime("%d/%m/%Y") if pd.notnull(x) else "")
+    df_raw = obter_quadro(id_sessao, "novo_extrato")
+    if df_raw is not None:
+        # Versão de exibição montada a cada execução, com Valor e Data formatados (a coluna inteira de uma vez);
+        # as demais colunas são compartilhadas com df_raw, e as edições ficam no estado do próprio editor
+        df = df_raw.assign(Valor=formatar_reais(df_raw["Valor"]), Data=formatar_datas(df_raw["Data"], dayfirst=True))
         # Mantém edição se usuário alterar tags/tipos
         all_tags = list(set(historico["Tag"].dropna().tolist() + list(CATEGORIAS.values()) + ["Outros"]))
         all_tipos = list(set(historico["Tipo Lançamento"].dropna().tolist()))
-        df = st.data_editor(
-            df,
-            column_config={
-                "Tag": st.column_config.SelectboxColumn(
-                    "Tag",
-                    help="Categoria da despesa/receita",
-                    options=all_tags,
-                    required=True,
-                ),
-                "Tipo Lançamento": st.column_config.TextColumn(
-                    "Tipo Lançamento",
-                    help="Tipo do lançamento extraído da descrição",
-                    disabled=False,
-                ),
-            },
-            num_rows="dynamic",
-            key="novo_extrato_editor"
-        )
-        st.session_state["df_novo_extrato"] = df
+        with etapa("editor"):
+            df = st.data_editor(
+                df,
+                column_config={
+                    "Tag": st.column_config.SelectboxColumn(
+                        "Tag",
+                        help="Categoria da despesa/receita",
+                        options=all_tags,
+                        required=True,
+                    ),
+                    "Tipo Lançamento": st.column_config.TextColumn(
+                        "Tipo Lançamento",
+                        help="Tipo do lançamento extraído da descrição",
+                        disabled=False,
+                    ),
+                    "Confiança": st.column_config.ProgressColumn(
+                        "Confiança",
+                        help="Tag sugerida pelos lançamentos já categorizados mais parecidos, com esta confiança",
+                        min_value=0.0,
+                        max_value=1.0,
+                        format="%.2f",
+                    ),
+                    "Já Importado": st.column_config.CheckboxColumn(
+                        "Já Importado",
+                        help="Lançamento já salvo no histórico; não será salvo novamente",
+                        disabled=True,
+                    ),
+                    "Conta": st.column_config.TextColumn("Conta", disabled=True),
+                    "FITID": None,
+                    "Chave": None,
+                },
+                num_rows="dynamic",
+                key="novo_extrato_editor"
+            )
+        qtd_ja_importados = int(df_raw["Já Importado"].sum()) if "Já Importado" in df_raw.columns else 0
+        if qtd_ja_importados:
+            st.info(f"{qtd_ja_importados} lançamentos deste extrato já estão no histórico e não serão salvos novamente.")
 
         # Controle do fluxo de salvamento
         if "salvar_novo_extrato" not in st.session_state:
@@ -440,44 +320,56 @@ if st.session_state.get('authentication_status'):
                 # Atualiza os campos editáveis no df_raw antes de salvar
                 df_raw["Tag"] = df["Tag"]
                 df_raw["Tipo Lançamento"] = df["Tipo Lançamento"]
-                salvar_lancamentos(st.session_state.get("username"), df_raw)
-                historico = carregar_historico(st.session_state.get("username"))
-                salvar_regras_usuario(historico)
-                st.success("Lançamentos salvos no histórico! Atualize a página para visualizar o consolidado.")
+                if "Já Importado" in df_raw.columns:
+                    df_raw = df_raw[~df_raw["Já Importado"].fillna(False).astype(bool)]
+                with etapa("salvar"):
+                    resultados = salvar_lancamentos(st.session_state.get("username"), df_raw)
+                invalidar_historico()
+                historico = obter_historico()
+                # Só os pares descrição-tag dos lançamentos deste extrato são levados às regras
+                salvar_regras_usuario(st.session_state.get("username"), df_raw)
+                if exibir_resultado_salvamento(resultados):
+                    st.success("Lançamentos salvos no histórico! Atualize a página para visualizar o consolidado.")
                 st.session_state["salvar_novo_extrato"] = False
-                del st.session_state["df_novo_extrato"]
-                if "df_novo_extrato_raw" in st.session_state:
-                    del st.session_state["df_novo_extrato_raw"]
+                descartar_quadro(id_sessao, "novo_extrato")
             if col2.button("Cancelar salvamento", key="cancela_salva"):
                 st.session_state["salvar_novo_extrato"] = False
-                if "df_novo_extrato" in st.session_state:
-                    del st.session_state["df_novo_extrato"]
-                if "df_novo_extrato_raw" in st.session_state:
-                    del st.session_state["df_novo_extrato_raw"]
+                descartar_quadro(id_sessao, "novo_extrato")
+    uso_revisao = uso_sessao(id_sessao)
+    if uso_revisao["quadros"]:
+        st.sidebar.caption(
+            f"Extrato em revisão: {uso_revisao['memoria'] / 1024 ** 2:.1f} MB em memória, "
+            f"{uso_revisao['disco'] / 1024 ** 2:.1f} MB em disco"
+        )
     st.header("Histórico Consolidado de Lançamentos")
     if not historico.empty:
         editar_hist = st.checkbox("Editar histórico de lançamentos")
         if editar_hist:
             all_tags = list(set(historico["Tag"].dropna().tolist() + list(CATEGORIAS.values()) + ["Outros"]))
             all_tipos = list(set(historico["Tipo Lançamento"].dropna().tolist()))
-            historico_edit = st.data_editor(
-                historico,
-                column_config={
-                    "Tag": st.column_config.SelectboxColumn(
-                        "Tag",
-                        help="Categoria da despesa/receita",
-                        options=all_tags,
-                        required=True,
-                    ),
-                    "Tipo Lançamento": st.column_config.TextColumn(
-                        "Tipo Lançamento",
-                        help="Tipo do lançamento extraído da descrição",
-                        disabled=False,
-                    ),
-                },
-                num_rows="dynamic",
-                key="editor_hist"
-            )
+            # O editor trabalha com Valor em reais; a comparação com o histórico volta para centavos
+            with etapa("editor"):
+                historico_edit = st.data_editor(
+                    # O id vai numa coluna sem edição: linhas incluídas ficam com o id vazio
+                    valores_em_reais(historico).reset_index(),
+                    column_config={
+                        "id": st.column_config.NumberColumn("id", disabled=True),
+                        "Tag": st.column_config.SelectboxColumn(
+                            "Tag",
+                            help="Categoria da despesa/receita",
+                            options=all_tags,
+                            required=True,
+                        ),
+                        "Tipo Lançamento": st.column_config.TextColumn(
+                            "Tipo Lançamento",
+                            help="Tipo do lançamento extraído da descrição",
+                            disabled=False,
+                        ),
+                    },
+                    num_rows="dynamic",
+                    hide_index=True,
+                    key="editor_hist"
+                )
             if st.button("Salvar histórico editado"):
                 st.session_state['salvar_historico_editado'] = True
 
@@ -485,33 +377,30 @@ if st.session_state.get('authentication_status'):
                 st.warning("Tem certeza que deseja sobrescrever o histórico salvo?")
                 col1, col2 = st.columns(2)
                 if col1.button("Confirmar edição", key="confirma_hist"):
-                    salvar_lancamentos(st.session_state.get("username"), historico_edit)
-                    # Atualizar regras personalizadas com base no histórico editado
-                    salvar_regras_usuario(historico_edit)
-                    st.success("Histórico atualizado com sucesso!")
+                    novos, alterados, ids_excluidos = diferencas_historico(historico, valores_em_centavos(historico_edit))
+                    with etapa("salvar"):
+                        resultados = salvar_edicao_historico(st.session_state.get("username"), novos, alterados, ids_excluidos)
+                    st.write(f"{len(alterados)} lançamentos alterados, {len(novos)} incluídos e {len(ids_excluidos)} excluídos.")
+                    aplicar_edicao_no_cache(alterados, ids_excluidos, resultados)
+                    historico = obter_historico()
+                    # Atualizar regras personalizadas com base nas linhas editadas e incluídas
+                    salvar_regras_usuario(st.session_state.get("username"), pd.concat([alterados, novos]))
+                    if exibir_resultado_salvamento(resultados):
+                        st.success("Histórico atualizado com sucesso!")
                     st.session_state['salvar_historico_editado'] = False
                 if col2.button("Cancelar edição", key="cancela_hist"):
                     st.session_state['salvar_historico_editado'] = False
         else:
-            historico_display = historico.copy()
-            # Usa a função formatar_valor para exibir no formato brasileiro
-            def formatar_valor(x):
-                try:
-                    x_float = float(x)
-                    return f"R$ {x_float:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-                except:
-                    return x
-            historico_display["Valor"] = historico_display["Valor"].apply(formatar_valor)
-            historico_display["Data"] = pd.to_datetime(historico_display["Data"], errors="coerce").dt.strftime("%d/%m/%Y")
-            st.dataframe(historico_display)
+            exibir_tabela(historico, "historico")
 
         # -------- FILTROS E RELATÓRIOS ----------
         st.subheader("Filtros do Histórico")
-        bancos = historico["Banco"].unique().tolist()
+        filtro_historico = obter_filtro_historico()
+        bancos = filtro_historico.opcoes["Banco"]
         banco_filtro = st.multiselect("Filtrar por Banco", bancos, default=bancos)
-        tags = historico["Tag"].unique().tolist()
+        tags = filtro_historico.opcoes["Tag"]
         tag_filtro = st.multiselect("Filtrar por Tag", tags, default=tags)
-        tipos = historico["Tipo Lançamento"].unique().tolist()
+        tipos = filtro_historico.opcoes["Tipo Lançamento"]
         tipo_filtro = st.multiselect("Filtrar por Tipo Lançamento", tipos, default=tipos)
         from datetime import datetime
 
@@ -527,29 +416,27 @@ if st.session_state.get('authentication_status'):
         data_fim = st.date_input("Data final", data_max.date())
         texto_filtro = st.text_input("Buscar por palavra na descrição")
 
-        historico_filtrado = historico[
-            (historico["Banco"].isin(banco_filtro)) &
-            (historico["Tag"].isin(tag_filtro)) &
-            (historico["Tipo Lançamento"].isin(tipo_filtro)) &
-            (historico["Data"] >= pd.Timestamp(data_inicio)) &
-            (historico["Data"] <= pd.Timestamp(data_fim))
-        ]
-        if texto_filtro:
-            historico_filtrado = historico_filtrado[
-                historico_filtrado["Descrição"].str.contains(texto_filtro, case=False, na=False)
-            ]
-            
+        with etapa("filtrar"):
+            historico_filtrado = filtro_historico.filtrar(banco_filtro, tag_filtro, tipo_filtro, data_inicio, data_fim, texto_filtro)
 
-        historico_filtrado_display = historico_filtrado.copy()
-        historico_filtrado_display["Valor"] = historico_filtrado_display["Valor"].apply(formatar_valor)
-        historico_filtrado_display["Data"] = pd.to_datetime(historico_filtrado_display["Data"], errors="coerce").dt.strftime("%d/%m/%Y")
-        st.dataframe(historico_filtrado_display)
+        exibir_tabela(historico_filtrado, "historico_filtrado")
 
-        relatorio_base = historico_filtrado[historico_filtrado["Tag"] != "Investimento Automático"]
+        # Totais e gráficos saem do resumo mensal; a busca por texto só pode ser respondida pelas linhas.
+        # No banco embutido não há rede no caminho, e a agregação inteira é uma consulta ao próprio banco
+        with etapa("agregar"):
+            if armazenamento().embutido:
+                resumo = resumir_historico(
+                    st.session_state.get("username"), banco_filtro, tag_filtro, tipo_filtro, data_inicio, data_fim, texto_filtro
+                )
+            elif texto_filtro:
+                resumo = resumir_linhas(historico_filtrado).groupby(["Mes", "Tag"]).sum()
+            else:
+                resumo = st.session_state["cache_historico"]["resumo"].consultar(
+                    banco_filtro, tag_filtro, tipo_filtro, data_inicio, data_fim, historico_filtrado
+                )
+            receitas, gastos, saldo = totais(resumo)
 
-        receitas = relatorio_base[relatorio_base['Valor'] > 0]['Valor'].sum()
-        gastos = relatorio_base[relatorio_base['Valor'] < 0]['Valor'].sum()
-        saldo = relatorio_base['Valor'].sum()
+        relatorio_base = historico_filtrado[historico_filtrado["Tag"] != "Investimento Automático"]
 
         st.write(f"**Total de Receitas (exceto Investimentos):** R$ {receitas:,.2f}")
         st.write(f"**Total de Gastos (exceto Investimentos):** R$ {gastos:,.2f}")
@@ -557,25 +444,18 @@ if st.session_state.get('authentication_status'):
 
         st.subheader("Top 5 Maiores Gastos")
         top_gastos = relatorio_base[relatorio_base['Valor'] < 0].sort_values(by="Valor").head(5)
-        top_gastos["Valor"] = top_gastos["Valor"].apply(formatar_valor)
-        top_gastos["Data"] = pd.to_datetime(top_gastos["Data"], errors="coerce").dt.strftime("%d/%m/%Y")
-        st.dataframe(top_gastos)
+        st.dataframe(formatar_lancamentos(top_gastos))
 
         st.subheader("Top 5 Maiores Receitas")
         top_receitas = relatorio_base[relatorio_base['Valor'] > 0].sort_values(by="Valor", ascending=False).head(5)
-        top_receitas["Valor"] = top_receitas["Valor"].apply(formatar_valor)
-        top_receitas["Data"] = pd.to_datetime(top_receitas["Data"], errors="coerce").dt.strftime("%d/%m/%Y")
-        st.dataframe(top_receitas)
+        st.dataframe(formatar_lancamentos(top_receitas))
 
         st.subheader("Resumo de Investimento Automático (BB Rende Fácil)")
         investimentos = historico_filtrado[historico_filtrado["Tag"] == "Investimento Automático"]
         if not investimentos.empty:
-            investimentos_display = investimentos.copy()
-            investimentos_display["Valor"] = investimentos_display["Valor"].apply(formatar_valor)
-            investimentos_display["Data"] = pd.to_datetime(investimentos_display["Data"], errors="coerce").dt.strftime("%d/%m/%Y")
-            st.dataframe(investimentos_display)
+            exibir_tabela(investimentos, "investimentos")
             st.write(
-                f"Total movimentado (não entra no saldo geral): R$ {investimentos['Valor'].sum():,.2f}"
+                f"Total movimentado (não entra no saldo geral): R$ {investimentos['Valor'].sum() / CENTAVOS:,.2f}"
             )
 
         # ---------- GRÁFICOS ----------
@@ -583,28 +463,26 @@ if st.session_state.get('authentication_status'):
 
         # 1. Gráfico de barras das despesas por categoria (Tags)
         st.subheader("Despesas por Categoria (Tag)")
-        df_gastos = historico_filtrado[(historico_filtrado["Valor"] < 0) & (historico_filtrado["Tag"] != "Investimento Automático")]
-        if not df_gastos.empty:
-            cat_gastos = df_gastos.groupby("Tag")["Valor"].sum().sort_values()
+        with etapa("agregar"):
+            cat_gastos = gastos_por_tag(resumo)
+        if not cat_gastos.empty:
             st.bar_chart(cat_gastos.abs())
         else:
             st.info("Sem despesas no filtro atual.")
 
         # 2. Gráfico de pizza das despesas por categoria
         st.subheader("Distribuição das Despesas por Categoria")
-        if not df_gastos.empty:
-            fig, ax = plt.subplots()
-            ax.pie(cat_gastos.abs(), labels=cat_gastos.index, autopct='%1.1f%%', startangle=90)
-            ax.axis('equal')
-            st.pyplot(fig)
+        if not cat_gastos.empty:
+            with etapa("renderizar"):
+                from graficos import grafico_pizza
+                st.image(grafico_pizza(cat_gastos))
         else:
             st.info("Sem despesas no filtro atual.")
 
         # 3. Linha do tempo do saldo acumulado
         st.subheader("Evolução do Saldo Acumulado")
-        df_tempo = historico_filtrado.copy()
-        df_tempo = df_tempo.sort_values("Data")
-        df_tempo["Saldo Acumulado"] = df_tempo["Valor"].cumsum()
+        df_tempo = historico_filtrado.sort_values("Data")
+        df_tempo["Saldo Acumulado"] = df_tempo["Valor"].cumsum() / CENTAVOS
         if not df_tempo.empty:
             st.line_chart(df_tempo.set_index("Data")["Saldo Acumulado"])
         else:
@@ -612,14 +490,8 @@ if st.session_state.get('authentication_status'):
 
         # 4. Linha do tempo dos gastos e receitas mensais
         st.subheader("Receitas e Despesas por Mês")
-        df_mes = historico_filtrado.copy()
-        df_mes["AnoMes"] = df_mes["Data"].dt.to_period("M").astype(str)
-        gastos_mes = df_mes[df_mes["Valor"] < 0].groupby("AnoMes")["Valor"].sum()
-        receitas_mes = df_mes[df_mes["Valor"] > 0].groupby("AnoMes")["Valor"].sum()
-        df_bar = pd.DataFrame({
-            "Despesas": gastos_mes,
-            "Receitas": receitas_mes
-        }).fillna(0)
+        with etapa("agregar"):
+            df_bar = receitas_despesas_por_mes(resumo)
         if not df_bar.empty:
             st.bar_chart(df_bar)
         else:
@@ -629,15 +501,9 @@ if st.session_state.get('authentication_status'):
         st.subheader("Evolução Mensal de Receitas e Despesas (Linhas)")
 
         if not df_bar.empty:
-            fig, ax = plt.subplots()
-            ax.plot(df_bar.index, df_bar['Receitas'], marker='o', label='Receitas', color='green')
-            ax.plot(df_bar.index, df_bar['Despesas'].abs(), marker='o', label='Despesas', color='red')
-            ax.set_xlabel("Mês/Ano")
-            ax.set_ylabel("Valor")
-            ax.set_title("Entradas e Saídas Mensais")
-            ax.legend()
-            plt.xticks(rotation=45)
-            st.pyplot(fig)
+            with etapa("renderizar"):
+                from graficos import grafico_linhas
+                st.image(grafico_linhas(df_bar))
         else:
             st.info("Sem dados no filtro atual.")
 elif st.session_state.get('authentication_status') is False:
@@ -652,27 +518,31 @@ elif st.session_state.get('authentication_status') is None:
         submit_cadastro = st.form_submit_button("Cadastrar")
 
     if submit_cadastro:
-        config = load_config()
         if not nome_novo or not usuario_novo or not senha_nova:
             st.sidebar.error("Preencha todos os campos!")
         elif senha_nova != senha_conf:
             st.sidebar.error("As senhas não coincidem.")
         elif usuario_novo in config['credentials']['usernames']:
             st.sidebar.error("Usuário já existe!")
+        elif not cadastrar_usuario(usuario_novo, nome_novo, gerar_hash(senha_nova)):
+            # Cadastrado por outra sessão depois que esta carregou a configuração
+            st.sidebar.error("Usuário já existe!")
         else:
-            hash_pw = stauth.Hasher().hash(senha_nova)
-            config['credentials']['usernames'][usuario_novo] = {
-                'name': nome_novo,
-                'password': hash_pw
-            }
-            save_config(config)
             st.sidebar.success("Usuário cadastrado! Recarregando para efetivar o login...")
             st.rerun()
 
 
     
 
-
-
-
-
+# Painel de desempenho (opcional) com as medições desta execução, que também vão para o log
+painel_desempenho = st.sidebar.checkbox("Painel de desempenho", key="painel_desempenho")
+desempenho = finalizar(usuario=st.session_state.get("username"))
+if painel_desempenho:
+    with st.sidebar.expander("Desempenho desta execução", expanded=True):
+        st.write(f"Total: {desempenho['total_ms']:.0f} ms")
+        st.dataframe(pd.Series(desempenho["etapas_ms"], name="ms"))
+        st.write(f"Requisições ao Supabase: {desempenho['requisicoes']} ({desempenho['requisicoes_ms']:.0f} ms, {desempenho['bytes'] / 1024:.1f} KB)")
+        if desempenho["pico_memoria_mb"] is not None:
+            st.write(f"Pico de memória alocada: {desempenho['pico_memoria_mb']:.1f} MB")
+        if "rss_maximo_mb" in desempenho:
+            st.write(f"Memória máxima do processo: {desempenho['rss_maximo_mb']:.0f} MB")
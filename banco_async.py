@@ -0,0 +1,93 @@
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Requisições em andamento ao mesmo tempo em cada operação (carga de páginas, envio de lotes)
+CONCORRENCIA = 4
+# Limite global do processo, somando todas as sessões e operações, e rajada permitida acima da média
+REQUISICOES_POR_SEGUNDO = 50
+RAJADA = 10
+# Tentativas de cada requisição e espera antes da segunda tentativa, dobrada a cada nova falha
+TENTATIVAS = 4
+ESPERA_INICIAL = 0.5
+
+
+class LimiteRequisicoes:
+    """
+    Balde de fichas compartilhado por todas as threads e laços de eventos do processo: permite
+    rajadas de até `rajada` requisições e, em média, `por_segundo` requisições por segundo.
+    """
+
+    def __init__(self, por_segundo, rajada=RAJADA):
+        self.por_segundo = por_segundo
+        self.rajada = rajada
+        self.fichas = float(rajada)
+        self.atualizado = time.monotonic()
+        self._trava = threading.Lock()
+
+    def _reservar(self):
+        # Reserva uma ficha e devolve quantos segundos esperar até ela estar disponível
+        with self._trava:
+            agora = time.monotonic()
+            self.fichas = min(self.rajada, self.fichas + (agora - self.atualizado) * self.por_segundo)
+            self.atualizado = agora
+            self.fichas -= 1
+            return max(0.0, -self.fichas / self.por_segundo)
+
+    async def aguardar(self):
+        espera = self._reservar()
+        if espera:
+            await asyncio.sleep(espera)
+
+
+limite = LimiteRequisicoes(REQUISICOES_POR_SEGUNDO)
+
+
+async def chamar(funcao, *args, semaforo, repetir=True):
+    """
+    Executa a função (bloqueante) numa thread, dentro do limite de concorrência do semáforo e do
+    limite global de requisições. Falhas são tentadas de novo com espera exponencial (com variação
+    aleatória, para as tentativas de várias sessões não coincidirem); sem repetir, a primeira falha
+    é devolvida (ex.: inserções sem chave, que poderiam ser gravadas duas vezes).
+    """
+    tentativas = TENTATIVAS if repetir else 1
+    for tentativa in range(tentativas):
+        async with semaforo:
+            await limite.aguardar()
+            try:
+                return await asyncio.to_thread(funcao, *args)
+            except (ValueError, TypeError):
+                # Erros de programação não melhoram com uma nova tentativa
+                raise
+            except Exception:
+                if tentativa == tentativas - 1:
+                    raise
+        await asyncio.sleep(ESPERA_INICIAL * 2 ** tentativa * random.uniform(0.5, 1.5))
+
+
+async def mapear(funcao, argumentos, concorrencia=CONCORRENCIA, repetir=True):
+    """
+    Chama funcao(*args) para cada item de argumentos, com até `concorrencia` chamadas ao mesmo tempo.
+    Devolve os resultados na ordem dos argumentos; a chamada que falhou em todas as tentativas
+    fica com a exceção no lugar do resultado, sem cancelar as demais.
+    """
+    semaforo = asyncio.Semaphore(concorrencia)
+    return await asyncio.gather(
+        *(chamar(funcao, *args, semaforo=semaforo, repetir=repetir) for args in argumentos),
+        return_exceptions=True,
+    )
+
+
+def rodar(corrotina):
+    """
+    Executa a corrotina até o fim a partir de código síncrono (script do Streamlit, importação em lote).
+    Se a thread atual já tem um laço de eventos rodando, a corrotina roda num laço em outra thread.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(corrotina)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, corrotina).result()
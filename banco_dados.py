@@ -0,0 +1,377 @@
+import os
+import time
+from datetime import datetime
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+import pandas as pd
+
+from banco_async import CONCORRENCIA, mapear, rodar
+from deduplicacao import calcular_chaves
+from compactacao import compactar_historico, valores_em_reais
+from instrumentacao import registrar_requisicao
+from filtros import palavras
+from resumos import COLUNAS_VALORES, SEM_VALOR, com_marcador
+
+if TYPE_CHECKING:
+    from supabase import Client
+
+# Onde ficam os lançamentos: "supabase" ou "sqlite" (banco embutido, ver banco_local.py)
+ARMAZENAMENTO = os.getenv("ARMAZENAMENTO", "supabase")
+
+
+@lru_cache(maxsize=1)
+def cliente() -> "Client":
+    """
+    Cliente do Supabase, criado uma única vez por processo e compartilhado por todas as
+    sessões e execuções do script. Reaproveitar o cliente mantém as conexões HTTP abertas
+    (keep-alive) em vez de abrir uma conexão nova a cada interação.
+    O pacote supabase só é importado aqui: com o banco embutido (ARMAZENAMENTO=sqlite) nem é carregado.
+    """
+    from supabase import create_client
+    return create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
+
+
+def _executar(consulta, enviados=None):
+    # Executa a requisição, registrando a ida e volta (e o volume trocado) nas medições da execução
+    inicio = time.perf_counter()
+    resposta = consulta.execute()
+    registrar_requisicao(time.perf_counter() - inicio, enviados, resposta.data)
+    return resposta
+
+
+class ArmazenamentoSupabase:
+    """
+    Lançamentos na tabela "lancamentos" do Supabase. As operações são as mesmas do banco
+    embutido (banco_local.ArmazenamentoSQLite): cada método é uma requisição ao Supabase.
+    """
+
+    # Cada consulta é uma ida e volta pela rede: o app agrega pelo resumo mensal em memória
+    embutido = False
+
+    def _consulta(self, usuario, colunas, data_inicio=None, data_fim=None, bancos=None, a_partir_do_id=None, **opcoes):
+        consulta = cliente().table("lancamentos").select(",".join(colunas), **opcoes).eq("usuario", str(usuario))
+        if data_inicio is not None:
+            consulta = consulta.gte("data", str(data_inicio))
+        if data_fim is not None:
+            consulta = consulta.lte("data", str(data_fim))
+        if bancos is not None:
+            consulta = consulta.in_("banco", list(bancos))
+        if a_partir_do_id is not None:
+            consulta = consulta.gt("id", a_partir_do_id)
+        return consulta
+
+    def selecionar(self, usuario, colunas, data_inicio=None, data_fim=None, bancos=None, a_partir_do_id=None, limite=None, deslocamento=None):
+        consulta = self._consulta(usuario, colunas, data_inicio, data_fim, bancos, a_partir_do_id).order("id")
+        if deslocamento is not None:
+            consulta = consulta.range(deslocamento, deslocamento + limite - 1)
+        elif limite is not None:
+            consulta = consulta.limit(limite)
+        return _executar(consulta).data
+
+    def contar(self, usuario, data_inicio=None, data_fim=None, bancos=None, a_partir_do_id=None):
+        # Só a contagem (cabeçalho Content-Range), sem trazer as linhas
+        consulta = self._consulta(usuario, ["id"], data_inicio, data_fim, bancos, a_partir_do_id, count="exact", head=True)
+        return _executar(consulta).count or 0
+
+    def versao_edicoes(self, usuario):
+        # Contador mantido por gatilho no Postgres (migracoes/003_versoes_lancamentos.sql)
+        resp = _executar(cliente().table("versoes_lancamentos").select("edicoes").eq("usuario", str(usuario)))
+        return resp.data[0]["edicoes"] if resp.data else 0
+
+    def chaves_existentes(self, usuario, chaves):
+        resp = _executar(cliente().table("lancamentos").select("chave_dedup").eq("usuario", str(usuario)).in_("chave_dedup", list(chaves)))
+        return {registro["chave_dedup"] for registro in resp.data}
+
+    def executar_lote(self, lote, operacao):
+        # Devolve quantos registros foram gravados, alterados ou excluídos (a resposta traz só essas linhas)
+        tabela = cliente().table("lancamentos")
+        if operacao == "inserir":
+            return len(_executar(tabela.insert(lote), lote).data)
+        elif operacao == "deduplicar":
+            # Registros cuja chave de deduplicação já existe são ignorados pelo banco
+            return len(_executar(tabela.upsert(lote, on_conflict="usuario,chave_dedup", ignore_duplicates=True), lote).data)
+        elif operacao == "atualizar":
+            return len(_executar(tabela.upsert(lote, on_conflict="id"), lote).data)
+        elif operacao == "excluir":
+            return len(_executar(tabela.delete().eq("usuario", lote[0]["usuario"]).in_("id", [registro["id"] for registro in lote]), lote).data)
+        else:
+            raise ValueError(f"Operação desconhecida: {operacao}")
+
+    def resumir(self, usuario, bancos, tags, tipos, data_inicio, data_fim, termos=(), sem_valor=SEM_VALOR):
+        # Agregação feita no Postgres pela função resumo_lancamentos (migracoes/002_resumo_lancamentos.sql)
+        parametros = {
+            "p_usuario": str(usuario),
+            "p_inicio": str(data_inicio),
+            "p_fim": str(data_fim),
+            "p_bancos": list(bancos),
+            "p_tags": list(tags),
+            "p_tipos": list(tipos),
+            "p_termos": list(termos),
+            "p_sem_valor": sem_valor,
+        }
+        return _executar(cliente().rpc("resumo_lancamentos", parametros)).data
+
+
+@lru_cache(maxsize=1)
+def armazenamento():
+    """
+    Armazenamento dos lançamentos escolhido pela variável ARMAZENAMENTO, criado uma vez por processo.
+    Com "sqlite", tudo roda num arquivo local (banco_local.py), sem rede e sem credenciais do Supabase.
+    """
+    if ARMAZENAMENTO == "sqlite":
+        from banco_local import ArmazenamentoSQLite
+        return ArmazenamentoSQLite()
+    if ARMAZENAMENTO == "supabase":
+        return ArmazenamentoSupabase()
+    raise ValueError(f"Armazenamento desconhecido: {ARMAZENAMENTO}")
+
+
+# Colunas da tabela "lancamentos" usadas pelo app e seus nomes no DataFrame
+COLUNAS_LANCAMENTOS = {
+    "banco": "Banco",
+    "data": "Data",
+    "tipo_lancamento": "Tipo Lançamento",
+    "descricao": "Descrição",
+    "valor": "Valor",
+    "tag": "Tag"
+}
+
+# Linhas buscadas por requisição; não deve passar do limite de linhas do servidor (1000 no Supabase)
+TAMANHO_PAGINA = 1000
+
+def carregar_historico(username, data_inicio=None, data_fim=None, bancos=None, a_partir_do_id=None, tamanho_pagina=TAMANHO_PAGINA):
+    """
+    Carrega todos os lançamentos do usuário, buscando apenas as colunas usadas pelo app.
+    Período e bancos, quando informados, são filtrados direto na consulta. O id do banco de
+    dados vira o índice do DataFrame. Com a_partir_do_id, traz apenas os lançamentos com id
+    maior que o informado. O resultado vem na representação compacta (ver compactacao.py),
+    com Valor em centavos.
+
+    A primeira página vem sozinha, o que basta nas sincronizações incrementais. Se houver mais,
+    as demais páginas são buscadas ao mesmo tempo (ver banco_async.py), por posição a partir do
+    último id da primeira página. Se a contagem não bater (lançamentos excluídos durante a carga
+    deslocam as posições), a carga é refeita página por página, pelo id.
+    """
+    colunas = ["id"] + list(COLUNAS_LANCAMENTOS)
+    filtros = (data_inicio, data_fim, bancos)
+    registros = armazenamento().selecionar(username, colunas, *filtros, a_partir_do_id, tamanho_pagina)
+    if len(registros) == tamanho_pagina and not armazenamento().embutido:
+        ultimo_id = registros[-1]["id"]
+        restantes = armazenamento().contar(username, *filtros, ultimo_id)
+        argumentos = [
+            (username, colunas, *filtros, ultimo_id, tamanho_pagina, deslocamento)
+            for deslocamento in range(0, restantes, tamanho_pagina)
+        ]
+        paginas = rodar(mapear(armazenamento().selecionar, argumentos))
+        for pagina in paginas:
+            if isinstance(pagina, Exception):
+                raise pagina
+        demais = {registro["id"]: registro for pagina in paginas for registro in pagina}
+        if len(demais) == restantes:
+            registros.extend(demais[id_] for id_ in sorted(demais))
+        else:
+            registros.extend(_selecionar_por_id(username, colunas, filtros, ultimo_id, tamanho_pagina))
+    elif len(registros) == tamanho_pagina:
+        registros.extend(_selecionar_por_id(username, colunas, filtros, registros[-1]["id"], tamanho_pagina))
+
+    if not registros:
+        # Vazio, mas com o mesmo índice (id) de um histórico com lançamentos
+        vazio = pd.DataFrame(columns=list(COLUNAS_LANCAMENTOS.values()), index=pd.Index([], dtype="int64", name="id"))
+        return compactar_historico(vazio)
+
+    # Renomeia corretamente as colunas vindas do Supabase para as colunas do seu DataFrame
+    df = pd.DataFrame(registros).set_index("id").rename(columns=COLUNAS_LANCAMENTOS)
+
+    # Converte a coluna Data para datetime
+    df["Data"] = pd.to_datetime(df["Data"], errors="coerce")
+
+    # Retorna as colunas na ordem desejada
+    return compactar_historico(df[list(COLUNAS_LANCAMENTOS.values())])
+
+def versao_edicoes(username):
+    """
+    Contador de edições e exclusões dos lançamentos do usuário, incrementado pelo próprio banco
+    a cada linha alterada ou excluída (por qualquer sessão ou fora do app). Inclusões não contam.
+    """
+    return armazenamento().versao_edicoes(username)
+
+def _selecionar_por_id(username, colunas, filtros, ultimo_id, tamanho_pagina):
+    # Páginas em sequência, cada uma a partir do último id da anterior
+    registros = []
+    while True:
+        pagina = armazenamento().selecionar(username, colunas, *filtros, ultimo_id, tamanho_pagina)
+        registros.extend(pagina)
+        if len(pagina) < tamanho_pagina:
+            return registros
+        ultimo_id = pagina[-1]["id"]
+
+def montar_registros(username, df, deduplicar=False):
+    """
+    Converte o DataFrame de lançamentos nos registros da tabela "lancamentos",
+    fazendo as conversões de Data e Valor de uma vez para a coluna inteira.
+    Linhas sem valor são descartadas e datas inválidas viram a data atual.
+    O resultado mantém o índice do DataFrame original. Com deduplicar, inclui
+    a chave de deduplicação (FITID ou hash do conteúdo) de cada registro; se o DataFrame
+    já tem a coluna "Chave" (ver chaves_deduplicacao), ela é usada.
+    """
+    # Pula linhas com valor NaN para evitar problemas de serialização JSON
+    df = df[df["Valor"].notna()]
+
+    valores = pd.to_numeric(df["Valor"], errors="coerce").fillna(0.0).astype(float)
+
+    # Corrige o formato da coluna Data, substituindo datas inválidas (NaT) pela data atual
+    datas = pd.to_datetime(df["Data"], format='%d/%m/%Y', errors="coerce")
+    datas = datas.fillna(pd.Timestamp(datetime.today().date())).dt.strftime("%Y-%m-%d")
+
+    tags = df["Tag"] if "Tag" in df.columns else pd.Series("Outros", index=df.index)
+
+    registros = pd.DataFrame({
+        "usuario": username,
+        "banco": df["Banco"].astype(object),
+        "data": datas,
+        "tipo_lancamento": df["Tipo Lançamento"].astype(object),
+        "descricao": df["Descrição"].astype(object),
+        "valor": valores,
+        "tag": tags.astype(object)
+    }, index=df.index)
+    if deduplicar and not registros.empty:
+        if "Chave" in df.columns:
+            registros["chave_dedup"] = df["Chave"].astype(object)
+        else:
+            registros["chave_dedup"] = calcular_chaves(registros, df.get("FITID"), df.get("Conta"), df.get("Arquivo"))
+    return registros
+
+def chaves_deduplicacao(username, df):
+    """
+    Chave de deduplicação de cada lançamento do extrato, alinhada ao DataFrame. A chave depende
+    das repetições no extrato inteiro, então deve ser calculada antes de tirar linhas (ex.: as já
+    importadas) e guardada na coluna "Chave", que salvar_lancamentos usa no lugar de recalcular.
+    """
+    return montar_registros(username, df, deduplicar=True).get("chave_dedup", pd.Series(dtype=object)).reindex(df.index)
+
+def preparar_registros(username, df, deduplicar=False):
+    registros = montar_registros(username, df, deduplicar)
+    # Troca NaN por None para gerar JSON válido
+    registros = registros.astype(object).where(registros.notna(), None)
+    return registros.to_dict("records")
+
+def buscar_chaves_existentes(username, chaves, tamanho_lote=100):
+    """
+    Consulta, em lotes (várias requisições ao mesmo tempo), quais chaves de deduplicação
+    já estão salvas para o usuário. Retorna o conjunto das chaves encontradas.
+    """
+    chaves = list(dict.fromkeys(chaves))
+    lotes = [(username, chaves[inicio:inicio + tamanho_lote]) for inicio in range(0, len(chaves), tamanho_lote)]
+    existentes = set()
+    for encontradas in rodar(mapear(armazenamento().chaves_existentes, lotes)):
+        if isinstance(encontradas, Exception):
+            raise encontradas
+        existentes.update(encontradas)
+    return existentes
+
+def marcar_ja_importados(username, df):
+    """
+    Devolve uma série booleana, alinhada ao DataFrame, indicando os lançamentos
+    que já estão salvos no histórico (mesmo FITID ou mesmo conteúdo).
+    """
+    registros = montar_registros(username, df, deduplicar=True)
+    ja_importados = pd.Series(False, index=df.index)
+    if not registros.empty:
+        existentes = buscar_chaves_existentes(username, registros["chave_dedup"])
+        ja_importados[registros.index] = registros["chave_dedup"].isin(existentes)
+    return ja_importados
+
+# Quantidade de lançamentos enviados em cada requisição ao Supabase
+TAMANHO_LOTE = 500
+
+def enviar_lotes(registros, tamanho_lote=TAMANHO_LOTE, operacao="inserir"):
+    """
+    Envia os registros em lotes, com uma única requisição por lote e vários lotes ao mesmo tempo
+    (ver banco_async.py). A operação pode ser "inserir", "deduplicar" (inserir ignorando chaves já
+    existentes), "atualizar" ou "excluir" (por id). Lotes com falha são tentados de novo, exceto na
+    operação "inserir", que gravaria duas vezes um lote que chegou ao banco sem a resposta voltar.
+    Retorna uma lista com o resultado de cada lote: "gravados" é quantos registros o banco gravou
+    (menos que "quantidade" quando a deduplicação ignorou registros já existentes). Os lotes com falha
+    guardam seus registros para que possam ser reenviados sem repetir os que já foram salvos.
+    """
+    inicios = range(0, len(registros), tamanho_lote)
+    lotes = [(registros[inicio:inicio + tamanho_lote], operacao) for inicio in inicios]
+    # No banco embutido as gravações são feitas uma de cada vez; não há rede para sobrepor
+    concorrencia = 1 if armazenamento().embutido else CONCORRENCIA
+    respostas = rodar(mapear(armazenamento().executar_lote, lotes, concorrencia, repetir=operacao != "inserir"))
+    resultados = []
+    for inicio, (lote, _), resposta in zip(inicios, lotes, respostas):
+        if isinstance(resposta, Exception):
+            resultados.append({"inicio": inicio, "quantidade": len(lote), "gravados": 0, "sucesso": False, "erro": str(resposta), "registros": lote, "operacao": operacao})
+        else:
+            gravados = len(lote) if resposta is None else resposta
+            resultados.append({"inicio": inicio, "quantidade": len(lote), "gravados": gravados, "sucesso": True, "erro": None, "registros": [], "operacao": operacao})
+    return resultados
+
+def reenviar_lotes(lotes_com_falha, tamanho_lote=TAMANHO_LOTE):
+    resultados = []
+    for operacao in dict.fromkeys(lote["operacao"] for lote in lotes_com_falha):
+        registros = [registro for lote in lotes_com_falha if lote["operacao"] == operacao for registro in lote["registros"]]
+        resultados.extend(enviar_lotes(registros, tamanho_lote, operacao))
+    return resultados
+
+def salvar_lancamentos(username, df, tamanho_lote=TAMANHO_LOTE, deduplicar=True):
+    registros = preparar_registros(username, df, deduplicar)
+    return enviar_lotes(registros, tamanho_lote, "deduplicar" if deduplicar else "inserir")
+
+def diferencas_historico(original, editado):
+    """
+    Compara o histórico carregado (indexado pelo id do banco) com o retornado pelo editor, que
+    recebe o id como coluna (sem edição) e um índice de posições, para que o usuário inclua linhas
+    sem digitar um índice. Retorna (novos, alterados, ids_excluidos): as linhas incluídas no
+    editor (id vazio), as linhas existentes com alguma coluna alterada e os ids das linhas removidas.
+    """
+    colunas = list(COLUNAS_LANCAMENTOS.values())
+    sem_id = editado["id"].isna()
+    novos = editado[sem_id].drop(columns="id")
+    existentes = editado[~sem_id].set_index("id")
+    existentes.index = existentes.index.astype(original.index.dtype)
+
+    ids_excluidos = original.index.difference(existentes.index).tolist()
+    comuns = existentes.index.intersection(original.index)
+    # Compara como objetos, já que o histórico usa categorias e o editor devolve texto livre;
+    # as linhas alteradas voltam com os tipos do editor (Data continua datetime para o resumo mensal)
+    antes = original.loc[comuns, colunas].astype(object)
+    depois = existentes.loc[comuns, colunas].astype(object)
+    mudou = ((antes != depois) & ~(antes.isna() & depois.isna())).any(axis=1)
+    return novos, existentes.loc[comuns[mudou.to_numpy()]], ids_excluidos
+
+def salvar_edicao_historico(username, novos, alterados, ids_excluidos, tamanho_lote=TAMANHO_LOTE):
+    """
+    Grava apenas as diferenças da edição do histórico: atualiza as linhas alteradas,
+    insere as novas e exclui as removidas, tudo em lotes. Valores em centavos, como no histórico.
+    """
+    novos, alterados = valores_em_reais(novos), valores_em_reais(alterados)
+    resultados = []
+    if not alterados.empty:
+        registros = montar_registros(username, alterados)
+        registros.insert(0, "id", registros.index)
+        registros = registros.astype(object).where(registros.notna(), None)
+        resultados += enviar_lotes(registros.to_dict("records"), tamanho_lote, "atualizar")
+    if not novos.empty:
+        resultados += enviar_lotes(preparar_registros(username, novos), tamanho_lote, "inserir")
+    if ids_excluidos:
+        registros = [{"id": id_, "usuario": username} for id_ in ids_excluidos]
+        resultados += enviar_lotes(registros, tamanho_lote, "excluir")
+    return resultados
+
+def resumir_historico(username, bancos, tags, tipos, data_inicio, data_fim, texto=""):
+    """
+    Resumo por mês e tag dos lançamentos filtrados, calculado dentro do banco em vez de nas linhas
+    carregadas. Tem o mesmo formato de ResumoMensal.consultar (valores em centavos), para ser usado
+    por totais, gastos_por_tag e receitas_despesas_por_mes. Os filtros seguem os de FiltroHistorico.
+    """
+    linhas = armazenamento().resumir(
+        username, com_marcador(bancos), com_marcador(tags), com_marcador(tipos),
+        pd.Timestamp(data_inicio).date(), pd.Timestamp(data_fim).date(), palavras(texto),
+    )
+    df = pd.DataFrame(linhas, columns=["mes", "tag", "receitas", "despesas", "quantidade"])
+    indice = pd.MultiIndex.from_arrays([pd.PeriodIndex(df["mes"], freq="M"), df["tag"].astype(object)], names=["Mes", "Tag"])
+    resumo = pd.DataFrame(df[["receitas", "despesas", "quantidade"]].to_numpy(dtype=float), index=indice, columns=COLUNAS_VALORES)
+    return resumo.sort_index()
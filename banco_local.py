@@ -0,0 +1,149 @@
+import os
+import sqlite3
+from contextlib import closing
+
+import pandas as pd
+
+# Banco embutido com a tabela "lancamentos", para rodar o app num nó só, sem o Supabase
+ARQUIVO_BANCO = os.getenv("BANCO_LOCAL", "lancamentos.sqlite3")
+# Tempo máximo esperando outro processo terminar de gravar, em segundos
+ESPERA_TRAVA = 30
+
+# Colunas que podem ser gravadas; os nomes das colunas entram no SQL, os valores sempre como parâmetros
+COLUNAS_GRAVAVEIS = ["usuario", "banco", "data", "tipo_lancamento", "descricao", "valor", "tag", "chave_dedup"]
+
+_ESQUEMA = [
+    # AUTOINCREMENT: ids nunca são reaproveitados, como no Supabase (a cópia local sincroniza pelo maior id)
+    "CREATE TABLE IF NOT EXISTS lancamentos ("
+    " id INTEGER PRIMARY KEY AUTOINCREMENT, usuario TEXT NOT NULL, banco TEXT, data TEXT,"
+    " tipo_lancamento TEXT, descricao TEXT, valor REAL, tag TEXT, chave_dedup TEXT)",
+    # Filtros de período e agregações por usuário
+    "CREATE INDEX IF NOT EXISTS lancamentos_usuario_data ON lancamentos (usuario, data)",
+    # Carga paginada por id de um usuário (o índice guarda o id junto com o usuário)
+    "CREATE INDEX IF NOT EXISTS lancamentos_usuario ON lancamentos (usuario)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS lancamentos_usuario_chave_dedup ON lancamentos (usuario, chave_dedup)",
+    # Contador de edições e exclusões de cada usuário, como no Supabase (migracoes/003_versoes_lancamentos.sql)
+    "CREATE TABLE IF NOT EXISTS versoes_lancamentos (usuario TEXT PRIMARY KEY, edicoes INTEGER NOT NULL) WITHOUT ROWID",
+    *(
+        f"CREATE TRIGGER IF NOT EXISTS lancamentos_contar_{evento.lower()} AFTER {evento} ON lancamentos BEGIN"
+        " INSERT INTO versoes_lancamentos (usuario, edicoes) VALUES (old.usuario, 1)"
+        " ON CONFLICT (usuario) DO UPDATE SET edicoes = edicoes + 1; END"
+        for evento in ("UPDATE", "DELETE")
+    ),
+]
+
+
+def _data(valor):
+    # Datas guardadas como texto AAAA-MM-DD, que ordena igual às datas
+    return pd.Timestamp(valor).strftime("%Y-%m-%d")
+
+
+def _em(coluna, valores, parametros):
+    parametros.extend(valores)
+    return f"{coluna} IN ({', '.join('?' * len(valores))})"
+
+
+class ArmazenamentoSQLite:
+    """
+    Lançamentos num arquivo SQLite, com as mesmas operações do Supabase (ver banco_dados.py).
+    Cada operação abre a sua conexão, então o armazenamento pode ser usado por várias sessões
+    (threads) e processos ao mesmo tempo; o modo WAL deixa as leituras livres durante as gravações.
+    """
+
+    # Sem rede: as agregações rodam no próprio banco a cada execução do script
+    embutido = True
+
+    def __init__(self, caminho=None):
+        self.caminho = caminho or ARQUIVO_BANCO
+        with closing(self._conectar()) as conexao, conexao:
+            for comando in _ESQUEMA:
+                conexao.execute(comando)
+
+    def _conectar(self):
+        conexao = sqlite3.connect(self.caminho, timeout=ESPERA_TRAVA)
+        conexao.row_factory = sqlite3.Row
+        conexao.execute("PRAGMA journal_mode=WAL")
+        return conexao
+
+    def _filtros(self, usuario, data_inicio=None, data_fim=None, bancos=None, a_partir_do_id=None):
+        condicoes, parametros = ["usuario = ?"], [str(usuario)]
+        if data_inicio is not None:
+            condicoes.append("data >= ?")
+            parametros.append(_data(data_inicio))
+        if data_fim is not None:
+            condicoes.append("data <= ?")
+            parametros.append(_data(data_fim))
+        if bancos is not None:
+            condicoes.append(_em("banco", list(bancos), parametros))
+        if a_partir_do_id is not None:
+            condicoes.append("id > ?")
+            parametros.append(int(a_partir_do_id))
+        return condicoes, parametros
+
+    def selecionar(self, usuario, colunas, data_inicio=None, data_fim=None, bancos=None, a_partir_do_id=None, limite=None, deslocamento=None):
+        # Lançamentos do usuário em ordem de id, no mesmo formato das linhas devolvidas pelo Supabase
+        condicoes, parametros = self._filtros(usuario, data_inicio, data_fim, bancos, a_partir_do_id)
+        sql = f"SELECT {', '.join(colunas)} FROM lancamentos WHERE {' AND '.join(condicoes)} ORDER BY id"
+        if limite is not None:
+            sql += f" LIMIT {int(limite)} OFFSET {int(deslocamento or 0)}"
+        with closing(self._conectar()) as conexao:
+            return [dict(linha) for linha in conexao.execute(sql, parametros)]
+
+    def contar(self, usuario, data_inicio=None, data_fim=None, bancos=None, a_partir_do_id=None):
+        condicoes, parametros = self._filtros(usuario, data_inicio, data_fim, bancos, a_partir_do_id)
+        with closing(self._conectar()) as conexao:
+            return conexao.execute(f"SELECT COUNT(*) FROM lancamentos WHERE {' AND '.join(condicoes)}", parametros).fetchone()[0]
+
+    def versao_edicoes(self, usuario):
+        with closing(self._conectar()) as conexao:
+            linha = conexao.execute("SELECT edicoes FROM versoes_lancamentos WHERE usuario = ?", (str(usuario),)).fetchone()
+        return linha["edicoes"] if linha else 0
+
+    def chaves_existentes(self, usuario, chaves):
+        parametros = [str(usuario)]
+        sql = f"SELECT chave_dedup FROM lancamentos WHERE usuario = ? AND {_em('chave_dedup', list(chaves), parametros)}"
+        with closing(self._conectar()) as conexao:
+            return {linha[0] for linha in conexao.execute(sql, parametros)}
+
+    def executar_lote(self, lote, operacao):
+        # O lote inteiro numa transação: ou todos os registros são gravados, ou nenhum.
+        # Devolve quantos registros foram gravados (sem os ignorados pela deduplicação), alterados ou excluídos
+        with closing(self._conectar()) as conexao, conexao:
+            if operacao == "excluir":
+                parametros = [lote[0]["usuario"]]
+                return conexao.execute(f"DELETE FROM lancamentos WHERE usuario = ? AND {_em('id', [r['id'] for r in lote], parametros)}", parametros).rowcount
+            colunas = [coluna for coluna in COLUNAS_GRAVAVEIS if coluna in lote[0]]
+            if operacao == "atualizar":
+                atribuicoes = ", ".join(f"{coluna} = :{coluna}" for coluna in colunas if coluna != "usuario")
+                sql = f"UPDATE lancamentos SET {atribuicoes} WHERE id = :id AND usuario = :usuario"
+            elif operacao in ("inserir", "deduplicar"):
+                sql = f"INSERT INTO lancamentos ({', '.join(colunas)}) VALUES ({', '.join(':' + c for c in colunas)})"
+                if operacao == "deduplicar":
+                    # Registros cuja chave de deduplicação já existe são ignorados pelo banco
+                    sql += " ON CONFLICT (usuario, chave_dedup) DO NOTHING"
+            else:
+                raise ValueError(f"Operação desconhecida: {operacao}")
+            return conexao.executemany(sql, lote).rowcount
+
+    def resumir(self, usuario, bancos, tags, tipos, data_inicio, data_fim, termos=(), sem_valor="(sem valor)"):
+        """
+        Receitas, despesas (em centavos) e quantidade de lançamentos por mês e tag, calculadas no SQLite.
+        Bancos, tags e tipos vazios entram como sem_valor. Com termos, só as descrições que têm
+        todos eles, cada um como início de alguma palavra.
+        """
+        condicoes, parametros = self._filtros(usuario, data_inicio, data_fim)
+        for coluna, valores in (("banco", bancos), ("tag", tags), ("tipo_lancamento", tipos)):
+            parametros.append(sem_valor)
+            condicoes.append(_em(f"COALESCE({coluna}, ?)", list(valores), parametros))
+        for termo in termos:
+            condicoes.append("' ' || lower(descricao) LIKE ? ESCAPE '\\'")
+            parametros.append("% " + termo.replace("\\", "\\\\").replace("_", "\\_").replace("%", "\\%") + "%")
+        sql = (
+            "SELECT substr(data, 1, 7) AS mes, COALESCE(tag, ?) AS tag,"
+            " SUM(CASE WHEN valor > 0 THEN CAST(ROUND(valor * 100) AS INTEGER) ELSE 0 END) AS receitas,"
+            " SUM(CASE WHEN valor < 0 THEN CAST(ROUND(valor * 100) AS INTEGER) ELSE 0 END) AS despesas,"
+            " COUNT(*) AS quantidade"
+            f" FROM lancamentos WHERE data IS NOT NULL AND {' AND '.join(condicoes)} GROUP BY 1, 2"
+        )
+        with closing(self._conectar()) as conexao:
+            return [dict(linha) for linha in conexao.execute(sql, [sem_valor] + parametros)]
@@ -0,0 +1,330 @@
+"""
+Benchmarks do leitor de OFX, da normalização, da categorização, do salvamento/carga
+(com a tabela "lancamentos" em memória, sem rede) e das agregações dos relatórios
+(em pandas e no banco embutido em SQLite).
+
+Uso, a partir da raiz do repositório:
+    python -m benchmarks.executar                          # tamanhos padrão
+    python -m benchmarks.executar --tamanhos 1000 50000 --regras 100 10000
+    python -m benchmarks.executar --saida atual.json --comparar anterior.json
+
+Cada medida é a mediana de --repeticoes execuções. Com --saida, os resultados vão para um
+JSON junto com o commit atual; com --comparar, cada medida é comparada com um JSON anterior
+e as que ficaram mais lentas que a --tolerancia aparecem como regressão.
+"""
+import argparse
+import io
+import json
+import platform
+import statistics
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+import banco_dados
+import categorizacao
+import normalizacao
+from banco_local import ArmazenamentoSQLite
+from categorizacao import Categorizador
+from compactacao import compactar_historico
+from filtros import FiltroHistorico
+from importacao import simple_ofx_to_df
+from leitor_ofx import ler_extrato, ler_transacoes
+from resumos import ResumoMensal, totais, gastos_por_tag, receitas_despesas_por_mes
+
+from benchmarks.gerador_ofx import gerar_ofx, gerar_regras
+from benchmarks.supabase_falso import ClienteFalso
+
+USUARIO = "benchmark"
+TAMANHOS = [1_000, 10_000]
+QTDS_REGRAS = [100, 1_000]
+
+
+def _extrato(banco, tamanho):
+    return simple_ofx_to_df(io.BytesIO(gerar_ofx(banco, tamanho)), "C6" if banco == "C6" else "Banco do Brasil", Categorizador())
+
+
+def _descricoes(tamanho):
+    extrato = _extrato("BB", tamanho)
+    return extrato["Tipo Lançamento"] + " " + extrato["Descrição"]
+
+
+def _memos(tamanho):
+    return [t["memo"] for t in ler_transacoes(io.BytesIO(gerar_ofx("BB", tamanho)))]
+
+
+def _historico(tamanho):
+    linhas = []
+    for banco in ("BB", "C6"):
+        extrato = _extrato(banco, tamanho // 2)
+        linhas.append(extrato.drop(columns=["FITID", "Conta"]))
+    historico = pd.concat(linhas, ignore_index=True)
+    historico.index = pd.RangeIndex(1, len(historico) + 1, name="id")
+    return compactar_historico(historico)
+
+
+@contextmanager
+def _substituir(modulo, **atributos):
+    # Troca atributos do módulo durante o bloco e devolve os originais no fim, mesmo com erro
+    originais = {nome: getattr(modulo, nome) for nome in atributos}
+    for nome, valor in atributos.items():
+        setattr(modulo, nome, valor)
+    try:
+        yield
+    finally:
+        for nome, valor in originais.items():
+            setattr(modulo, nome, valor)
+
+
+def _usar_cliente(falso):
+    # banco_dados busca o cliente a cada operação; o benchmark troca o cliente real pelo falso durante o bloco
+    return _substituir(banco_dados, armazenamento=banco_dados.ArmazenamentoSupabase, cliente=lambda: falso)
+
+
+def _registros(historico):
+    registros = banco_dados.preparar_registros(USUARIO, historico.assign(Valor=historico["Valor"] / 100))
+    return [dict(registro, id=i) for i, registro in enumerate(registros, start=1)]
+
+
+# Cada benchmark recebe o tamanho e devolve a função a ser medida (a preparação não entra na medida)
+
+def _ler_ofx_regex(conteudo):
+    # Leitura do app antes do leitor_ofx (um findall dos blocos e buscas em cada bloco), como referência
+    transacoes = []
+    for bloco in re.findall(r"<STMTTRN>(.*?)</STMTTRN>", conteudo.decode("latin1"), re.DOTALL):
+        data = re.search(r"<DTPOSTED>(\d+)", bloco)
+        valor = re.search(r"<TRNAMT>(-?\d+\.\d+)", bloco)
+        memo = re.search(r"<MEMO>(.*)", bloco)
+        tipo = re.search(r"<TRNTYPE>([A-Z]+)", bloco)
+        transacoes.append({
+            "data": datetime.strptime(data.group(1)[:8], "%Y%m%d") if data else None,
+            "valor": float(valor.group(1)) if valor else 0.0,
+            "memo": memo.group(1).strip() if memo else "",
+            "tipo": tipo.group(1) if tipo else "",
+        })
+    return transacoes
+
+
+def bench_ler_ofx_regex_bb(tamanho):
+    conteudo = gerar_ofx("BB", tamanho)
+    return lambda: _ler_ofx_regex(conteudo)
+
+
+def bench_ler_ofx_bb(tamanho):
+    conteudo = gerar_ofx("BB", tamanho)
+    return lambda: sum(1 for _ in ler_transacoes(io.BytesIO(conteudo)))
+
+
+def bench_ler_extrato_bb(tamanho):
+    conteudo = gerar_ofx("BB", tamanho)
+    return lambda: ler_extrato(io.BytesIO(conteudo))
+
+
+def bench_simple_ofx_to_df_bb(tamanho):
+    conteudo = gerar_ofx("BB", tamanho)
+    return lambda: simple_ofx_to_df(io.BytesIO(conteudo), "Banco do Brasil", Categorizador())
+
+
+def bench_simple_ofx_to_df_c6(tamanho):
+    conteudo = gerar_ofx("C6", tamanho)
+    return lambda: simple_ofx_to_df(io.BytesIO(conteudo), "C6", Categorizador())
+
+
+def bench_normalizar_descricao(tamanho):
+    memos = _memos(tamanho)
+
+    def executar():
+        # Sem o cache, para medir a normalização em si
+        normalizacao._normalizar.cache_clear()
+        for memo in memos:
+            normalizacao.normalizar_descricao(memo)
+    return executar
+
+
+def bench_normalizar_serie(tamanho):
+    memos = pd.Series(_memos(tamanho))
+
+    def executar():
+        # Sem o cache, como em bench_normalizar_descricao
+        normalizacao._normalizar.cache_clear()
+        normalizacao.normalizar_serie(memos)
+    return executar
+
+
+def bench_extrair_tipo_e_descricao(tamanho):
+    memos = _memos(tamanho)
+
+    def executar():
+        normalizacao._normalizar.cache_clear()
+        for memo in memos:
+            normalizacao.extrair_tipo_e_descricao(memo)
+    return executar
+
+
+def _bench_categorizar(qtd_regras):
+    def bench(tamanho):
+        descricoes = _descricoes(tamanho)
+        regras = gerar_regras(qtd_regras)
+
+        def executar():
+            categorizacao._automato.cache_clear()
+            Categorizador(regras).categorizar_serie(descricoes)
+        return executar
+    return bench
+
+
+def bench_salvar_lancamentos(tamanho):
+    extrato = _extrato("BB", tamanho)
+    extrato["Data"] = extrato["Data"].dt.strftime("%d/%m/%Y")
+
+    def executar():
+        with _usar_cliente(ClienteFalso()):
+            banco_dados.salvar_lancamentos(USUARIO, extrato)
+    return executar
+
+
+def bench_carregar_historico(tamanho):
+    registros = _registros(_historico(tamanho))
+
+    def executar():
+        with _usar_cliente(ClienteFalso(registros)):
+            banco_dados.carregar_historico(USUARIO)
+    return executar
+
+
+def bench_resumo_mensal(tamanho):
+    historico = _historico(tamanho)
+    return lambda: ResumoMensal(historico)
+
+
+def bench_relatorio(tamanho):
+    # Filtro, consulta ao resumo e agregações dos gráficos, como numa interação com os filtros
+    historico = _historico(tamanho)
+    resumo = ResumoMensal(historico)
+    filtro = FiltroHistorico(historico)
+    inicio, fim = historico["Data"].min().date(), historico["Data"].max().date()
+
+    def executar():
+        linhas = filtro.filtrar(filtro.opcoes["Banco"], filtro.opcoes["Tag"], filtro.opcoes["Tipo Lançamento"], inicio, fim)
+        consulta = resumo.consultar(filtro.opcoes["Banco"], filtro.opcoes["Tag"], filtro.opcoes["Tipo Lançamento"], inicio, fim, linhas)
+        totais(consulta), gastos_por_tag(consulta), receitas_despesas_por_mes(consulta)
+    return executar
+
+
+def bench_relatorio_sqlite(tamanho):
+    # O mesmo relatório, com a agregação feita por uma consulta no banco embutido
+    historico = _historico(tamanho)
+    pasta = tempfile.TemporaryDirectory()
+    local = ArmazenamentoSQLite(os.path.join(pasta.name, "lancamentos.sqlite3"))
+    local.executar_lote(_registros(historico), "inserir")
+    filtro = FiltroHistorico(historico)
+    inicio, fim = historico["Data"].min().date(), historico["Data"].max().date()
+
+    def executar():
+        pasta  # a pasta temporária vive enquanto o benchmark existir
+        with _substituir(banco_dados, armazenamento=lambda: local):
+            consulta = banco_dados.resumir_historico(USUARIO, filtro.opcoes["Banco"], filtro.opcoes["Tag"], filtro.opcoes["Tipo Lançamento"], inicio, fim)
+        totais(consulta), gastos_por_tag(consulta), receitas_despesas_por_mes(consulta)
+    return executar
+
+
+def bench_filtro_historico(tamanho):
+    historico = _historico(tamanho)
+    return lambda: FiltroHistorico(historico)
+
+
+def listar_benchmarks(qtds_regras):
+    benchmarks = {
+        "ler_ofx_regex_bb": bench_ler_ofx_regex_bb,
+        "ler_ofx_bb": bench_ler_ofx_bb,
+        "ler_extrato_bb": bench_ler_extrato_bb,
+        "simple_ofx_to_df_bb": bench_simple_ofx_to_df_bb,
+        "simple_ofx_to_df_c6": bench_simple_ofx_to_df_c6,
+        "normalizar_descricao": bench_normalizar_descricao,
+        "normalizar_serie": bench_normalizar_serie,
+        "extrair_tipo_e_descricao": bench_extrair_tipo_e_descricao,
+    }
+    for qtd in qtds_regras:
+        benchmarks[f"categorizar_{qtd}_regras"] = _bench_categorizar(qtd)
+    benchmarks.update({
+        "salvar_lancamentos": bench_salvar_lancamentos,
+        "carregar_historico": bench_carregar_historico,
+        "resumo_mensal": bench_resumo_mensal,
+        "filtro_historico": bench_filtro_historico,
+        "relatorio": bench_relatorio,
+        "relatorio_sqlite": bench_relatorio_sqlite,
+    })
+    return benchmarks
+
+
+def medir(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos)
+
+
+def _commit_atual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks da importação, categorização, salvamento e relatórios.")
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=TAMANHOS, help="quantidades de lançamentos")
+    parser.add_argument("--regras", type=int, nargs="+", default=QTDS_REGRAS, help="quantidades de regras do usuário")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--filtro", default="", help="roda só os benchmarks cujo nome contém este texto")
+    parser.add_argument("--saida", help="arquivo JSON para gravar os resultados")
+    parser.add_argument("--comparar", help="arquivo JSON de uma execução anterior")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="aumento relativo considerado regressão")
+    args = parser.parse_args(argv)
+
+    anteriores = {}
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as arquivo:
+            anteriores = json.load(arquivo)["resultados"]
+
+    resultados = {}
+    regressoes = []
+    for nome, bench in listar_benchmarks(args.regras).items():
+        if args.filtro not in nome:
+            continue
+        for tamanho in args.tamanhos:
+            chave = f"{nome}[{tamanho}]"
+            segundos = medir(bench(tamanho), args.repeticoes)
+            resultados[chave] = segundos
+            linha = f"{chave:<45} {segundos * 1000:10.2f} ms"
+            if chave in anteriores:
+                razao = segundos / anteriores[chave]
+                linha += f"  {razao:5.2f}x"
+                if razao > 1 + args.tolerancia:
+                    linha += "  REGRESSÃO"
+                    regressoes.append(chave)
+            print(linha, flush=True)
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump({
+                "commit": _commit_atual(),
+                "python": platform.python_version(),
+                "pandas": pd.__version__,
+                "repeticoes": args.repeticoes,
+                "resultados": resultados,
+            }, arquivo, indent=2)
+    return 1 if regressoes else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
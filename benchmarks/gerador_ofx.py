@@ -0,0 +1,142 @@
+import random
+from datetime import date, timedelta
+
+# Estabelecimentos e pessoas usados nas descrições geradas
+ESTABELECIMENTOS = [
+    "Supermercado Zaffari", "Comercial Zaffari", "Padaria Centenario", "Farmacia Sao Joao",
+    "Drogaria Panvel", "Posto Ipiranga", "Uber Trip", "Ifood", "Netflix", "Spotify",
+    "Pet Shop Amigo", "Restaurante Sabor", "Loja Renner", "Mercado Livre", "Amazon",
+    "Hospital Moinhos", "Consultorio Dr Paulo", "Rge Sul", "Claro Telecom", "Ebanx",
+]
+PESSOAS = [
+    "Maria Silva", "Joao Souza", "Ana Pereira", "Carlos Lima", "Fernanda Costa",
+    "Paulo Santos", "Juliana Rocha", "Ricardo Alves", "Patricia Gomes", "Bruno Dias",
+]
+
+_CABECALHO_SGML = """OFXHEADER:100
+DATA:OFXSGML
+VERSION:102
+SECURITY:NONE
+ENCODING:{encoding}
+CHARSET:{charset}
+COMPRESSION:NONE
+OLDFILEUID:NONE
+NEWFILEUID:NONE
+
+<OFX>
+<BANKMSGSRSV1>
+<STMTTRNRS>
+<TRNUID>1
+<STMTRS>
+<CURDEF>BRL
+<BANKACCTFROM>
+<BANKID>{banco_id}
+<ACCTID>{conta}
+<ACCTTYPE>CHECKING
+</BANKACCTFROM>
+<BANKTRANLIST>
+<DTSTART>{inicio}
+<DTEND>{fim}
+"""
+_RODAPE_SGML = """</BANKTRANLIST>
+</STMTRS>
+</STMTTRNRS>
+</BANKMSGSRSV1>
+</OFX>
+"""
+_TRANSACAO = """<STMTTRN>
+<TRNTYPE>{tipo}
+<DTPOSTED>{data}000000[-3:BRT]
+<TRNAMT>{valor:.2f}
+<FITID>{fitid}
+<CHECKNUM>{fitid}
+<MEMO>{memo}
+</STMTTRN>
+"""
+
+
+def _memo_bb(rnd, valor, dia):
+    # Memos no estilo do Banco do Brasil: "Tipo - Detalhe - DD/MM HH:MM Beneficiário"
+    hora = f"{rnd.randint(0, 23):02d}:{rnd.randint(0, 59):02d}"
+    if valor > 0:
+        opcoes = [
+            f"Pix - Recebido - {dia:%d/%m} {hora} {rnd.choice(PESSOAS)}",
+            "BB Rende Fácil - Rende Facil",
+            f"Depósito Online TAA - {dia:%d%m}",
+        ]
+    else:
+        opcoes = [
+            f"Pix - Enviado - {dia:%d/%m} {hora} {rnd.choice(PESSOAS + ESTABELECIMENTOS)}",
+            f"Compra com Cartão - {dia:%d/%m} {hora} {rnd.choice(ESTABELECIMENTOS)}",
+            f"Pagamento de Boleto - {rnd.choice(ESTABELECIMENTOS)}",
+            "BB Rende Fácil - Rende Facil",
+        ]
+    return rnd.choice(opcoes)
+
+
+def _memo_c6(rnd, valor, dia):
+    # Memos no estilo do C6: texto corrido em maiúsculas, às vezes com data/hora e "memo" no meio
+    hora = f"{rnd.randint(0, 23):02d}{rnd.randint(0, 59):02d}"
+    if valor > 0:
+        opcoes = [
+            f"PIX RECEBIDO {dia:%d%m} {hora} {rnd.choice(PESSOAS).upper()}",
+            f"TED RECEBIDA {rnd.choice(PESSOAS).upper()}",
+        ]
+    else:
+        opcoes = [
+            f"PIX ENVIADO {dia:%d%m} {hora} {rnd.choice(PESSOAS + ESTABELECIMENTOS).upper()} RSMEMO",
+            f"{rnd.choice(ESTABELECIMENTOS).upper()} MEMO",
+            "PAGAMENTO DE BOLETO",
+            "PAGAMENTO FATURA CARTAO C6",
+        ]
+    return rnd.choice(opcoes)
+
+
+def gerar_ofx(banco, quantidade, semente=0, inicio=date(2020, 1, 1)):
+    """
+    Gera um extrato OFX 1.x (SGML) sintético, em bytes, com a quantidade de transações pedida.
+    banco é "BB" ou "C6": define o formato dos memos e o encoding do arquivo (latin1 no BB, UTF-8 no C6).
+    A mesma semente gera sempre o mesmo arquivo.
+    """
+    rnd = random.Random(semente)
+    c6 = banco.upper() == "C6"
+    memo = _memo_c6 if c6 else _memo_bb
+    dias = max(1, quantidade // 10)
+    partes = [_CABECALHO_SGML.format(
+        encoding="UTF-8" if c6 else "USASCII",
+        charset="NONE" if c6 else "1252",
+        banco_id="336" if c6 else "001",
+        conta=f"{rnd.randint(10000, 99999)}-{rnd.randint(0, 9)}",
+        inicio=f"{inicio:%Y%m%d}",
+        fim=f"{inicio + timedelta(days=dias):%Y%m%d}",
+    )]
+    for i in range(quantidade):
+        dia = inicio + timedelta(days=i * dias // max(quantidade, 1))
+        valor = round(rnd.uniform(-800, -5) if rnd.random() < 0.8 else rnd.uniform(50, 5000), 2)
+        partes.append(_TRANSACAO.format(
+            tipo="CREDIT" if valor > 0 else "DEBIT",
+            data=f"{dia:%Y%m%d}",
+            valor=valor,
+            fitid=f"{dia:%Y%m%d}{semente:04d}{i:07d}",
+            memo=memo(rnd, valor, dia),
+        ))
+    partes.append(_RODAPE_SGML)
+    return "".join(partes).encode("utf-8" if c6 else "latin1")
+
+
+def gerar_regras(quantidade, semente=0):
+    """
+    Gera regras do usuário (descrição normalizada -> tag) no formato de categorias_personalizadas.csv,
+    misturando descrições que aparecem nos extratos gerados com descrições que nunca aparecem.
+    """
+    rnd = random.Random(semente)
+    tags = ["Mercado", "Saúde", "Lazer", "Transporte", "Outros", "Pet-Shop", "Internet"]
+    nomes = [nome.lower() for nome in ESTABELECIMENTOS + PESSOAS]
+    regras = {}
+    while len(regras) < quantidade:
+        if rnd.random() < 0.3:
+            descricao = f"{rnd.choice(['pix enviado', 'compra com cartao'])} {rnd.choice(nomes)}"
+        else:
+            descricao = f"regra {len(regras)} {rnd.choice(nomes)} {rnd.randint(0, 10 ** 6)}"
+        regras[descricao] = rnd.choice(tags)
+    return regras
@@ -0,0 +1,171 @@
+import json
+import threading
+import time
+
+
+class _Resposta:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class _Consulta:
+    """
+    Imitação, em memória, do construtor de consultas do cliente do Supabase (postgrest),
+    com os métodos usados por banco_dados.py. Cada execute() conta como uma requisição.
+    """
+
+    def __init__(self, tabela):
+        self.tabela = tabela
+        self.operacao = "select"
+        self.colunas = None
+        self.filtros = []
+        self.ordem = None
+        self.limite = None
+        self.deslocamento = 0
+        self.contar = False
+        self.so_cabecalho = False
+        self.registros = None
+        self.conflito = None
+        self.ignorar_duplicados = False
+
+    def select(self, colunas="*", count=None, head=None):
+        self.colunas = None if colunas == "*" else colunas.split(",")
+        self.contar, self.so_cabecalho = count is not None, bool(head)
+        return self
+
+    def insert(self, registros):
+        self.operacao, self.registros = "insert", registros
+        return self
+
+    def upsert(self, registros, on_conflict="", ignore_duplicates=False):
+        self.operacao, self.registros = "upsert", registros
+        self.conflito, self.ignorar_duplicados = on_conflict, ignore_duplicates
+        return self
+
+    def delete(self):
+        self.operacao = "delete"
+        return self
+
+    def eq(self, coluna, valor):
+        self.filtros.append(lambda r: r.get(coluna) == valor)
+        return self
+
+    def gt(self, coluna, valor):
+        self.filtros.append(lambda r: r.get(coluna) is not None and r[coluna] > valor)
+        return self
+
+    def gte(self, coluna, valor):
+        self.filtros.append(lambda r: r.get(coluna) is not None and r[coluna] >= valor)
+        return self
+
+    def lte(self, coluna, valor):
+        self.filtros.append(lambda r: r.get(coluna) is not None and r[coluna] <= valor)
+        return self
+
+    def in_(self, coluna, valores):
+        valores = set(valores)
+        self.filtros.append(lambda r: r.get(coluna) in valores)
+        return self
+
+    def order(self, coluna):
+        self.ordem = coluna
+        return self
+
+    def limit(self, quantidade):
+        self.limite = quantidade
+        return self
+
+    def range(self, inicio, fim):
+        self.deslocamento, self.limite = inicio, fim - inicio + 1
+        return self
+
+    def _selecionadas(self):
+        return [r for r in self.tabela.linhas if all(filtro(r) for filtro in self.filtros)]
+
+    def execute(self):
+        # A latência corre fora da trava: requisições concorrentes esperam a rede ao mesmo tempo
+        if self.tabela.latencia:
+            time.sleep(self.tabela.latencia)
+        with self.tabela.trava:
+            self.tabela.requisicoes += 1
+            total = None
+            if self.operacao == "select":
+                linhas = self._selecionadas()
+                total = len(linhas) if self.contar else None
+                if self.ordem:
+                    linhas.sort(key=lambda r: r[self.ordem])
+                if self.limite is not None:
+                    linhas = linhas[self.deslocamento:self.deslocamento + self.limite]
+                if self.so_cabecalho:
+                    linhas = []
+                dados = [{c: r.get(c) for c in self.colunas} if self.colunas else dict(r) for r in linhas]
+            elif self.operacao == "delete":
+                removidas = self._selecionadas()
+                self.tabela.contar_edicoes(removidas)
+                ids = {r["id"] for r in removidas}
+                self.tabela.linhas = [r for r in self.tabela.linhas if r["id"] not in ids]
+                dados = removidas
+            else:
+                dados = self.tabela.gravar(self.registros, self.conflito, self.ignorar_duplicados)
+            # Tamanho do JSON que iria pela rede, para comparar o volume de dados entre versões
+            self.tabela.bytes += len(json.dumps(self.registros if self.registros is not None else dados, default=str))
+        return _Resposta(dados, total)
+
+
+class TabelaFalsa:
+    """
+    Tabela "lancamentos" em memória. latencia (em segundos) é somada a cada requisição,
+    para simular a ida e volta até o Supabase.
+    """
+
+    def __init__(self, linhas=None, latencia=0.0):
+        self.linhas = list(linhas or [])
+        self.latencia = latencia
+        self.proximo_id = max((r["id"] for r in self.linhas), default=0) + 1
+        self.requisicoes = 0
+        self.bytes = 0
+        self.trava = threading.Lock()
+        # Edições e exclusões por usuário, como o gatilho de migracoes/003_versoes_lancamentos.sql
+        self.edicoes = {}
+        self._chaves = {(r.get("usuario"), r.get("chave_dedup")) for r in self.linhas if r.get("chave_dedup")}
+
+    def contar_edicoes(self, linhas):
+        for linha in linhas:
+            self.edicoes[linha.get("usuario")] = self.edicoes.get(linha.get("usuario"), 0) + 1
+
+    def gravar(self, registros, conflito, ignorar_duplicados):
+        registros = registros if isinstance(registros, list) else [registros]
+        gravados = []
+        if conflito == "id":
+            por_id = {r["id"]: r for r in self.linhas}
+            for registro in registros:
+                por_id[registro["id"]].update(registro)
+                gravados.append(por_id[registro["id"]])
+            self.contar_edicoes(gravados)
+            return gravados
+        for registro in registros:
+            chave = (registro.get("usuario"), registro.get("chave_dedup"))
+            if ignorar_duplicados and registro.get("chave_dedup") and chave in self._chaves:
+                continue
+            linha = dict(registro, id=self.proximo_id)
+            self.proximo_id += 1
+            self.linhas.append(linha)
+            if registro.get("chave_dedup"):
+                self._chaves.add(chave)
+            gravados.append(linha)
+        return gravados
+
+
+class ClienteFalso:
+    # Substitui o cliente do Supabase: a tabela "lancamentos" e o contador de edições de cada usuário
+    def __init__(self, linhas=None, latencia=0.0):
+        self.lancamentos = TabelaFalsa(linhas, latencia)
+
+    def table(self, nome):
+        if nome == "versoes_lancamentos":
+            versoes = [{"id": i, "usuario": usuario, "edicoes": edicoes} for i, (usuario, edicoes) in enumerate(self.lancamentos.edicoes.items(), start=1)]
+            return _Consulta(TabelaFalsa(versoes, self.lancamentos.latencia))
+        if nome != "lancamentos":
+            raise KeyError(nome)
+        return _Consulta(self.lancamentos)
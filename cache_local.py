@@ -0,0 +1,135 @@
+import hashlib
+import os
+import tempfile
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from banco_dados import carregar_historico, versao_edicoes
+from compactacao import unir_historicos
+
+# Pasta com uma cópia local do histórico de cada usuário, em arquivos Arrow (mapeados em memória na leitura)
+DIRETORIO_CACHE = os.getenv("CACHE_HISTORICO_DIR", ".cache_historico")
+# Metadado do arquivo com o contador de edições do banco (banco_dados.versao_edicoes) na sincronização
+_METADADO_VERSAO = b"versao_edicoes"
+
+
+def _caminho(usuario):
+    # O nome do arquivo é um hash do usuário, para não depender dos caracteres do login
+    nome = hashlib.sha1(str(usuario).encode("utf-8")).hexdigest()
+    return os.path.join(DIRETORIO_CACHE, f"{nome}.arrow")
+
+
+def ler_cache(usuario):
+    """
+    Abre o histórico salvo localmente para o usuário: (histórico, contador de edições de quando
+    foi sincronizado), ou None se não houver.
+    O arquivo é mapeado em memória, sem copiar o arquivo inteiro para um buffer antes da conversão.
+    """
+    caminho = _caminho(usuario)
+    if not os.path.exists(caminho):
+        return None
+    with pa.memory_map(caminho, "r") as arquivo:
+        tabela = pa.ipc.open_file(arquivo).read_all()
+    versao = (tabela.schema.metadata or {}).get(_METADADO_VERSAO)
+    # O Arrow devolve a descrição como string do Python; volta para a representação compacta.
+    # rename_axis: cópias gravadas a partir de um histórico vazio perderam o nome do índice
+    df = tabela.to_pandas().astype({"Descrição": "string[pyarrow]"}).rename_axis("id")
+    return df, int(versao) if versao is not None else None
+
+
+def gravar_cache(usuario, df, versao):
+    # Grava num arquivo temporário e troca de uma vez, para nunca deixar um arquivo pela metade
+    os.makedirs(DIRETORIO_CACHE, exist_ok=True)
+    tabela = pa.Table.from_pandas(df)
+    tabela = tabela.replace_schema_metadata({**(tabela.schema.metadata or {}), _METADADO_VERSAO: str(versao).encode()})
+    descritor, temporario = tempfile.mkstemp(dir=DIRETORIO_CACHE, suffix=".tmp")
+    os.close(descritor)
+    try:
+        feather.write_feather(tabela, temporario, compression="uncompressed")
+        os.replace(temporario, _caminho(usuario))
+    except BaseException:
+        os.remove(temporario)
+        raise
+
+
+def descartar_cache(usuario):
+    # Apaga a cópia local; a próxima carga busca o histórico inteiro no Supabase
+    try:
+        os.remove(_caminho(usuario))
+    except FileNotFoundError:
+        pass
+
+
+def sincronizar_historico(usuario, carregar=carregar_historico, versao=versao_edicoes):
+    """
+    Devolve o histórico completo do usuário a partir da cópia local, buscando no Supabase
+    só os lançamentos com id maior que o maior id já salvo (a marca d'água).
+    A carga por id não vê linhas alteradas ou excluídas: se o contador de edições do banco mudou
+    desde a sincronização da cópia (edição de outra sessão ou de fora do app; as do próprio app
+    são levadas para a cópia por registrar_edicao), a cópia é descartada e o histórico vem inteiro.
+    Retorna (historico, novos, erro): novos são os lançamentos trazidos nesta sincronização, ou None
+    quando o histórico veio inteiro; erro é a falha de acesso ao Supabase, quando o histórico
+    veio só da cópia local.
+    """
+    lido = ler_cache(usuario)
+    try:
+        # Lido antes das linhas: uma edição no meio da carga só faz a próxima sincronização recarregar
+        atual = versao(usuario)
+        local = lido[0] if lido is not None and lido[1] == atual else None
+        marca = int(local.index.max()) if local is not None and not local.empty else None
+        novos = carregar(usuario, a_partir_do_id=marca)
+    except Exception as e:
+        if lido is None:
+            raise
+        return lido[0], lido[0].iloc[:0], e
+    if local is None:
+        gravar_cache(usuario, novos, atual)
+        return novos, None, None
+    if novos.empty:
+        return local, novos, None
+    historico = novos if local.empty else unir_historicos([local, novos])
+    gravar_cache(usuario, historico, atual)
+    return historico, novos, None
+
+
+def registrar_edicao(usuario, alterados, ids_excluidos, editados, versao=versao_edicoes):
+    """
+    Leva para a cópia local uma edição do histórico gravada por este app (alterados no formato do
+    histórico, ids_excluidos) e guarda o contador de edições de depois da gravação, para que as
+    alterações do próprio app não façam a próxima sincronização recarregar tudo.
+    editados é quantas linhas o banco alterou ou excluiu (somado dos lotes). A cópia só é mantida
+    se todas foram alteradas/excluídas e o contador avançou exatamente esse tanto desde a
+    sincronização; do contrário, algo mudou fora desta gravação e a cópia é descartada.
+    Retorna True se a cópia foi mantida.
+    """
+    lido = ler_cache(usuario)
+    if lido is None:
+        return False
+    local, sincronizada = lido
+    ids = list(alterados.index) + list(ids_excluidos)
+    try:
+        atual = versao(usuario)
+    except Exception:
+        # Sem o contador não dá para saber se houve outras edições
+        atual = None
+    todas_na_copia = local.index.isin(ids).sum() == len(ids)
+    if sincronizada is None or editados != len(ids) or atual != sincronizada + editados or not todas_na_copia:
+        descartar_cache(usuario)
+        return False
+    restantes = local.drop(index=ids)
+    gravar_cache(usuario, unir_historicos([restantes, alterados[restantes.columns]]).sort_index(), atual)
+    return True
+
+
+def filtrar_carga(historico, data_inicio=None, data_fim=None, bancos=None):
+    # Mesmo recorte que carregar_historico aplica na consulta, feito sobre o histórico local
+    mascara = pd.Series(True, index=historico.index)
+    if data_inicio is not None:
+        mascara &= historico["Data"] >= pd.Timestamp(data_inicio)
+    if data_fim is not None:
+        mascara &= historico["Data"] <= pd.Timestamp(data_fim)
+    if bancos is not None:
+        mascara &= historico["Banco"].isin(list(bancos))
+    return historico[mascara]
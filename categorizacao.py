@@ -0,0 +1,169 @@
+import os
+from collections import deque
+from functools import lru_cache
+
+import pandas as pd
+
+from normalizacao import normalizar_descricao, normalizar_serie
+from similaridade import LIMIAR_CONFIANCA
+
+CATEGORIAS = {
+    "aluguel": "Aluguel",
+    "imovel": "Aluguel",
+    "supermercado": "Mercado",
+    "mercado": "Mercado",
+    "padaria": "Mercado",
+    "farmacia": "Saúde",
+    "droga": "Saúde",
+    "hospital": "Saúde",
+    "consultorio": "Saúde",
+    "saude": "Saúde",
+    "bb rende fácil": "Investimento Automático",
+    "bb rf ref di": "Investimento Automático",
+    "rende facil": "Investimento Automático",
+    "depósito online taa": "Depósito Caixa Eletrônico",
+    "atm": "Depósito Caixa Eletrônico",
+    "samantha treib": "Pensão",
+    "rge": "Energia Elétrica",
+    "ebanx": "Lazer",
+    "pix - recebido": "PIX Recebimento",
+    "comercial zaffari": "Mercado",
+    "telecom": "Internet",
+    "pet": "Pet-Shop",
+    "impostos": "Impostos",
+    "posto": "Veículo",
+    "seguros": "Seguros",
+    "seguro": "Seguros",
+    "tarifa": "Tarifa",
+    "não identificado": "Não identificado",
+    "compras": "Compras",
+    "desenvolvimento h": "Saúde",
+    "regis gruber leivas": "Mesada",
+    "colegio maua": "Educacao",
+    "transferência entre contas": "Transferência Pessoal",
+    "empréstimo": "Empréstimo",
+    "vestuário": "Vestuário",
+    "borba imoveis": "Aluguel",
+    "manutencao": "Manutenção"
+}
+
+
+class _AutomatoPalavras:
+    """
+    Autômato de Aho-Corasick sobre as palavras-chave, que encontra todas as palavras
+    contidas no texto numa única passada. Cada palavra tem uma prioridade (a sua posição
+    na lista) e a busca devolve a de menor prioridade encontrada, igual a testar as
+    palavras em ordem com "palavra in texto".
+    """
+
+    def __init__(self, palavras):
+        sem_saida = len(palavras)
+        self.transicoes = [{}]
+        self.falhas = [0]
+        self.saidas = [sem_saida]
+        for prioridade, palavra in enumerate(palavras):
+            estado = 0
+            for caractere in palavra:
+                proximo = self.transicoes[estado].get(caractere)
+                if proximo is None:
+                    proximo = len(self.transicoes)
+                    self.transicoes.append({})
+                    self.falhas.append(0)
+                    self.saidas.append(sem_saida)
+                    self.transicoes[estado][caractere] = proximo
+                estado = proximo
+            self.saidas[estado] = min(self.saidas[estado], prioridade)
+
+        # Liga cada estado ao maior sufixo que também é prefixo de alguma palavra
+        fila = deque(self.transicoes[0].values())
+        while fila:
+            estado = fila.popleft()
+            for caractere, proximo in self.transicoes[estado].items():
+                falha = self.falhas[estado]
+                while falha and caractere not in self.transicoes[falha]:
+                    falha = self.falhas[falha]
+                self.falhas[proximo] = self.transicoes[falha].get(caractere, 0)
+                self.saidas[proximo] = min(self.saidas[proximo], self.saidas[self.falhas[proximo]])
+                fila.append(proximo)
+        self.sem_saida = sem_saida
+
+    def buscar(self, texto):
+        # Retorna a prioridade da primeira palavra (na ordem da lista) contida no texto, ou None
+        transicoes, falhas, saidas = self.transicoes, self.falhas, self.saidas
+        melhor = self.sem_saida
+        estado = 0
+        for caractere in texto:
+            while estado and caractere not in transicoes[estado]:
+                estado = falhas[estado]
+            estado = transicoes[estado].get(caractere, 0)
+            if saidas[estado] < melhor:
+                melhor = saidas[estado]
+                if melhor == 0:
+                    break
+        return melhor if melhor < self.sem_saida else None
+
+
+@lru_cache(maxsize=8)
+def _automato(palavras):
+    # O autômato é montado uma vez por conjunto de palavras-chave e reaproveitado entre execuções
+    return _AutomatoPalavras(palavras)
+
+
+class Categorizador:
+    """
+    Categoriza descrições de lançamentos. Primeiro procura a descrição normalizada nas regras
+    do usuário (busca direta no dicionário); depois procura as palavras-chave de CATEGORIAS
+    contidas na descrição, valendo a primeira na ordem do dicionário. Sem correspondência, "Outros".
+    Com um índice de similaridade (similaridade.IndiceSimilaridade), as descrições que ficariam em
+    "Outros" recebem a tag das descrições já categorizadas mais parecidas, se a confiança passar do limiar.
+    """
+
+    def __init__(self, regras_usuario=None, categorias=CATEGORIAS, indice=None, limiar=LIMIAR_CONFIANCA):
+        self.regras_usuario = regras_usuario or {}
+        self.indice = indice if indice else None
+        self.limiar = limiar
+        self.palavras = tuple(categorias)
+        self.tags = [categorias[palavra] for palavra in self.palavras]
+        self.automato = _automato(self.palavras)
+
+    def categorizar_normalizada(self, desc_norm):
+        # Primeiro verifica regras personalizadas (normalizadas)
+        if desc_norm in self.regras_usuario:
+            return self.regras_usuario[desc_norm]
+        # Depois no dicionário fixo
+        prioridade = self.automato.buscar(desc_norm)
+        return self.tags[prioridade] if prioridade is not None else "Outros"
+
+    def categorizar(self, descricao):
+        return self.categorizar_normalizada(normalizar_descricao(descricao))
+
+    def categorizar_serie(self, serie):
+        # Categoriza uma coluna inteira, cada descrição distinta uma única vez
+        return self.categorizar_com_confianca(serie)[0]
+
+    def categorizar_com_confianca(self, serie):
+        """
+        Como categorizar_serie, devolvendo também a confiança de cada tag sugerida por similaridade
+        (NaN nas tags vindas das regras, das palavras-chave ou que ficaram em "Outros").
+        As descrições sem regra são consultadas no índice todas juntas, numa única chamada.
+        """
+        tags = {desc: self.categorizar(desc) for desc in serie.unique()}
+        confiancas = {}
+        if self.indice is not None:
+            outras = [desc for desc, tag in tags.items() if tag == "Outros"]
+            sugeridas, valores = self.indice.sugerir([normalizar_descricao(desc) for desc in outras])
+            for desc, tag, confianca in zip(outras, sugeridas, valores):
+                if tag is not None and confianca >= self.limiar:
+                    tags[desc] = tag
+                    confiancas[desc] = round(float(confianca), 2)
+        return serie.map(tags), serie.map(confiancas).astype(float)
+
+
+def carregar_regras(caminho):
+    # Regras do usuário (descrição normalizada -> tag) salvas em CSV com as colunas descricao e tag
+    if not os.path.exists(caminho):
+        return {}
+    df_regras = pd.read_csv(caminho)
+    # Normaliza as descrições ao carregar
+    df_regras['descricao'] = normalizar_serie(df_regras['descricao'])
+    return dict(zip(df_regras['descricao'], df_regras['tag']))
@@ -0,0 +1,48 @@
+import pandas as pd
+
+# Colunas com poucos valores distintos, guardadas como categorias
+COLUNAS_CATEGORICAS = ["Banco", "Tag", "Tipo Lançamento"]
+CENTAVOS = 100
+
+
+def compactar_historico(df):
+    """
+    Converte o histórico para a representação compacta usada em memória: Banco, Tag e
+    Tipo Lançamento como categorias, Descrição como string do Arrow e Valor como inteiro
+    em centavos (o que também deixa as somas exatas).
+    """
+    valores = pd.to_numeric(df["Valor"], errors="coerce").fillna(0)
+    return df.astype({coluna: "category" for coluna in COLUNAS_CATEGORICAS}).assign(**{
+        "Descrição": df["Descrição"].astype("string[pyarrow]"),
+        "Valor": (valores * CENTAVOS).round().astype("int64"),
+    })
+
+
+def unir_historicos(partes):
+    """
+    Junta partes do histórico já compactado (ex.: histórico em cache e lançamentos novos).
+    Categorias diferentes viram texto no concat, então os tipos compactos são refeitos.
+    Partes vazias ficam de fora (o concat com elas perde o nome do índice, o id).
+    """
+    com_linhas = [parte for parte in partes if not parte.empty]
+    df = pd.concat(com_linhas or partes[:1]).rename_axis("id")
+    tipos = {coluna: "category" for coluna in COLUNAS_CATEGORICAS}
+    tipos.update({"Descrição": "string[pyarrow]", "Valor": "int64"})
+    return df.assign(Valor=df["Valor"].fillna(0)).astype(tipos)
+
+
+def valores_em_reais(df):
+    # Versão do histórico para edição: Valor em reais e colunas de categoria como texto livre
+    return df.astype({coluna: object for coluna in COLUNAS_CATEGORICAS}).assign(
+        Valor=df["Valor"] / CENTAVOS
+    )
+
+
+def valores_em_centavos(df):
+    # Volta o Valor editado (em reais) para centavos
+    valores = pd.to_numeric(df["Valor"], errors="coerce")
+    return df.assign(Valor=(valores * CENTAVOS).round().astype("Int64"))
+
+
+def memoria_em_bytes(df):
+    return int(df.memory_usage(deep=True).sum())
@@ -0,0 +1,140 @@
+import copy
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+import yaml
+from yaml.loader import SafeLoader
+from streamlit_authenticator import Hasher
+
+try:
+    import fcntl
+except ImportError:
+    # Sem fcntl (Windows), as gravações só são serializadas entre as sessões do mesmo processo
+    fcntl = None
+
+ARQUIVO_CONFIG = "config.yaml"
+CONFIG_PADRAO = {
+    "credentials": {"usernames": {}},
+    "cookie": {"expiry_days": 30, "key": "abcdef", "name": "app_financas"},
+}
+# Cálculos de bcrypt (login e cadastro) ao mesmo tempo no processo; cada um ocupa um núcleo por ~0,25 s
+BCRYPT_SIMULTANEOS = min(2, os.cpu_count() or 1)
+
+# Configuração já lida neste processo: caminho -> (mtime_ns, tamanho, config)
+_cache = {}
+_trava = threading.Lock()
+limite_bcrypt = threading.BoundedSemaphore(BCRYPT_SIMULTANEOS)
+
+
+def limitar_verificacao(authenticator):
+    """
+    Faz a verificação da senha do login deste Authenticate respeitar o limite de bcrypt do processo.
+    Só o bcrypt ocupa o limite; o resto do login (formulário, cookie) roda livre. A verificação é
+    envolvida só nesta instância (nada muda na classe da biblioteca), no modelo de autenticação da
+    versão fixada em requirements.txt (0.4.2); se ele não existir, o limite vale para o login inteiro.
+    """
+    modelo = getattr(getattr(authenticator, "authentication_controller", None), "authentication_model", None)
+    alvo, nome = (modelo, "check_credentials") if hasattr(modelo, "check_credentials") else (authenticator, "login")
+    verificar = getattr(alvo, nome)
+
+    def verificar_limitada(*args, **kwargs):
+        with limite_bcrypt:
+            return verificar(*args, **kwargs)
+    setattr(alvo, nome, verificar_limitada)
+    return authenticator
+
+
+@contextmanager
+def _trava_arquivo(caminho):
+    # Trava entre processos num arquivo ao lado do config (o config em si é trocado a cada gravação)
+    with _trava, open(caminho + ".lock", "a") as arquivo:
+        if fcntl is not None:
+            fcntl.flock(arquivo, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(arquivo, fcntl.LOCK_UN)
+
+
+def _versao(caminho):
+    try:
+        estado = os.stat(caminho)
+    except FileNotFoundError:
+        return None
+    return estado.st_mtime_ns, estado.st_size
+
+
+def _ler(caminho):
+    with open(caminho) as arquivo:
+        config = yaml.load(arquivo, Loader=SafeLoader)
+    # Senhas em texto puro (ex.: usuário incluído à mão no arquivo) são criptografadas uma vez, só em memória,
+    # para o Authenticate não refazer o bcrypt de cada uma a cada execução do script
+    usuarios = config["credentials"]["usernames"] or {}
+    if any("password" in dados and not Hasher.is_hash(dados["password"]) for dados in usuarios.values()):
+        with limite_bcrypt:
+            Hasher.hash_passwords(config["credentials"])
+    return config
+
+
+def _gravar(caminho, config):
+    # Grava num arquivo temporário e troca de uma vez, para nunca deixar um arquivo pela metade
+    descritor, temporario = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(caminho)), suffix=".tmp")
+    try:
+        with os.fdopen(descritor, "w") as arquivo:
+            yaml.dump(config, arquivo)
+        os.replace(temporario, caminho)
+    except BaseException:
+        os.remove(temporario)
+        raise
+    # A próxima leitura relê o arquivo gravado
+    _cache.pop(caminho, None)
+
+
+def carregar_config(caminho=ARQUIVO_CONFIG):
+    """
+    Devolve a configuração de login (credenciais e cookie). O arquivo só é lido de novo quando
+    muda (data de modificação ou tamanho), ex.: cadastro feito por outra sessão ou processo.
+    Cada chamada recebe uma cópia, já que o Authenticate altera as credenciais recebidas.
+    """
+    versao = _versao(caminho)
+    with _trava:
+        em_cache = _cache.get(caminho)
+        if versao is not None and em_cache is not None and em_cache[:2] == versao:
+            return copy.deepcopy(em_cache[2])
+    if versao is None:
+        with _trava_arquivo(caminho):
+            if _versao(caminho) is None:
+                _gravar(caminho, copy.deepcopy(CONFIG_PADRAO))
+    config = _ler(caminho)
+    with _trava:
+        # A versão lida antes da leitura: se o arquivo mudou no meio, a próxima chamada lê de novo
+        _cache[caminho] = (*(versao or _versao(caminho)), config)
+        return copy.deepcopy(config)
+
+
+def gerar_hash(senha):
+    # bcrypt da senha nova, respeitando o limite de cálculos simultâneos
+    with limite_bcrypt:
+        return Hasher.hash(senha)
+
+
+def cadastrar_usuario(usuario, nome, senha_hash, caminho=ARQUIVO_CONFIG):
+    """
+    Inclui o usuário no arquivo de configuração. Lê o arquivo atual dentro da trava, então cadastros
+    simultâneos (de qualquer sessão ou processo) não apagam um ao outro.
+    Retorna False, sem gravar, se o usuário já existe.
+    """
+    carregar_config(caminho)
+    with _trava_arquivo(caminho):
+        with open(caminho) as arquivo:
+            config = yaml.load(arquivo, Loader=SafeLoader)
+        usuarios = config["credentials"]["usernames"] or {}
+        if usuario in usuarios:
+            return False
+        usuarios[usuario] = {"name": nome, "password": senha_hash}
+        config["credentials"]["usernames"] = usuarios
+        _gravar(caminho, config)
+    return True
@@ -0,0 +1,44 @@
+import hashlib
+
+import pandas as pd
+
+from normalizacao import normalizar_serie
+
+
+def calcular_chaves(registros, fitids=None, contas=None, arquivos=None):
+    """
+    Calcula a chave de deduplicação de cada registro da tabela "lancamentos".
+    Quando o OFX traz FITID, a chave é o próprio FITID (junto com o banco e a conta); sem FITID,
+    é um hash de usuário, banco, conta, data, valor e descrição normalizada.
+    Lançamentos idênticos no mesmo extrato (ex.: duas compras iguais no mesmo dia) recebem o
+    número da repetição na chave ("#1", "#2"...); com arquivos, a contagem recomeça em cada
+    arquivo, para que extratos sobrepostos importados juntos continuem sendo deduplicados.
+    registros precisa das colunas usuario, banco, data (AAAA-MM-DD), valor, tipo_lancamento e descricao.
+    """
+    contas = (contas.reindex(registros.index) if contas is not None else pd.Series(None, index=registros.index, dtype=object))
+    contas = contas.fillna("").astype(str).str.strip()
+    bancos = registros["banco"].fillna("").astype(str)
+    descricoes = normalizar_serie(
+        (registros["tipo_lancamento"].fillna("").astype(str) + " " + registros["descricao"].fillna("").astype(str)).str.strip()
+    )
+    conteudo = (
+        registros["usuario"].astype(str) + "|" +
+        bancos + "|" +
+        contas + "|" +
+        registros["data"].astype(str) + "|" +
+        registros["valor"].map("{:.2f}".format) + "|" +
+        descricoes
+    )
+    chaves = pd.Series(
+        ["hash:" + hashlib.sha1(texto.encode("utf-8")).hexdigest() for texto in conteudo],
+        index=registros.index
+    )
+    if fitids is not None:
+        fitids = fitids.reindex(registros.index)
+        com_fitid = fitids.notna() & (fitids.astype(str).str.strip() != "")
+        chaves[com_fitid] = "fitid:" + bancos[com_fitid] + ":" + contas[com_fitid] + ":" + fitids[com_fitid].astype(str).str.strip()
+    grupos = [chaves] if arquivos is None else [chaves, arquivos.reindex(registros.index).fillna("")]
+    repeticao = chaves.groupby(grupos, sort=False).cumcount()
+    repetidas = repeticao > 0
+    chaves[repetidas] = chaves[repetidas] + "#" + repeticao[repetidas].astype(str)
+    return chaves
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+from compactacao import CENTAVOS
+
+# Opções de linhas por página das tabelas do histórico
+TAMANHOS_PAGINA = [50, 100, 500, 1000]
+# Separador de milhar: insere um ponto antes de cada grupo de três dígitos
+_MILHAR = r"\B(?=(\d{3})+(?!\d))"
+
+
+def formatar_reais(valores, centavos=False):
+    """
+    Formata uma coluna de valores no padrão brasileiro ("R$ 1.234,56", "R$ -12,50"),
+    com operações vetorizadas na coluna inteira. Valores vazios ou inválidos viram "".
+    Com centavos, os valores vêm em centavos (como no histórico compacto).
+    """
+    numeros = pd.to_numeric(pd.Series(valores), errors="coerce")
+    if not centavos:
+        numeros = numeros * CENTAVOS
+    validos = numeros.notna()
+    total = numeros.fillna(0).round().astype("int64")
+    absoluto = total.abs()
+    inteiros = (absoluto // CENTAVOS).astype(str).str.replace(_MILHAR, ".", regex=True)
+    decimais = (absoluto % CENTAVOS).astype(str).str.zfill(2)
+    sinal = pd.Series(np.where(total < 0, "-", ""), index=total.index)
+    texto = "R$ " + sinal + inteiros + "," + decimais
+    return texto.where(validos, "")
+
+
+def formatar_datas(datas, dayfirst=False):
+    # Datas no formato DD/MM/AAAA; datas inválidas viram ""
+    return pd.to_datetime(datas, dayfirst=dayfirst, errors="coerce").dt.strftime("%d/%m/%Y").fillna("")
+
+
+def formatar_lancamentos(df, centavos=True):
+    # Versão para exibição dos lançamentos, com Valor e Data já formatados
+    return df.assign(Valor=formatar_reais(df["Valor"], centavos), Data=formatar_datas(df["Data"]))
+
+
+def total_paginas(quantidade, tamanho_pagina):
+    return max(1, -(-quantidade // tamanho_pagina))
+
+
+def pagina(df, numero, tamanho_pagina):
+    # Linhas da página informada (a primeira página é a 1)
+    inicio = (numero - 1) * tamanho_pagina
+    return df.iloc[inicio:inicio + tamanho_pagina]
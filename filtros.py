@@ -0,0 +1,90 @@
+import re
+from bisect import bisect_left
+
+import numpy as np
+import pandas as pd
+
+COLUNAS_CATEGORICAS = ["Banco", "Tag", "Tipo Lançamento"]
+_PALAVRA = re.compile(r"\w+")
+
+
+def palavras(texto):
+    # Palavras de um texto em minúsculas, como são comparadas na busca por palavra
+    return _PALAVRA.findall(str(texto).lower())
+
+
+class FiltroHistorico:
+    """
+    Índices do histórico para os "Filtros do Histórico", montados uma vez por histórico carregado:
+    - as linhas ficam ordenadas por data, e o período vira um corte com searchsorted;
+    - Banco, Tag e Tipo Lançamento viram códigos inteiros, e cada filtro é uma tabela de booleanos por código;
+    - a busca por palavra usa um índice invertido das palavras das descrições.
+    """
+
+    def __init__(self, historico):
+        # Códigos calculados na ordem original, para as opções dos filtros saírem na mesma ordem de antes
+        codigos = {}
+        self.opcoes = {}
+        for coluna in COLUNAS_CATEGORICAS:
+            codigos[coluna], unicos = pd.factorize(historico[coluna], use_na_sentinel=False)
+            self.opcoes[coluna] = list(unicos)
+        codigos_desc, descricoes = pd.factorize(historico["Descrição"], use_na_sentinel=True)
+
+        ordem = np.argsort(historico["Data"].to_numpy(), kind="stable")
+        self.linhas = historico.iloc[ordem]
+        self.datas = self.linhas["Data"].to_numpy()
+        self.codigos = {coluna: codigos[coluna][ordem] for coluna in COLUNAS_CATEGORICAS}
+        self.codigos_desc = codigos_desc[ordem]
+        self.qtd_descricoes = len(descricoes)
+
+        # Índice invertido: palavra -> códigos das descrições que contêm a palavra
+        indice = {}
+        for codigo, descricao in enumerate(descricoes):
+            for palavra in set(palavras(descricao)):
+                indice.setdefault(palavra, []).append(codigo)
+        self.palavras = sorted(indice)
+        self.indice = {palavra: np.array(codigos_palavra) for palavra, codigos_palavra in indice.items()}
+
+    def _descricoes_com(self, termo):
+        # Códigos das descrições com alguma palavra que começa com o termo (busca enquanto digita)
+        encontrados = []
+        posicao = bisect_left(self.palavras, termo)
+        while posicao < len(self.palavras) and self.palavras[posicao].startswith(termo):
+            encontrados.append(self.indice[self.palavras[posicao]])
+            posicao += 1
+        return np.concatenate(encontrados) if encontrados else np.array([], dtype=int)
+
+    def _permitidos(self, coluna, selecionados):
+        opcoes = self.opcoes[coluna]
+        permitidos = np.zeros(len(opcoes), dtype=bool)
+        selecionados = list(selecionados)
+        for codigo, valor in enumerate(opcoes):
+            permitidos[codigo] = valor in selecionados or (pd.isna(valor) and any(pd.isna(s) for s in selecionados))
+        return permitidos
+
+    def filtrar(self, bancos, tags, tipos, data_inicio, data_fim, texto=""):
+        """
+        Devolve os lançamentos dos bancos, tags e tipos selecionados no período, ordenados por data.
+        Com texto, mantém só as descrições que têm todas as palavras buscadas (cada uma como
+        início de alguma palavra da descrição, sem diferenciar maiúsculas).
+        """
+        inicio = np.searchsorted(self.datas, np.datetime64(pd.Timestamp(data_inicio)), side="left")
+        # Data inicial depois da final: período vazio
+        fim = max(np.searchsorted(self.datas, np.datetime64(pd.Timestamp(data_fim)), side="right"), inicio)
+
+        mascara = np.ones(fim - inicio, dtype=bool)
+        for coluna, selecionados in zip(COLUNAS_CATEGORICAS, (bancos, tags, tipos)):
+            mascara &= self._permitidos(coluna, selecionados)[self.codigos[coluna][inicio:fim]]
+
+        termos = palavras(texto)
+        if termos:
+            permitidas = np.ones(self.qtd_descricoes + 1, dtype=bool)
+            for termo in termos:
+                com_termo = np.zeros(self.qtd_descricoes + 1, dtype=bool)
+                com_termo[self._descricoes_com(termo)] = True
+                permitidas &= com_termo
+            # O último código (-1) é o das descrições vazias, que nunca batem com a busca
+            permitidas[-1] = False
+            mascara &= permitidas[self.codigos_desc[inicio:fim]]
+
+        return self.linhas.iloc[inicio:fim][mascara]
@@ -0,0 +1,70 @@
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+from matplotlib.figure import Figure
+
+# Quantidade máxima de imagens guardadas no cache (compartilhado por todas as sessões)
+MAX_GRAFICOS = 64
+
+_cache = OrderedDict()
+_trava = threading.Lock()
+
+
+def _chave(tipo, dados):
+    # Hash do conteúdo agregado (valores e rótulos) que gera o gráfico
+    conteudo = pd.util.hash_pandas_object(dados, index=True).to_numpy().tobytes()
+    if isinstance(dados, pd.DataFrame):
+        conteudo += "|".join(map(str, dados.columns)).encode("utf-8")
+    return tipo, hashlib.sha1(conteudo).hexdigest()
+
+
+def _renderizar(tipo, dados, desenhar):
+    """
+    Devolve o PNG do gráfico, renderizando só quando os dados mudaram.
+    As figuras são criadas sem pyplot (nada fica registrado no estado global do matplotlib)
+    e descartadas logo depois de salvas; o cache descarta as imagens menos usadas.
+    """
+    chave = _chave(tipo, dados)
+    with _trava:
+        if chave in _cache:
+            _cache.move_to_end(chave)
+            return _cache[chave]
+    fig = Figure()
+    desenhar(fig.subplots(), dados)
+    saida = io.BytesIO()
+    fig.savefig(saida, format="png", bbox_inches="tight")
+    fig.clear()
+    imagem = saida.getvalue()
+    with _trava:
+        _cache[chave] = imagem
+        while len(_cache) > MAX_GRAFICOS:
+            _cache.popitem(last=False)
+    return imagem
+
+
+def _desenhar_pizza(ax, cat_gastos):
+    ax.pie(cat_gastos.abs(), labels=cat_gastos.index, autopct='%1.1f%%', startangle=90)
+    ax.axis('equal')
+
+
+def _desenhar_linhas(ax, df_bar):
+    ax.plot(df_bar.index, df_bar['Receitas'], marker='o', label='Receitas', color='green')
+    ax.plot(df_bar.index, df_bar['Despesas'].abs(), marker='o', label='Despesas', color='red')
+    ax.set_xlabel("Mês/Ano")
+    ax.set_ylabel("Valor")
+    ax.set_title("Entradas e Saídas Mensais")
+    ax.legend()
+    ax.tick_params(axis="x", labelrotation=45)
+
+
+def grafico_pizza(cat_gastos):
+    # Distribuição das despesas por categoria, em PNG
+    return _renderizar("pizza", cat_gastos, _desenhar_pizza)
+
+
+def grafico_linhas(df_bar):
+    # Receitas e despesas mensais em linhas, em PNG
+    return _renderizar("linhas", df_bar, _desenhar_linhas)
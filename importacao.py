@@ -0,0 +1,237 @@
+import hashlib
+import io
+import itertools
+import os
+import pickle
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+
+import pandas as pd
+
+from categorizacao import Categorizador
+from instrumentacao import etapa, medicoes_separadas, somar_etapas
+from leitor_ofx import ler_extrato
+from normalizacao import normalizar_descricao, limpar_memo_c6, extrair_tipo_e_descricao
+
+COLUNAS_EXTRATO = ["Banco", "Conta", "Data", "Tipo Lançamento", "Descrição", "Valor", "FITID", "Tag"]
+
+# Código do banco (<BANKID> do OFX) -> nome do banco usado no app
+BANCOS_POR_CODIGO = {"001": "Banco do Brasil", "336": "C6"}
+_BANKID = re.compile(rb"<BANKID>\s*0*(\d+)", re.IGNORECASE)
+
+# Categorizadores guardados em cada processo do pool, um por configuração (regras e índice)
+CATEGORIZADORES_POR_PROCESSO = 4
+
+# Pools de processos do processo inteiro, por quantidade de processos: criados na primeira importação
+# com vários arquivos e reaproveitados pelas seguintes (de qualquer sessão)
+_pools = {}
+_trava_pools = threading.Lock()
+# No processo do pool: configuração (hash) -> Categorizador
+_categorizadores = OrderedDict()
+
+
+def detectar_banco(conteudo):
+    # Banco do extrato pelo <BANKID> do cabeçalho; None se o banco não for reconhecido
+    encontrado = _BANKID.search(conteudo[:8192])
+    if encontrado is None:
+        return None
+    return BANCOS_POR_CODIGO.get(encontrado.group(1).decode().zfill(3))
+
+
+def simple_ofx_to_df(uploaded_file, banco, categorizador):
+    with etapa("ler"):
+        extrato = ler_extrato(uploaded_file)
+    with etapa("normalizar"):
+        df = _normalizar_transacoes(extrato, banco)
+    if not df.empty:
+        with etapa("categorizar"):
+            # Categoriza o extrato inteiro de uma vez
+            descricoes = df["Tipo Lançamento"] + " " + df["Descrição"]
+            if categorizador.indice is None:
+                df["Tag"] = categorizador.categorizar_serie(descricoes)
+            else:
+                df["Tag"], df["Confiança"] = categorizador.categorizar_com_confianca(descricoes)
+    return df
+
+
+def _normalizar_transacoes(extrato, banco):
+    # Tipo de lançamento e descrição de cada transação (extrato de leitor_ofx.ler_extrato),
+    # conforme o formato de cada banco
+    tipos, descricoes = [], []
+    banco_nome = str(banco).strip().lower()
+    for descricao_completa, trntype in zip(extrato["memo"], extrato["tipo"]):
+        # Lógica especial para C6
+        if "c6" in banco_nome:
+            # Usa também o tipo de transação
+            memo = descricao_completa.lower()
+            memo_norm = normalizar_descricao(memo)
+            tipo_lanc = ""
+            descricao = ""
+            # Lógica para C6
+            if trntype == "DEBIT":
+                if "boleto" in memo:
+                    tipo_lanc = "Pagamento De Boleto"
+                    descricao = "Boleto"
+                elif "fatura" in memo:
+                    tipo_lanc = "Pagamento Fatura Cartão"
+                    descricao = "Fatura Cartão"
+                elif "pix" in memo or "enviado" in memo:
+                    tipo_lanc = "Pix Enviado"
+                    descricao = limpar_memo_c6(memo)
+                else:
+                    tipo_lanc = "Compra Com Cartão"
+                    descricao = limpar_memo_c6(memo)
+            elif trntype == "CREDIT":
+                if "pix" in memo or "recebido" in memo:
+                    tipo_lanc = "Pix Recebido"
+                    descricao = limpar_memo_c6(memo)
+                else:
+                    tipo_lanc = "Crédito"
+                    descricao = limpar_memo_c6(memo)
+            else:
+                # fallback para padrão
+                tipo_lanc, descricao = extrair_tipo_e_descricao(descricao_completa)
+            # Garante maiúsculas e normalização
+            tipo_lanc = normalizar_descricao(tipo_lanc).title()
+            descricao = limpar_memo_c6(descricao)
+        else:
+            tipo_lanc, descricao = extrair_tipo_e_descricao(descricao_completa)
+        tipos.append(tipo_lanc)
+        descricoes.append(descricao)
+    if extrato.empty:
+        return pd.DataFrame()
+    return pd.DataFrame({
+        "Banco": banco,
+        # Conta do extrato (<ACCTID>): separa, na deduplicação, contas diferentes do mesmo banco
+        "Conta": extrato["conta"],
+        "Data": extrato["data"],
+        "Tipo Lançamento": tipos,
+        "Descrição": descricoes,
+        "Valor": extrato["valor"],
+        "FITID": extrato["fitid"]
+    })
+
+
+def _obter_pool(max_processos):
+    # "spawn": o processo do Streamlit tem várias threads, e fork copiaria travas em uso por elas
+    with _trava_pools:
+        pool = _pools.get(max_processos)
+        if pool is None:
+            pool = _pools[max_processos] = ProcessPoolExecutor(max_processos, mp_context=get_context("spawn"))
+        return pool
+
+
+def _descartar_pool(max_processos, pool):
+    # Um processo do pool morreu (ex.: falta de memória): a próxima importação cria outro pool
+    with _trava_pools:
+        if _pools.get(max_processos) is pool:
+            del _pools[max_processos]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _categorizador_do_processo(chave, configuracao):
+    # O pool serve importações com regras diferentes: cada processo monta o Categorizador de uma
+    # configuração uma vez só e guarda os últimos usados
+    categorizador = _categorizadores.get(chave)
+    if categorizador is None:
+        regras_usuario, indice = pickle.loads(configuracao)
+        categorizador = _categorizadores[chave] = Categorizador(regras_usuario, indice=indice)
+        if len(_categorizadores) > CATEGORIZADORES_POR_PROCESSO:
+            _categorizadores.popitem(last=False)
+    else:
+        _categorizadores.move_to_end(chave)
+    return categorizador
+
+
+def _processar_no_pool(chave, configuracao, nome, conteudo, banco):
+    return _processar_arquivo(nome, conteudo, banco, _categorizador_do_processo(chave, configuracao))
+
+
+def _processar_arquivo(nome, conteudo, banco, categorizador=None):
+    # Lê, normaliza e categoriza um arquivo; erros são devolvidos no relatório em vez de interromper a importação
+    inicio = time.perf_counter()
+    with medicoes_separadas() as medicoes:
+        try:
+            df = simple_ofx_to_df(io.BytesIO(conteudo), banco, categorizador)
+            df["Arquivo"] = nome
+            erro = None
+        except Exception as e:
+            df = None
+            erro = str(e)
+    return {
+        "arquivo": nome,
+        "banco": banco,
+        "lancamentos": len(df) if df is not None else 0,
+        "segundos": round(time.perf_counter() - inicio, 3),
+        "erro": erro,
+        "etapas": medicoes.etapas,
+        "df": df
+    }
+
+
+def processar_arquivos(arquivos, regras_usuario, max_processos=None, indice=None):
+    """
+    Gera o resultado de cada arquivo (o relatório de importar_arquivos, com o DataFrame em "df")
+    à medida que ficam prontos, na ordem de entrada. arquivos pode ser um iterador de
+    (nome, conteúdo em bytes, banco): só dois arquivos por processo ficam em memória de cada vez.
+    Com indice (similaridade.IndiceSimilaridade), o que ficaria em "Outros" recebe a tag sugerida.
+    Arquivos que não são OFX ou estão corrompidos vêm com o motivo em "erro".
+    """
+    max_processos = max_processos or os.cpu_count() or 1
+    arquivos = iter(arquivos)
+    primeiros = list(itertools.islice(arquivos, 2))
+    if max_processos == 1 or len(primeiros) < 2:
+        # Sem pool: um processo ou um arquivo só não compensam o envio dos dados para outro processo
+        categorizador = Categorizador(regras_usuario, indice=indice)
+        for nome, conteudo, banco in itertools.chain(primeiros, arquivos):
+            resultado = _processar_arquivo(nome, conteudo, banco, categorizador)
+            somar_etapas(resultado.pop("etapas"))
+            yield resultado
+        return
+    # A configuração vai junto com cada arquivo (já serializada, uma vez só); cada processo
+    # só a desserializa na primeira vez que a vê
+    configuracao = pickle.dumps((regras_usuario, indice))
+    chave = hashlib.sha1(configuracao).hexdigest()
+    pool = _obter_pool(max_processos)
+    pendentes = deque()
+    try:
+        for nome, conteudo, banco in itertools.chain(primeiros, arquivos):
+            pendentes.append(pool.submit(_processar_no_pool, chave, configuracao, nome, conteudo, banco))
+            if len(pendentes) >= 2 * max_processos:
+                resultado = pendentes.popleft().result()
+                somar_etapas(resultado.pop("etapas"))
+                yield resultado
+        while pendentes:
+            resultado = pendentes.popleft().result()
+            somar_etapas(resultado.pop("etapas"))
+            yield resultado
+    except BrokenProcessPool:
+        _descartar_pool(max_processos, pool)
+        raise
+    finally:
+        # Importação interrompida (ex.: quem consome o gerador parou): não processa o resto à toa
+        for pendente in pendentes:
+            pendente.cancel()
+
+
+def importar_arquivos(arquivos, regras_usuario, max_processos=None, indice=None):
+    """
+    Importa vários arquivos OFX em paralelo, um arquivo por processo (ver processar_arquivos).
+    arquivos é uma lista de (nome, conteúdo em bytes, banco).
+    Retorna o DataFrame com todos os lançamentos (com a coluna "Arquivo" indicando a origem)
+    e o relatório de cada arquivo, com quantidade de lançamentos, tempo e erro.
+    Com indice, as tags sugeridas por similaridade vêm com a confiança na coluna "Confiança".
+    """
+    resultados = list(processar_arquivos(arquivos, regras_usuario, max_processos, indice))
+    dfs = [r.pop("df") for r in resultados]
+    dfs = [df for df in dfs if df is not None and not df.empty]
+    if dfs:
+        df = pd.concat(dfs, ignore_index=True)
+    else:
+        df = pd.DataFrame(columns=COLUNAS_EXTRATO + ["Arquivo"])
+    return df, resultados
@@ -0,0 +1,152 @@
+"""
+Importação em lote, sem navegador: lê todos os arquivos OFX de uma pasta, categoriza com as
+regras do usuário e salva no Supabase em lotes, ignorando lançamentos já importados.
+
+Uso:
+    python importar_lote.py PASTA --usuario LOGIN [--banco "Banco do Brasil"] [--recursivo]
+                            [--processos N] [--lancamentos-por-envio N] [--dry-run]
+
+Sem --banco, o banco de cada arquivo é reconhecido pelo <BANKID> do OFX.
+Com --dry-run, os arquivos são lidos e categorizados, mas nada é enviado ao Supabase.
+Descrições sem regra recebem a tag das regras mais parecidas (sem --sem-similaridade).
+As credenciais do Supabase vêm das variáveis SUPABASE_URL e SUPABASE_KEY, como no app.
+Com ARMAZENAMENTO=sqlite, os lançamentos vão para o banco embutido (banco_local.py), como no app.
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+from regras import carregar_regras_usuario
+from similaridade import IndiceSimilaridade
+from importacao import processar_arquivos, detectar_banco, BANCOS_POR_CODIGO
+
+# Lançamentos acumulados antes de cada envio ao Supabase (que ainda é dividido nos lotes de banco_dados)
+LANCAMENTOS_POR_ENVIO = 5000
+
+
+def listar_arquivos(pasta, recursivo=False):
+    # Arquivos .ofx da pasta, em ordem de nome
+    if recursivo:
+        caminhos = [os.path.join(raiz, nome) for raiz, _, nomes in os.walk(pasta) for nome in nomes]
+    else:
+        caminhos = [os.path.join(pasta, nome) for nome in os.listdir(pasta)]
+    return sorted(c for c in caminhos if c.lower().endswith(".ofx") and os.path.isfile(c))
+
+
+def ler_arquivos(caminhos, banco=None, ignorar=None):
+    """
+    Gera (nome, conteúdo, banco) de cada arquivo, lendo um arquivo de cada vez.
+    Arquivos cujo banco não é reconhecido não são importados: ignorar(caminho, erro) é chamada
+    para cada um, no momento em que é pulado.
+    """
+    for caminho in caminhos:
+        with open(caminho, "rb") as arquivo:
+            conteudo = arquivo.read()
+        banco_arquivo = banco or detectar_banco(conteudo)
+        if banco_arquivo is None:
+            if ignorar is not None:
+                ignorar(caminho, "banco não reconhecido; informe --banco")
+            continue
+        yield caminho, conteudo, banco_arquivo
+
+
+def importar_pasta(pasta, usuario, banco=None, recursivo=False, max_processos=None,
+                   lancamentos_por_envio=LANCAMENTOS_POR_ENVIO, dry_run=False, regras_usuario=None,
+                   indice=None, progresso=print):
+    """
+    Importa todos os arquivos OFX da pasta para o usuário. Os arquivos são processados em paralelo
+    e enviados ao Supabase em blocos de lancamentos_por_envio, à medida que ficam prontos.
+    indice (similaridade.IndiceSimilaridade) sugere a tag do que ficaria em "Outros".
+    progresso recebe uma linha de texto por arquivo (processado ou pulado) e por envio; o número de
+    cada arquivo é a sua posição entre todos os arquivos .ofx da pasta.
+    Retorna um resumo com os totais e a lista de erros (de leitura e de envio).
+    """
+    # Importado aqui para que o dry-run funcione sem as credenciais do Supabase
+    if not dry_run:
+        from banco_dados import salvar_lancamentos
+
+    caminhos = listar_arquivos(pasta, recursivo)
+    erros = []
+    resumo = {"arquivos": len(caminhos), "lancamentos": 0, "gravados": 0, "ignorados": 0, "lotes_com_falha": 0, "erros": erros}
+    pendentes = []
+
+    def enviar():
+        df = pd.concat(pendentes, ignore_index=True)
+        pendentes.clear()
+        inicio = time.perf_counter()
+        resultados = salvar_lancamentos(usuario, df)
+        # Lançamentos que o banco gravou e os ignorados por já estarem no histórico
+        gravados = sum(r["gravados"] for r in resultados if r["sucesso"])
+        ignorados = sum(r["quantidade"] - r["gravados"] for r in resultados if r["sucesso"])
+        falhas = [r for r in resultados if not r["sucesso"]]
+        resumo["gravados"] += gravados
+        resumo["ignorados"] += ignorados
+        resumo["lotes_com_falha"] += len(falhas)
+        erros.extend({"arquivo": None, "erro": f"lote de {r['quantidade']} lançamentos: {r['erro']}"} for r in falhas)
+        progresso(f"  gravados {gravados} de {len(df)} lançamentos, {ignorados} já no histórico ({time.perf_counter() - inicio:.1f}s)")
+
+    numeros = {caminho: numero for numero, caminho in enumerate(caminhos, start=1)}
+
+    def registrar_erro(caminho, erro):
+        erros.append({"arquivo": caminho, "erro": erro})
+        progresso(f"[{numeros[caminho]}/{len(caminhos)}] {caminho}: ERRO {erro}")
+
+    arquivos = ler_arquivos(caminhos, banco, registrar_erro)
+    acumulados = 0
+    for resultado in processar_arquivos(arquivos, regras_usuario or {}, max_processos, indice):
+        df = resultado.pop("df")
+        if resultado["erro"]:
+            registrar_erro(resultado["arquivo"], resultado["erro"])
+            continue
+        resumo["lancamentos"] += resultado["lancamentos"]
+        progresso(f"[{numeros[resultado['arquivo']]}/{len(caminhos)}] {resultado['arquivo']}: {resultado['lancamentos']} lançamentos ({resultado['banco']}, {resultado['segundos']}s)")
+        if dry_run or df is None or df.empty:
+            continue
+        pendentes.append(df)
+        acumulados += len(df)
+        if acumulados >= lancamentos_por_envio:
+            enviar()
+            acumulados = 0
+    if pendentes:
+        enviar()
+    return resumo
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importa uma pasta de extratos OFX para o histórico de um usuário.")
+    parser.add_argument("pasta")
+    parser.add_argument("--usuario", required=True, help="login do usuário dono dos lançamentos")
+    parser.add_argument("--banco", choices=sorted(BANCOS_POR_CODIGO.values()), help="banco de todos os arquivos (padrão: pelo <BANKID>)")
+    parser.add_argument("--recursivo", action="store_true", help="inclui as subpastas")
+    parser.add_argument("--processos", type=int, help="processos usados na leitura (padrão: um por CPU)")
+    parser.add_argument("--lancamentos-por-envio", type=int, default=LANCAMENTOS_POR_ENVIO)
+    parser.add_argument("--dry-run", action="store_true", help="lê e categoriza, sem enviar nada ao Supabase")
+    parser.add_argument("--sem-similaridade", action="store_true", help="não sugere tags pelas regras mais parecidas")
+    args = parser.parse_args(argv)
+
+    regras_usuario = carregar_regras_usuario(args.usuario)
+    # Sem o histórico à mão, o índice de similaridade é montado com as regras do usuário
+    indice = None if args.sem_similaridade else IndiceSimilaridade(regras_usuario)
+
+    inicio = time.perf_counter()
+    resumo = importar_pasta(
+        args.pasta, args.usuario, banco=args.banco, recursivo=args.recursivo, max_processos=args.processos,
+        lancamentos_por_envio=args.lancamentos_por_envio, dry_run=args.dry_run,
+        regras_usuario=regras_usuario, indice=indice,
+        progresso=lambda linha: print(linha, flush=True),
+    )
+    print(
+        f"{resumo['arquivos']} arquivos, {resumo['lancamentos']} lançamentos lidos, "
+        f"{resumo['gravados']} gravados, {resumo['ignorados']} já no histórico{' (dry-run)' if args.dry_run else ''}, "
+        f"{len(resumo['erros'])} erros em {time.perf_counter() - inicio:.1f}s"
+    )
+    for erro in resumo["erros"]:
+        print(f"ERRO {erro['arquivo'] or ''}: {erro['erro']}", file=sys.stderr)
+    return 1 if resumo["erros"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
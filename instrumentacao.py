@@ -0,0 +1,169 @@
+import contextvars
+import json
+import logging
+import threading
+import time
+import tracemalloc
+import weakref
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Uma linha JSON por execução do script, no logger "desempenho"
+logger = logging.getLogger("desempenho")
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+# Medições da execução em andamento; cada sessão do Streamlit roda o script na sua própria thread
+_atual = contextvars.ContextVar("medicoes", default=None)
+# Requisições concorrentes (banco_async.py) registram nas mesmas medições a partir de várias threads
+_trava = threading.Lock()
+# Execuções no modo detalhado em andamento (o tracemalloc é um só para o processo inteiro)
+_usando_tracemalloc = 0
+# Se o tracemalloc foi ligado aqui (e não já estava ligado por fora), para desligá-lo no fim
+_tracemalloc_ligado_aqui = False
+
+
+def _ligar_tracemalloc():
+    global _usando_tracemalloc, _tracemalloc_ligado_aqui
+    with _trava:
+        if _usando_tracemalloc == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracemalloc_ligado_aqui = True
+        _usando_tracemalloc += 1
+        # O pico passa a contar desta execução (com outras sessões detalhadas ao mesmo tempo, inclui as delas)
+        tracemalloc.reset_peak()
+
+
+def _desligar_tracemalloc():
+    # Só desliga quando nenhuma outra sessão detalhada está medindo
+    global _usando_tracemalloc, _tracemalloc_ligado_aqui
+    with _trava:
+        _usando_tracemalloc -= 1
+        if _usando_tracemalloc == 0 and _tracemalloc_ligado_aqui:
+            tracemalloc.stop()
+            _tracemalloc_ligado_aqui = False
+
+
+class Medicoes:
+    """
+    Tempos por etapa (carregar, ler, normalizar, categorizar, salvar, filtrar, agregar,
+    renderizar...) e requisições ao Supabase de uma execução do script.
+    No modo detalhado também mede os bytes (em JSON) trocados com o Supabase e o pico de
+    memória alocada pelo Python durante a execução (tracemalloc, que deixa tudo mais lento).
+    """
+
+    def __init__(self, detalhado=False):
+        self.inicio = time.perf_counter()
+        self.etapas = {}
+        self.requisicoes = 0
+        self.tempo_requisicoes = 0.0
+        self.bytes = 0
+        self.detalhado = detalhado
+        self._liberar = None
+        if detalhado:
+            _ligar_tracemalloc()
+            # Libera também quando a execução é interrompida (st.rerun, st.stop) sem chegar em finalizar
+            self._liberar = weakref.finalize(self, _desligar_tracemalloc)
+
+    def somar(self, nome, segundos):
+        self.etapas[nome] = self.etapas.get(nome, 0.0) + segundos
+
+    def resumo(self):
+        resumo = {
+            "total_ms": round((time.perf_counter() - self.inicio) * 1000, 1),
+            "etapas_ms": {nome: round(segundos * 1000, 1) for nome, segundos in self.etapas.items()},
+            "requisicoes": self.requisicoes,
+            "requisicoes_ms": round(self.tempo_requisicoes * 1000, 1),
+        }
+        if resource is not None:
+            # ru_maxrss vem em KB no Linux: é o pico do processo inteiro, não só desta execução
+            resumo["rss_maximo_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+        # Fora do modo detalhado os bytes ficam em 0 e o pico em None
+        resumo["bytes"] = self.bytes
+        resumo["pico_memoria_mb"] = round(tracemalloc.get_traced_memory()[1] / 1024 ** 2, 1) if self.rastreando() else None
+        return resumo
+
+    def rastreando(self):
+        return self._liberar is not None and self._liberar.alive
+
+    def encerrar(self):
+        # Libera o tracemalloc desta execução (o finalize só roda uma vez)
+        if self._liberar is not None:
+            self._liberar()
+
+
+def iniciar(detalhado=False):
+    medicoes = Medicoes(detalhado)
+    _atual.set(medicoes)
+    return medicoes
+
+
+def medicoes_atuais():
+    return _atual.get()
+
+
+@contextmanager
+def etapa(nome):
+    # Soma o tempo do bloco na etapa informada (sem medições em andamento, não faz nada)
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        medicoes = _atual.get()
+        if medicoes is not None:
+            medicoes.somar(nome, time.perf_counter() - inicio)
+
+
+@contextmanager
+def medicoes_separadas():
+    """
+    Mede um trecho em separado das medições da execução (que são restauradas no fim).
+    Usado no processamento de cada arquivo, que pode rodar em outro processo.
+    """
+    token = _atual.set(Medicoes())
+    try:
+        yield _atual.get()
+    finally:
+        _atual.reset(token)
+
+
+def somar_etapas(etapas):
+    # Soma tempos medidos em outro processo (ex.: arquivos importados no pool de processos)
+    medicoes = _atual.get()
+    if medicoes is not None:
+        for nome, segundos in etapas.items():
+            medicoes.somar(nome, segundos)
+
+
+def registrar_requisicao(segundos, enviados=None, recebidos=None):
+    medicoes = _atual.get()
+    if medicoes is None:
+        return
+    tamanho = sum(len(json.dumps(dados, default=str)) for dados in (enviados, recebidos) if dados) if medicoes.detalhado else 0
+    with _trava:
+        medicoes.requisicoes += 1
+        medicoes.tempo_requisicoes += segundos
+        medicoes.bytes += tamanho
+
+
+def finalizar(**contexto):
+    """
+    Encerra as medições da execução: grava a linha de log estruturada e devolve o resumo.
+    contexto entra no log junto com as medições (ex.: usuário).
+    """
+    medicoes = _atual.get()
+    if medicoes is None:
+        return None
+    resumo = medicoes.resumo()
+    medicoes.encerrar()
+    _atual.set(None)
+    logger.info(json.dumps({"evento": "execucao", **contexto, **resumo}, ensure_ascii=False))
+    return resumo
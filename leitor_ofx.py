@@ -0,0 +1,211 @@
+import codecs
+import html
+import re
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Tamanho de cada leitura do arquivo, em bytes
+TAMANHO_BLOCO = 64 * 1024
+# A primeira leitura precisa pegar o cabeçalho inteiro para detectar o encoding
+TAMANHO_CABECALHO = 4 * 1024
+
+# Uma tag OFX seguida do texto até a próxima tag. Serve tanto para OFX 1.x (SGML,
+# onde os campos não têm tag de fechamento) quanto para OFX 2.x (XML).
+_TOKEN = re.compile(r"<(/?)([A-Za-z0-9_.]+)[^>]*>([^<]*)")
+_ENCODING_UTF8 = re.compile(rb"ENCODING:\s*UTF-?8|encoding=[\"']utf-?8", re.IGNORECASE)
+
+# Campos da transação lidos do <STMTTRN>
+CAMPOS_TRANSACAO = ("FITID", "TRNTYPE", "DTPOSTED", "TRNAMT", "MEMO")
+# Início de um extrato de conta corrente ou de cartão
+AGREGADOS_EXTRATO = {"STMTRS", "CCSTMTRS"}
+
+
+def _detectar_encoding(inicio):
+    # OFX 2.x e alguns 1.x declaram UTF-8 no cabeçalho; o resto é tratado como latin1
+    return "utf-8" if _ENCODING_UTF8.search(inicio) else "latin1"
+
+
+def _montar_formato(tokens):
+    """
+    Expressão regular de uma transação com exatamente a mesma sequência de tags de tokens
+    (os tokens de uma transação, de <STMTTRN> a </STMTTRN>), com um grupo para o texto de cada
+    campo lido. Retorna (expressão, campos, tag de fechamento): campos[i] é o campo do grupo i.
+    """
+    partes, campos = [], []
+    for fechamento, tag, _ in tokens:
+        partes.append(re.escape(f"<{fechamento}{tag}>"))
+        if not fechamento and tag.upper() in CAMPOS_TRANSACAO and tag.upper() not in campos:
+            partes.append("([^<]*)")
+            campos.append(tag.upper())
+        else:
+            partes.append("[^<]*")
+    return re.compile("".join(partes)), campos, f"</{tokens[-1][1]}>"
+
+
+def _colunas(partes, campos, conta):
+    """
+    Colunas das transações de um trecho dividido pela expressão do formato (ver _montar_formato):
+    as partes vêm na ordem [texto entre transações, campos da 1ª transação, texto, campos da 2ª...].
+    Campos fora do formato ficam vazios.
+    """
+    passo = len(campos) + 1
+    quantidade = (len(partes) - 1) // passo
+    colunas = {campo: [""] * quantidade for campo in CAMPOS_TRANSACAO}
+    for posicao, campo in enumerate(campos, start=1):
+        colunas[campo] = partes[posicao::passo]
+    colunas["conta"] = [conta] * quantidade
+    return colunas
+
+
+def ler_colunas(arquivo, tamanho_bloco=TAMANHO_BLOCO):
+    """
+    Lê um arquivo OFX (1.x SGML ou 2.x XML) em blocos, numa única passada e sem carregar o arquivo
+    inteiro na memória. Gera, para cada trecho lido, as transações completas do trecho em colunas:
+    listas com a conta (<ACCTID> do extrato) e o texto de cada campo de CAMPOS_TRANSACAO.
+
+    A sequência de tags da primeira transação vira uma expressão regular que divide de uma vez o
+    trecho nas transações e nos seus campos, quando todas têm o mesmo formato (o caso comum: o banco
+    gera todas iguais). Trechos com início de extrato (outra conta), com alguma transação em outro
+    formato ou com qualquer outro texto entre as transações são lidos tag a tag.
+
+    Gera ValueError se o arquivo não tem a tag <OFX> ou termina antes do </OFX> (corrompido ou
+    cortado), para o arquivo não passar como um extrato sem lançamentos.
+    """
+    decodificador = None
+    buffer = ""
+    conta = None
+    transacao = None
+    tokens = None
+    formato = None
+    encontrou_ofx = fechou_ofx = False
+    fim = False
+    while not fim:
+        dados = arquivo.read(tamanho_bloco if decodificador else max(tamanho_bloco, TAMANHO_CABECALHO))
+        if isinstance(dados, str):
+            dados = dados.encode("latin1")
+        if decodificador is None:
+            decodificador = codecs.getincrementaldecoder(_detectar_encoding(dados))(errors="replace")
+        fim = not dados
+        buffer += decodificador.decode(dados, final=fim)
+
+        if formato is not None and transacao is None:
+            # Transações completas do trecho, todas no formato da primeira, lidas de uma vez
+            padrao, campos, fechamento = formato
+            fim_trecho = buffer.rfind(fechamento)
+            if fim_trecho >= 0:
+                fim_trecho += len(fechamento)
+                partes = padrao.split(buffer[:fim_trecho])
+                # Só vale se entre as transações não sobrou nada (outro formato, outra conta...)
+                if not "".join(partes[::len(campos) + 1]).strip():
+                    yield _colunas(partes, campos, conta)
+                    buffer = buffer[fim_trecho:]
+                    # O resto (transação pela metade) fica para o próximo bloco
+                    if not fim:
+                        continue
+
+        # Tag a tag; o texto depois da última tag pode continuar no próximo bloco. Com o formato
+        # conhecido, para no fim da última transação completa, para o próximo bloco começar limpo
+        if fim:
+            corte = len(buffer)
+        elif formato is not None and buffer.rfind(formato[2]) >= 0:
+            corte = buffer.rfind(formato[2]) + len(formato[2])
+        else:
+            corte = buffer.rfind("<")
+        if corte <= 0:
+            continue
+        colunas = {campo: [] for campo in ("conta",) + CAMPOS_TRANSACAO}
+        for fechamento, tag, texto in _TOKEN.findall(buffer, 0, corte):
+            nome = tag.upper()
+            if tokens is not None:
+                tokens.append((fechamento, tag, texto))
+            if fechamento:
+                if nome == "OFX":
+                    fechou_ofx = True
+                elif nome == "STMTTRN" and transacao is not None:
+                    colunas["conta"].append(conta)
+                    for campo in CAMPOS_TRANSACAO:
+                        colunas[campo].append(transacao.get(campo, ""))
+                    transacao = None
+                    if tokens is not None:
+                        formato = _montar_formato(tokens)
+                        tokens = None
+            elif nome == "STMTTRN":
+                transacao = {}
+                # Guarda as tags da primeira transação para montar a expressão do formato
+                if formato is None:
+                    tokens = [(fechamento, tag, texto)]
+            elif transacao is not None:
+                if nome in CAMPOS_TRANSACAO and nome not in transacao:
+                    transacao[nome] = texto
+            elif nome in AGREGADOS_EXTRATO:
+                conta = None
+            elif nome == "OFX":
+                encontrou_ofx = True
+            elif nome == "ACCTID":
+                conta = texto.strip() or None
+        buffer = buffer[corte:]
+        if colunas["conta"]:
+            yield colunas
+    if not encontrou_ofx:
+        raise ValueError("não é um arquivo OFX (sem a tag <OFX>)")
+    if not fechou_ofx:
+        raise ValueError("arquivo OFX incompleto (termina antes de </OFX>)")
+
+
+def ler_transacoes(arquivo, tamanho_bloco=TAMANHO_BLOCO):
+    """
+    Gera as transações do arquivo OFX uma a uma (ver ler_colunas), cada uma um dict
+    com conta, fitid, tipo, data, valor e memo.
+    """
+    for colunas in ler_colunas(arquivo, tamanho_bloco):
+        for conta, fitid, tipo, data, valor, memo in zip(colunas["conta"], *(colunas[campo] for campo in CAMPOS_TRANSACAO)):
+            data, valor, memo = data.strip(), valor.strip().replace(",", "."), memo.strip()
+            try:
+                data = datetime(int(data[:4]), int(data[4:6]), int(data[6:8]))
+            except ValueError:
+                data = None
+            try:
+                valor = float(valor)
+            except ValueError:
+                valor = 0.0
+            yield {
+                "conta": conta,
+                "fitid": fitid.strip() or None,
+                "tipo": tipo.strip().upper(),
+                "data": data,
+                "valor": valor,
+                "memo": html.unescape(memo) if "&" in memo else memo,
+            }
+
+
+def ler_extrato(arquivo, tamanho_bloco=TAMANHO_BLOCO):
+    """
+    Lê o arquivo OFX num DataFrame com uma transação por linha e as colunas conta, fitid, tipo,
+    data, valor e memo, como em ler_transacoes, mas convertendo cada coluna de uma vez.
+    """
+    colunas = {campo: [] for campo in ("conta",) + CAMPOS_TRANSACAO}
+    for trecho in ler_colunas(arquivo, tamanho_bloco):
+        for campo, valores in trecho.items():
+            colunas[campo].extend(valores)
+    # Listas de str (strip, upper, unescape) saem mais rápidas que os métodos .str do pandas
+    fitids = [fitid.strip() or None for fitid in colunas["FITID"]]
+    tipos = [tipo.strip().upper() for tipo in colunas["TRNTYPE"]]
+    datas = [data.strip()[:8] for data in colunas["DTPOSTED"]]
+    memos = [memo.strip() for memo in colunas["MEMO"]]
+    memos = [html.unescape(memo) if "&" in memo else memo for memo in memos]
+    valores = colunas["TRNAMT"]
+    try:
+        valores = np.array(valores, dtype=float)
+    except ValueError:
+        # Vírgula decimal ou valor inválido: converte de novo, valor a valor
+        valores = pd.to_numeric(pd.Series([valor.strip().replace(",", ".") for valor in valores], dtype=object), errors="coerce").fillna(0.0)
+    return pd.DataFrame({
+        "conta": pd.Series(colunas["conta"], dtype=object),
+        "fitid": pd.Series(fitids, dtype=object),
+        "tipo": pd.Series(tipos, dtype=object),
+        "data": pd.to_datetime(pd.Series(datas, dtype=object), format="%Y%m%d", errors="coerce"),
+        "valor": pd.Series(valores, dtype=float),
+        "memo": pd.Series(memos, dtype=object),
+    })
@@ -0,0 +1,6 @@
+-- Chave de deduplicação dos lançamentos importados (FITID do OFX ou hash do conteúdo).
+-- Lançamentos antigos ficam com a chave nula e não entram na verificação.
+alter table lancamentos add column if not exists chave_dedup text;
+
+create unique index if not exists lancamentos_usuario_chave_dedup
+    on lancamentos (usuario, chave_dedup);
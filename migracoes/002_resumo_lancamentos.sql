@@ -0,0 +1,39 @@
+-- Índice dos filtros de período por usuário (carga do histórico e agregações).
+create index if not exists lancamentos_usuario_data
+    on lancamentos (usuario, data);
+
+-- Receitas, despesas (em centavos) e quantidade de lançamentos por mês e tag, com os mesmos
+-- filtros dos "Filtros do Histórico". Banco, tag e tipo nulos entram como p_sem_valor; cada termo
+-- de p_termos precisa ser o início de alguma palavra da descrição. Chamada por banco_dados.py via rpc.
+create or replace function resumo_lancamentos(
+    p_usuario text,
+    p_inicio date,
+    p_fim date,
+    p_bancos text[],
+    p_tags text[],
+    p_tipos text[],
+    p_termos text[] default '{}',
+    p_sem_valor text default '(sem valor)'
+)
+returns table (mes text, tag text, receitas bigint, despesas bigint, quantidade bigint)
+language sql
+stable
+as $$
+    select
+        to_char(l.data, 'YYYY-MM') as mes,
+        coalesce(l.tag, p_sem_valor) as tag,
+        coalesce(sum(round(l.valor * 100)) filter (where l.valor > 0), 0)::bigint as receitas,
+        coalesce(sum(round(l.valor * 100)) filter (where l.valor < 0), 0)::bigint as despesas,
+        count(*) as quantidade
+    from lancamentos l
+    where l.usuario = p_usuario
+      and l.data between p_inicio and p_fim
+      and coalesce(l.banco, p_sem_valor) = any (p_bancos)
+      and coalesce(l.tag, p_sem_valor) = any (p_tags)
+      and coalesce(l.tipo_lancamento, p_sem_valor) = any (p_tipos)
+      and not exists (
+          select 1 from unnest(p_termos) as termo
+          where coalesce(l.descricao, '') !~* ('\m' || termo)
+      )
+    group by 1, 2
+$$;
@@ -0,0 +1,25 @@
+-- Contador de edições e exclusões dos lançamentos de cada usuário. A cópia local do histórico
+-- (cache_local.py) só busca os ids novos enquanto o contador não muda; se mudou (edição feita em
+-- outra sessão, outro servidor ou direto no banco), recarrega o histórico inteiro.
+create table if not exists versoes_lancamentos (
+    usuario text primary key,
+    edicoes bigint not null default 0
+);
+
+-- security definer: o contador é atualizado mesmo sem permissão de escrita direta na tabela
+create or replace function contar_edicao_lancamentos()
+returns trigger
+language plpgsql
+security definer
+as $$
+begin
+    insert into versoes_lancamentos (usuario, edicoes) values (old.usuario, 1)
+    on conflict (usuario) do update set edicoes = versoes_lancamentos.edicoes + 1;
+    return null;
+end
+$$;
+
+drop trigger if exists lancamentos_contar_edicao on lancamentos;
+create trigger lancamentos_contar_edicao
+    after update or delete on lancamentos
+    for each row execute function contar_edicao_lancamentos();
@@ -0,0 +1,177 @@
+import re
+import unicodedata
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Quantidade máxima de descrições distintas guardadas no cache de normalização
+TAMANHO_CACHE = 50_000
+
+# Padrões usados na normalização, compilados uma única vez
+_ESPECIAIS = re.compile(r'[^a-z0-9\s]')
+_DATAS = re.compile(r'\b\d{4,8}\b')
+_HORAS = re.compile(r'\b\d{1,2}[:h]\d{2}\b')
+_MEMO = re.compile(r'\bmemo\b')
+_RS_MEMO = re.compile(r'\brs\s*memo\b')
+_ESPACOS = re.compile(r'\s+')
+_HIFENS = re.compile(r'\s*-\s*')
+
+_MEMO_C6 = re.compile(r'\bmemo\b', re.IGNORECASE)
+_RS_MEMO_C6 = re.compile(r'\brs\s*memo\b', re.IGNORECASE)
+
+# Espaços em branco do \s do Python (str.isspace); no RE2 do Arrow, \s só cobre os do ASCII
+_BRANCOS_UNICODE = r"[\t\n\x0b\x0c\r\x1c-\x1f\x{85}\x{a0}\x{1680}\x{2000}-\x{200a}\x{2028}\x{2029}\x{202f}\x{205f}\x{3000}]"
+
+_TAG_MEMO = re.compile(r'</?MEMO>', re.IGNORECASE)
+_SO_HIFENS = re.compile(r'\s*-+\s*')
+_HIFEN = re.compile(r'-+')
+_DATAS_INICIO = re.compile(r"^(\d{4,8}\s*)+")
+_HORAS_INICIO = re.compile(r"^(\d{1,2}[:h]\d{2}\s*)+")
+_ESPACOS_INICIO = re.compile(r'^\s+')
+
+
+@lru_cache(maxsize=TAMANHO_CACHE)
+def _normalizar(texto):
+    desc = texto.lower().strip()
+    # Remove acentos: o NFKD separa as marcas de acento, que saem junto com os caracteres especiais
+    desc = unicodedata.normalize('NFKD', desc)
+    # Remove caracteres especiais, exceto espaço
+    desc = _ESPECIAIS.sub('', desc)
+    # Remove datas e horários (ex: 0205, 1020, 1505, 1930, 20240501, etc)
+    desc = _DATAS.sub(' ', desc)   # blocos de 4 a 8 dígitos
+    # Remove padrões de horas/minutos (ex: 10:20, 19:30, 10h20)
+    desc = _HORAS.sub(' ', desc)
+    # Remove o termo "memo" isolado ou junto a outros termos
+    desc = _MEMO.sub(' ', desc)
+    # Remove ocorrências de "rsmemo", "memo", "rs memo", etc
+    desc = _RS_MEMO.sub(' ', desc)
+    # Remove múltiplos espaços
+    desc = _ESPACOS.sub(' ', desc)
+    # Remove hífens isolados
+    desc = _HIFENS.sub(' ', desc)
+    # Remove espaços no início e fim
+    desc = desc.strip()
+    # Se sobrar datas/hora, remove de novo
+    desc = _DATAS.sub('', desc)
+    # Remove múltiplos espaços novamente
+    desc = _ESPACOS.sub(' ', desc)
+    return desc
+
+
+def normalizar_descricao(descricao):
+    """
+    Normaliza descrições de extrato removendo datas, horários, o termo 'memo', e padronizando para manter
+    apenas a parte relevante (tipo e beneficiário). O resultado fica em cache pela descrição original.
+    Exemplos:
+    "pix  enviado  0205 1020 ipva sefaz rsmemo" -> "pix enviado ipva sefaz rs"
+    "compra com cartao 1505 1930 supermercado memo" -> "compra com cartao supermercado"
+    """
+    if pd.isna(descricao):
+        return ""
+    return _normalizar(str(descricao))
+
+
+def normalizar_serie(serie):
+    """
+    Versão de normalizar_descricao para uma coluna inteira, com os mesmos passos feitos pelas funções
+    vetorizadas do Arrow (em C++, sem passar string por string pelo Python). Cada descrição distinta é
+    normalizada uma única vez; o resultado é idêntico ao da função escalar.
+    Os espaços em branco viram " " antes das expressões, para o \s do RE2 casar com os mesmos do Python.
+    """
+    valores, unicos = pd.factorize(serie, use_na_sentinel=True)
+    desc = pa.array([str(valor) for valor in unicos], type=pa.string())
+    desc = pc.replace_substring_regex(pc.utf8_lower(desc), _BRANCOS_UNICODE, " ")
+    desc = pc.utf8_normalize(pc.utf8_trim(desc, " "), "NFKD")
+    desc = pc.replace_substring_regex(desc, _BRANCOS_UNICODE, " ")
+    passos = [
+        (_ESPECIAIS, ""), (_DATAS, " "), (_HORAS, " "), (_MEMO, " "), (_RS_MEMO, " "),
+        (_ESPACOS, " "), (_HIFENS, " "),
+    ]
+    for padrao, troca in passos:
+        desc = pc.replace_substring_regex(desc, padrao.pattern, troca)
+    desc = pc.utf8_trim(desc, " ")
+    desc = pc.replace_substring_regex(desc, _DATAS.pattern, "")
+    desc = pc.replace_substring_regex(desc, _ESPACOS.pattern, " ")
+    # Valores nulos (código -1) viram string vazia, como na função escalar
+    normalizados = np.array(desc.to_pylist() + [""], dtype=object)
+    return pd.Series(normalizados[valores], index=serie.index, dtype=object)
+
+
+# Função para limpar descrições do C6, removendo "memo" e "rs memo" após normalizar
+def limpar_memo_c6(desc):
+    desc = normalizar_descricao(desc)
+    # Remove todas as ocorrências de "rs memo" e "memo" (case-insensitive)
+    desc = _RS_MEMO_C6.sub(' ', desc)
+    desc = _MEMO_C6.sub(' ', desc)
+    desc = _ESPACOS.sub(' ', desc)
+    return desc.strip().title()
+
+
+def extrair_tipo_e_descricao(descricao):
+    """
+    Extrai o tipo de lançamento e a descrição de um campo de descrição de extrato, de forma resiliente para bancos diferentes.
+    - Se o campo estiver vazio ou só tiver hífens/espaços, retorna ("Outros", "").
+    - Se não houver hífen, ou não houver partes válidas após split, retorna ("Outros", "").
+    - Limpa datas/horas do início da descrição.
+    - Aplica normalização e iniciais maiúsculas no resultado.
+    """
+
+    if pd.isna(descricao):
+        return "Outros", ""
+    desc = str(descricao).strip()
+    # Remove tags e marcadores comuns de OFX/MEMO
+    desc = _TAG_MEMO.sub(' ', desc)
+    desc = _MEMO_C6.sub(' ', desc)
+    desc = _ESPACOS.sub(' ', desc).strip()
+    # Se o campo for vazio ou só hífens ou só espaços, retorna Outros
+    if not desc or _SO_HIFENS.fullmatch(desc):
+        return "Outros", ""
+    # Procura todos os hífens (pode estar rodeado de espaços)
+    hifens = list(_HIFENS.finditer(desc))
+    tipo = ""
+    descricao_restante = ""
+    if len(hifens) >= 2:
+        # Dois ou mais hífens: tipo é até o segundo hífen, descrição é o resto
+        tipo = desc[:hifens[1].start()].replace('-', ' ').strip()
+        descricao_restante = desc[hifens[1].end():].strip()
+    elif len(hifens) == 1:
+        # Apenas um hífen: tipo é antes do hífen, descrição é depois
+        tipo = desc[:hifens[0].start()].strip()
+        descricao_restante = desc[hifens[0].end():].strip()
+    else:
+        # Não há hífen: usa a primeira palavra como tipo, o resto como descrição
+        partes = desc.split()
+        # Se não há partes válidas, retorna Outros
+        if not partes:
+            return "Outros", ""
+        # Se só há uma palavra, mas ela é só hífen, retorna Outros
+        if len(partes) == 1:
+            if _HIFEN.fullmatch(partes[0]):
+                return "Outros", ""
+            tipo = partes[0]
+            descricao_restante = ""
+        else:
+            tipo = partes[0]
+            descricao_restante = " ".join(partes[1:])
+    # Se tipo for vazio ou só hífens, retorna Outros
+    if not tipo or _HIFEN.fullmatch(tipo):
+        return "Outros", ""
+    # Limpa datas/horas do início da descrição
+    if descricao_restante:
+        # Remove datas e horas do início (ex: 0205, 1020, 20240501, 10:20, 10h20, etc)
+        descricao_restante = _DATAS_INICIO.sub("", descricao_restante)
+        descricao_restante = _HORAS_INICIO.sub("", descricao_restante)
+        descricao_restante = _ESPACOS_INICIO.sub('', descricao_restante)
+    # Normaliza tipo e descrição
+    tipo = normalizar_descricao(tipo)
+    descricao_restante = normalizar_descricao(descricao_restante)
+    # Se após normalizar o tipo ficou vazio ou só hífens, retorna Outros
+    if not tipo or _HIFEN.fullmatch(tipo):
+        return "Outros", ""
+    # Inicial maiúscula em cada palavra
+    tipo_fmt = tipo.title()
+    descricao_fmt = descricao_restante.title()
+    return tipo_fmt, descricao_fmt
@@ -0,0 +1,110 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+import pandas as pd
+
+from categorizacao import carregar_regras
+from normalizacao import normalizar_serie
+
+# Regras de categorização de cada usuário (descrição normalizada -> tag), num SQLite indexado por usuário
+ARQUIVO_REGRAS = os.getenv("REGRAS_DB", "regras_usuarios.sqlite3")
+# CSV antigo, compartilhado por todos os usuários; serve de ponto de partida para quem ainda não tem regras
+CSV_LEGADO = "categorias_personalizadas.csv"
+# Tempo máximo esperando outro processo terminar de gravar, em segundos
+ESPERA_TRAVA = 30
+
+# Regras já carregadas neste processo: usuario -> (versão, regras)
+_cache = {}
+_trava = threading.Lock()
+
+
+def _conectar(caminho=None):
+    conexao = sqlite3.connect(caminho or ARQUIVO_REGRAS, timeout=ESPERA_TRAVA, isolation_level=None)
+    # WAL: leituras não esperam as gravações, e cada gravação só acrescenta ao log
+    conexao.execute("PRAGMA journal_mode=WAL")
+    conexao.execute(
+        "CREATE TABLE IF NOT EXISTS regras ("
+        " usuario TEXT NOT NULL, descricao TEXT NOT NULL, tag TEXT NOT NULL, atualizado_em REAL NOT NULL,"
+        " PRIMARY KEY (usuario, descricao)) WITHOUT ROWID"
+    )
+    # Versão das regras de cada usuário, incrementada a cada gravação que muda alguma regra
+    conexao.execute("CREATE TABLE IF NOT EXISTS versoes (usuario TEXT PRIMARY KEY, versao INTEGER NOT NULL) WITHOUT ROWID")
+    return conexao
+
+
+def _versao(conexao, usuario):
+    linha = conexao.execute("SELECT versao FROM versoes WHERE usuario = ?", (usuario,)).fetchone()
+    return linha[0] if linha else None
+
+
+def _gravar(conexao, usuario, pares):
+    # Grava os pares numa transação só; BEGIN IMMEDIATE faz gravações concorrentes esperarem a vez
+    conexao.execute("BEGIN IMMEDIATE")
+    try:
+        alteradas = 0
+        agora = time.time()
+        for descricao, tag in pares.items():
+            cursor = conexao.execute(
+                "INSERT INTO regras (usuario, descricao, tag, atualizado_em) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (usuario, descricao) DO UPDATE SET tag = excluded.tag, atualizado_em = excluded.atualizado_em"
+                " WHERE regras.tag != excluded.tag",
+                (usuario, descricao, tag, agora),
+            )
+            alteradas += cursor.rowcount
+        if alteradas or _versao(conexao, usuario) is None:
+            conexao.execute(
+                "INSERT INTO versoes (usuario, versao) VALUES (?, 1)"
+                " ON CONFLICT (usuario) DO UPDATE SET versao = versao + 1",
+                (usuario,),
+            )
+        conexao.execute("COMMIT")
+    except BaseException:
+        conexao.execute("ROLLBACK")
+        raise
+    return alteradas
+
+
+def carregar_regras_usuario(usuario, caminho=None):
+    """
+    Devolve as regras do usuário (descrição normalizada -> tag). As regras ficam em memória no
+    processo e só são lidas de novo quando a versão gravada muda (ex.: gravação de outra sessão).
+    Na primeira vez, um usuário sem regras recebe as regras do CSV antigo, se ele existir.
+    """
+    usuario = str(usuario)
+    with _trava, closing(_conectar(caminho)) as conexao:
+        versao = _versao(conexao, usuario)
+        if versao is None:
+            legado = carregar_regras(CSV_LEGADO)
+            _gravar(conexao, usuario, {descricao: tag for descricao, tag in legado.items() if isinstance(tag, str)})
+            versao = _versao(conexao, usuario)
+        em_cache = _cache.get((caminho, usuario))
+        if em_cache is not None and em_cache[0] == versao:
+            return em_cache[1]
+        regras = dict(conexao.execute("SELECT descricao, tag FROM regras WHERE usuario = ?", (usuario,)).fetchall())
+        _cache[(caminho, usuario)] = (versao, regras)
+        return regras
+
+
+def pares_descricao_tag(df):
+    # Pares (descrição normalizada -> tag) dos lançamentos, com a descrição montada como no Categorizador
+    df_regras = df[['Tipo Lançamento', 'Descrição', 'Tag']].astype(object).drop_duplicates()
+    descricoes = (df_regras['Tipo Lançamento'].fillna('') + " " + df_regras['Descrição'].fillna('')).str.strip()
+    df_regras = pd.DataFrame({"descricao": normalizar_serie(descricoes), "tag": df_regras["Tag"]}).dropna()
+    return dict(zip(df_regras["descricao"], df_regras["tag"]))
+
+
+def salvar_regras_usuario(usuario, df, caminho=None):
+    """
+    Grava as regras dos lançamentos informados (só os salvos ou editados, não o histórico inteiro).
+    Pares que já estão nas regras com a mesma tag não são regravados. Retorna quantas regras mudaram.
+    """
+    usuario = str(usuario)
+    atuais = carregar_regras_usuario(usuario, caminho)
+    pares = {descricao: tag for descricao, tag in pares_descricao_tag(df).items() if atuais.get(descricao) != tag}
+    if not pares:
+        return 0
+    with _trava, closing(_conectar(caminho)) as conexao:
+        return _gravar(conexao, usuario, pares)
@@ -0,0 +1,104 @@
+import pandas as pd
+
+from compactacao import CENTAVOS
+
+# Dimensões do resumo; o usuário não entra porque cada sessão guarda o resumo de um usuário só
+COLUNAS_CHAVE = ["Mes", "Banco", "Tag", "Tipo Lançamento"]
+COLUNAS_VALORES = ["Receitas", "Despesas", "Quantidade"]
+TAG_INVESTIMENTO = "Investimento Automático"
+# Marcador para banco, tag ou tipo vazios: NaN não se alinha nas somas entre resumos
+SEM_VALOR = "(sem valor)"
+
+
+def com_marcador(valores):
+    return [SEM_VALOR if pd.isna(valor) else valor for valor in valores]
+
+
+def resumir_linhas(df):
+    """
+    Agrega lançamentos por mês, banco, tag e tipo, somando receitas (valores positivos),
+    despesas (valores negativos) e a quantidade de lançamentos. Lançamentos sem data ficam de fora.
+    Os valores ficam em centavos, como no histórico compacto.
+    """
+    if df.empty:
+        indice = pd.MultiIndex.from_arrays([pd.PeriodIndex([], freq="M"), [], [], []], names=COLUNAS_CHAVE)
+        return pd.DataFrame(columns=COLUNAS_VALORES, index=indice, dtype=float)
+    valores = pd.to_numeric(df["Valor"], errors="coerce").fillna(0.0)
+    base = pd.DataFrame({
+        "Mes": df["Data"].dt.to_period("M"),
+        "Banco": df["Banco"].astype(object).fillna(SEM_VALOR),
+        "Tag": df["Tag"].astype(object).fillna(SEM_VALOR),
+        "Tipo Lançamento": df["Tipo Lançamento"].astype(object).fillna(SEM_VALOR),
+        "Receitas": valores.clip(lower=0),
+        "Despesas": valores.clip(upper=0),
+        "Quantidade": 1.0
+    })
+    base = base[base["Mes"].notna()]
+    return base.groupby(COLUNAS_CHAVE).sum()
+
+
+class ResumoMensal:
+    """
+    Resumo do histórico por (mês, banco, tag, tipo), mantido de forma incremental:
+    lançamentos salvos são somados e lançamentos editados ou excluídos são subtraídos,
+    sem reprocessar o histórico inteiro. Os relatórios consultam o resumo em vez das linhas.
+    """
+
+    def __init__(self, historico=None):
+        self.tabela = resumir_linhas(historico if historico is not None else pd.DataFrame())
+
+    def adicionar(self, df):
+        if not df.empty:
+            self.tabela = self.tabela.add(resumir_linhas(df), fill_value=0)
+
+    def remover(self, df):
+        if not df.empty:
+            tabela = self.tabela.sub(resumir_linhas(df), fill_value=0)
+            self.tabela = tabela[tabela["Quantidade"] > 0]
+
+    def consultar(self, bancos, tags, tipos, data_inicio, data_fim, linhas_filtradas):
+        """
+        Devolve o resumo por mês e tag do período e dos filtros informados. Os meses inteiros
+        dentro do período vêm do resumo; os meses das bordas, que o período pega só em parte,
+        são agregados a partir de linhas_filtradas (os lançamentos já filtrados).
+        """
+        inicio, fim = pd.Timestamp(data_inicio), pd.Timestamp(data_fim)
+        primeiro_mes = inicio.to_period("M") if inicio.day == 1 else inicio.to_period("M") + 1
+        ultimo_mes = fim.to_period("M") if fim.is_month_end else fim.to_period("M") - 1
+
+        tabela = self.tabela
+        meses = tabela.index.get_level_values("Mes")
+        mascara = (
+            (meses >= primeiro_mes) & (meses <= ultimo_mes) &
+            tabela.index.get_level_values("Banco").isin(com_marcador(bancos)) &
+            tabela.index.get_level_values("Tag").isin(com_marcador(tags)) &
+            tabela.index.get_level_values("Tipo Lançamento").isin(com_marcador(tipos))
+        )
+        datas = linhas_filtradas["Data"]
+        bordas = linhas_filtradas[(datas < primeiro_mes.start_time) | (datas > ultimo_mes.end_time)]
+        partes = pd.concat([tabela[mascara], resumir_linhas(bordas)])
+        return partes.groupby(["Mes", "Tag"])[COLUNAS_VALORES].sum()
+
+
+def totais(resumo):
+    # Receitas, gastos e saldo em reais, sem os investimentos automáticos
+    base = resumo[resumo.index.get_level_values("Tag") != TAG_INVESTIMENTO]
+    receitas = base["Receitas"].sum()
+    gastos = base["Despesas"].sum()
+    return receitas / CENTAVOS, gastos / CENTAVOS, (receitas + gastos) / CENTAVOS
+
+
+def gastos_por_tag(resumo):
+    # Despesas por tag em reais, sem os investimentos automáticos e sem os lançamentos sem tag, da maior para a menor
+    tags = resumo.index.get_level_values("Tag")
+    base = resumo[(tags != TAG_INVESTIMENTO) & (tags != SEM_VALOR)]
+    por_tag = base.groupby(level="Tag")["Despesas"].sum()
+    return por_tag[por_tag < 0].sort_values() / CENTAVOS
+
+
+def receitas_despesas_por_mes(resumo):
+    # Despesas e receitas em reais de cada mês com movimento, indexadas por "AAAA-MM"
+    por_mes = resumo.groupby(level="Mes")[["Despesas", "Receitas"]].sum()
+    por_mes = por_mes[(por_mes["Despesas"] != 0) | (por_mes["Receitas"] != 0)]
+    por_mes.index = por_mes.index.astype(str)
+    return por_mes / CENTAVOS
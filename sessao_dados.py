@@ -0,0 +1,156 @@
+import os
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from compactacao import memoria_em_bytes
+
+# Memória para os DataFrames guardados por sessão e por todas as sessões do processo, em MB
+MEMORIA_SESSAO_MB = float(os.getenv("MEMORIA_SESSAO_MB", "256"))
+MEMORIA_TOTAL_MB = float(os.getenv("MEMORIA_TOTAL_MB", "1024"))
+# Pasta dos DataFrames que passaram do limite de memória, gravados comprimidos
+DIRETORIO_SESSOES = os.getenv("DIRETORIO_SESSOES", ".cache_sessoes")
+# DataFrames sem uso há mais tempo que isso (ex.: revisão abandonada) são descartados, em segundos
+VALIDADE = 6 * 60 * 60
+
+# (sessão, nome) -> {"df", "caminho", "bytes", "disco", "acesso"}, do menos para o mais usado recentemente
+_quadros = OrderedDict()
+_trava = threading.Lock()
+
+
+def _gravar(df):
+    # Feather comprimido; o que o Arrow não sabe converter (ex.: coluna com tipos misturados) vai em pickle
+    os.makedirs(DIRETORIO_SESSOES, exist_ok=True)
+    caminho = os.path.join(DIRETORIO_SESSOES, uuid.uuid4().hex)
+    try:
+        feather.write_feather(df, caminho + ".arrow", compression="zstd")
+        return caminho + ".arrow"
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError, ValueError):
+        with open(caminho + ".pkl", "wb") as arquivo:
+            pickle.dump(df, arquivo, protocol=pickle.HIGHEST_PROTOCOL)
+        return caminho + ".pkl"
+
+
+def _ler(caminho):
+    if caminho.endswith(".arrow"):
+        return feather.read_feather(caminho)
+    with open(caminho, "rb") as arquivo:
+        return pickle.load(arquivo)
+
+
+def _apagar(caminho):
+    if caminho is not None:
+        try:
+            os.remove(caminho)
+        except FileNotFoundError:
+            pass
+
+
+def _descarregar(item):
+    # Leva o DataFrame para o disco (uma vez só: o arquivo vale até o DataFrame ser trocado)
+    if item["caminho"] is None:
+        item["caminho"] = _gravar(item["df"])
+        item["disco"] = os.path.getsize(item["caminho"])
+    item["df"] = None
+
+
+def _liberar_memoria(protegido):
+    """
+    Descarrega para o disco os DataFrames usados há mais tempo até as sessões e o processo voltarem
+    ao limite de memória. protegido (o DataFrame que acabou de ser usado) só vai para o disco se,
+    sozinho, passar do limite da sua sessão.
+    """
+    por_sessao = {}
+    total = 0
+    for (sessao, _), item in _quadros.items():
+        if item["df"] is not None:
+            por_sessao[sessao] = por_sessao.get(sessao, 0) + item["bytes"]
+            total += item["bytes"]
+    limite_sessao, limite_total = MEMORIA_SESSAO_MB * 1024 ** 2, MEMORIA_TOTAL_MB * 1024 ** 2
+    for chave, item in _quadros.items():
+        if total <= limite_total and all(uso <= limite_sessao for uso in por_sessao.values()):
+            break
+        sessao = chave[0]
+        if item["df"] is None or (chave == protegido and item["bytes"] <= limite_sessao):
+            continue
+        if total > limite_total or por_sessao[sessao] > limite_sessao:
+            _descarregar(item)
+            por_sessao[sessao] -= item["bytes"]
+            total -= item["bytes"]
+
+
+def _expirar():
+    agora = time.time()
+    for chave in [chave for chave, item in _quadros.items() if agora - item["acesso"] > VALIDADE]:
+        _apagar(_quadros.pop(chave)["caminho"])
+
+
+def guardar_quadro(sessao, nome, df):
+    """
+    Guarda o DataFrame da sessão com o nome informado (substitui o anterior, se houver).
+    Se a sessão ou o processo passarem do limite de memória, os DataFrames usados há mais
+    tempo (de qualquer sessão, a começar pelas paradas) são gravados em disco, comprimidos.
+    """
+    with _trava:
+        anterior = _quadros.pop((sessao, nome), None)
+        if anterior is not None:
+            _apagar(anterior["caminho"])
+        _quadros[(sessao, nome)] = {"df": df, "caminho": None, "bytes": memoria_em_bytes(df), "disco": 0, "acesso": time.time()}
+        _expirar()
+        _liberar_memoria((sessao, nome))
+
+
+def obter_quadro(sessao, nome):
+    """
+    Devolve o DataFrame guardado, ou None. Um DataFrame que estava em disco volta para a memória
+    (se couber no limite da sessão); o arquivo é mantido para a próxima vez que ele for descarregado,
+    então alterações no DataFrame devolvido só valem depois de guardar_quadro.
+    """
+    with _trava:
+        item = _quadros.get((sessao, nome))
+        if item is None:
+            return None
+        _quadros.move_to_end((sessao, nome))
+        item["acesso"] = time.time()
+        df = item["df"] if item["df"] is not None else _ler(item["caminho"])
+        item["df"] = df
+        _liberar_memoria((sessao, nome))
+        return df
+
+
+def descartar_quadro(sessao, nome):
+    with _trava:
+        item = _quadros.pop((sessao, nome), None)
+        if item is not None:
+            _apagar(item["caminho"])
+
+
+def limpar_diretorio():
+    # Arquivos esquecidos por processos anteriores (ex.: servidor reiniciado) e já vencidos
+    if not os.path.isdir(DIRETORIO_SESSOES):
+        return
+    limite = time.time() - VALIDADE
+    for nome in os.listdir(DIRETORIO_SESSOES):
+        caminho = os.path.join(DIRETORIO_SESSOES, nome)
+        if os.path.getmtime(caminho) < limite:
+            _apagar(caminho)
+
+
+def uso_sessao(sessao):
+    # Quantidade de DataFrames guardados pela sessão e quanto ocupam em memória e em disco, em bytes
+    with _trava:
+        itens = [item for (dona, _), item in _quadros.items() if dona == sessao]
+        return {
+            "quadros": len(itens),
+            "memoria": sum(item["bytes"] for item in itens if item["df"] is not None),
+            "disco": sum(item["disco"] for item in itens if item["df"] is None),
+        }
+
+
+# Ao importar o módulo (início do processo), apaga o que sobrou de processos anteriores
+limpar_diretorio()
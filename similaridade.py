@@ -0,0 +1,201 @@
+import numpy as np
+
+# Tamanho dos n-gramas de caracteres que formam o vetor de cada descrição
+TAMANHO_NGRAMA = 3
+# Descrições mais parecidas consultadas para cada lançamento
+VIZINHOS = 5
+# Confiança mínima para trocar "Outros" pela tag sugerida
+LIMIAR_CONFIANCA = 0.5
+# Similaridade a partir da qual o vizinho mais parecido é tratado como a mesma descrição (ex.: só
+# muda um número) e decide a tag sozinho, sem votação com os demais vizinhos
+SIMILARIDADE_QUASE_IGUAL = 0.9
+# Tags que não servem de exemplo para outras descrições
+TAGS_IGNORADAS = {"Outros"}
+# Máximo de células (consultas x descrições indexadas) da matriz de similaridade calculada de uma vez
+CELULAS_POR_BLOCO = 4_000_000
+# N-gramas presentes em muitas descrições (ex.: os de "pix enviado") ficam numa matriz densa, multiplicada
+# de uma vez, em vez de expandir listas enormes; no máximo NGRAMAS_DENSOS, cada um em 1/64 das descrições
+NGRAMAS_DENSOS = 256
+FRACAO_DENSA = 1 / 64
+
+
+def ngramas(texto, n=TAMANHO_NGRAMA):
+    # N-gramas de caracteres distintos da descrição, com espaço nas pontas para marcar início e fim das palavras
+    texto = f" {texto} "
+    return {texto[i:i + n] for i in range(max(1, len(texto) - n + 1))}
+
+
+class IndiceSimilaridade:
+    """
+    Índice das descrições já categorizadas pelo usuário, para sugerir a tag de descrições que não
+    caem em nenhuma regra. Cada descrição (normalizada) vira um vetor esparso dos seus n-gramas de
+    caracteres, com norma 1, e a similaridade entre duas descrições é o cosseno entre os vetores.
+
+    Os vetores não dependem das outras descrições (não há IDF), então o índice cresce de forma
+    incremental: atualizar só vetoriza as descrições novas; as já indexadas apenas trocam de tag.
+    """
+
+    def __init__(self, pares=None):
+        self.vocabulario = {}
+        self.linhas = {}
+        self.tags = []
+        # Entradas (linha, coluna, peso) da matriz descrições x n-gramas, em blocos acrescentados por atualizar
+        self._entradas = []
+        self._invertido = None
+        self._codigos = None
+        if pares:
+            self.atualizar(pares)
+
+    def __len__(self):
+        return len(self.tags)
+
+    def _vetorizar(self, descricoes, acrescentar):
+        """
+        Entradas (posição da descrição, coluna, peso) dos vetores das descrições, ordenadas pela posição.
+        Sem acrescentar, n-gramas fora do vocabulário são descartados, mas ainda contam na norma.
+        """
+        posicoes, colunas, pesos = [], [], []
+        vocabulario = self.vocabulario
+        for posicao, descricao in enumerate(descricoes):
+            gramas = ngramas(descricao)
+            if acrescentar:
+                encontradas = [vocabulario.setdefault(grama, len(vocabulario)) for grama in gramas]
+            else:
+                encontradas = [vocabulario[grama] for grama in gramas if grama in vocabulario]
+            posicoes.extend([posicao] * len(encontradas))
+            colunas.extend(encontradas)
+            pesos.extend([1 / np.sqrt(len(gramas))] * len(encontradas))
+        return (
+            np.array(posicoes, dtype=np.int64),
+            np.array(colunas, dtype=np.int64),
+            np.array(pesos, dtype=np.float32),
+        )
+
+    def atualizar(self, pares):
+        """
+        Acrescenta ao índice os pares (descrição normalizada -> tag), como os de regras.pares_descricao_tag.
+        Descrições já indexadas ficam com a tag nova; as marcadas com uma tag ignorada deixam de votar.
+        """
+        novas = []
+        for descricao, tag in pares.items():
+            if not descricao or not isinstance(tag, str):
+                continue
+            tag = None if tag in TAGS_IGNORADAS else tag
+            linha = self.linhas.get(descricao)
+            if linha is not None:
+                self.tags[linha] = tag
+            elif tag is not None:
+                self.linhas[descricao] = len(self.tags) + len(novas)
+                novas.append((descricao, tag))
+        self._codigos = None
+        if not novas:
+            return
+        posicoes, colunas, pesos = self._vetorizar([descricao for descricao, _ in novas], acrescentar=True)
+        self._entradas.append((posicoes + len(self.tags), colunas, pesos))
+        self.tags.extend(tag for _, tag in novas)
+        self._invertido = None
+
+    def _indice_invertido(self):
+        """
+        Matriz descrições x n-gramas separada em duas partes, montadas de novo só depois de acrescentar
+        descrições: os n-gramas frequentes numa matriz densa e, para os demais, as descrições que contêm
+        cada n-grama (formato CSC). densos leva cada coluna do vocabulário à da matriz densa (ou -1).
+        """
+        if self._invertido is None:
+            linhas, colunas, pesos = (np.concatenate(partes) for partes in zip(*self._entradas))
+            frequencias = np.bincount(colunas, minlength=len(self.vocabulario))
+            frequentes = np.argsort(frequencias)[::-1][:NGRAMAS_DENSOS]
+            frequentes = frequentes[frequencias[frequentes] >= max(2, len(self.tags) * FRACAO_DENSA)]
+            densos = np.full(len(self.vocabulario), -1, dtype=np.int64)
+            densos[frequentes] = np.arange(len(frequentes))
+            matriz_densa = np.zeros((len(self.tags), len(frequentes)), dtype=np.float32)
+            na_densa = densos[colunas] >= 0
+            matriz_densa[linhas[na_densa], densos[colunas[na_densa]]] = pesos[na_densa]
+
+            linhas, colunas, pesos = linhas[~na_densa], colunas[~na_densa], pesos[~na_densa]
+            ordem = np.argsort(colunas, kind="stable")
+            inicios = np.zeros(len(self.vocabulario) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(colunas, minlength=len(self.vocabulario)), out=inicios[1:])
+            self._invertido = (densos, matriz_densa, inicios, linhas[ordem], pesos[ordem])
+        return self._invertido
+
+    def _tags_codificadas(self):
+        # Código numérico da tag de cada descrição; as que não votam ficam com -1
+        if self._codigos is None:
+            nomes = sorted({tag for tag in self.tags if tag is not None})
+            posicao = {tag: i for i, tag in enumerate(nomes)}
+            codigos = np.array([posicao.get(tag, -1) for tag in self.tags], dtype=np.int64)
+            self._codigos = (nomes, codigos)
+        return self._codigos
+
+    def sugerir(self, descricoes, vizinhos=VIZINHOS):
+        """
+        Sugere uma tag para cada descrição normalizada, pelos vizinhos mais parecidos no índice,
+        calculando a similaridade de um bloco inteiro de descrições de uma vez.
+        Retorna (tags, confianças): a tag é None quando nenhum vizinho tem n-grama em comum.
+        Os votos de cada tag são a soma dos quadrados das similaridades dos vizinhos que a têm, e a
+        confiança é a parcela de votos da vencedora vezes a similaridade do seu vizinho mais parecido.
+        Um vizinho com similaridade de pelo menos SIMILARIDADE_QUASE_IGUAL decide sozinho, com a
+        própria similaridade como confiança: vários vizinhos medianos não vencem uma quase cópia.
+        """
+        quantidade = len(descricoes)
+        tags = np.full(quantidade, None, dtype=object)
+        confiancas = np.zeros(quantidade)
+        nomes, codigos = self._tags_codificadas()
+        if not quantidade or not nomes:
+            return tags, confiancas
+
+        densos, matriz_densa, inicios, doc_linhas, doc_pesos = self._indice_invertido()
+        posicoes, colunas, pesos = self._vetorizar(descricoes, acrescentar=False)
+        na_densa = densos[colunas] >= 0
+        total = len(self.tags)
+        votantes = codigos >= 0
+        k = min(vizinhos, total)
+        bloco = max(1, CELULAS_POR_BLOCO // total)
+        for primeira in range(0, quantidade, bloco):
+            ultima = min(primeira + bloco, quantidade)
+            faixa = slice(*np.searchsorted(posicoes, [primeira, ultima]))
+            n = ultima - primeira
+            consultas, colunas_bloco, pesos_bloco = posicoes[faixa] - primeira, colunas[faixa], pesos[faixa]
+            densa = na_densa[faixa]
+            # N-gramas frequentes: produto da matriz densa das consultas pela das descrições
+            consultas_densa = np.zeros((n, matriz_densa.shape[1]), dtype=np.float32)
+            consultas_densa[consultas[densa], densos[colunas_bloco[densa]]] = pesos_bloco[densa]
+            similaridades = (consultas_densa @ matriz_densa.T).astype(np.float64)
+            # Demais n-gramas: expande cada um na lista (curta) de descrições que o contêm
+            consultas, colunas_bloco, pesos_bloco = consultas[~densa], colunas_bloco[~densa], pesos_bloco[~densa]
+            comecos = inicios[colunas_bloco]
+            tamanhos = inicios[colunas_bloco + 1] - comecos
+            deslocamentos = np.arange(tamanhos.sum()) - np.repeat(np.cumsum(tamanhos) - tamanhos, tamanhos)
+            entradas = np.repeat(comecos, tamanhos) + deslocamentos
+            similaridades += np.bincount(
+                np.repeat(consultas, tamanhos) * total + doc_linhas[entradas],
+                weights=np.repeat(pesos_bloco, tamanhos) * doc_pesos[entradas],
+                minlength=n * total,
+            ).reshape(n, total)
+            similaridades[:, ~votantes] = 0
+
+            # Os k vizinhos mais parecidos de cada consulta e os votos de cada tag
+            proximos = np.argpartition(similaridades, total - k, axis=1)[:, total - k:]
+            sims = np.take_along_axis(similaridades, proximos, axis=1)
+            tags_proximos = np.maximum(codigos[proximos], 0)
+            votos = np.bincount(
+                (np.arange(n)[:, None] * len(nomes) + tags_proximos).ravel(),
+                weights=(sims ** 2).ravel(),
+                minlength=n * len(nomes),
+            ).reshape(n, len(nomes))
+            vencedoras = votos.argmax(axis=1)
+            soma_votos = votos.sum(axis=1)
+            maior_sim = np.where(tags_proximos == vencedoras[:, None], sims, 0).max(axis=1)
+            com_votos = soma_votos > 0
+            confiancas[primeira:ultima][com_votos] = (
+                votos[np.arange(n), vencedoras][com_votos] / soma_votos[com_votos] * maior_sim[com_votos]
+            )
+            # Quase cópia de uma descrição já categorizada: a tag dela, sem votação
+            mais_parecido = sims.argmax(axis=1)
+            similaridade_topo = sims[np.arange(n), mais_parecido]
+            quase_iguais = similaridade_topo >= SIMILARIDADE_QUASE_IGUAL
+            vencedoras[quase_iguais] = tags_proximos[np.arange(n), mais_parecido][quase_iguais]
+            confiancas[primeira:ultima][quase_iguais] = similaridade_topo[quase_iguais]
+            tags[primeira:ultima][com_votos] = np.array(nomes, dtype=object)[vencedoras[com_votos]]
+        return tags, confiancas
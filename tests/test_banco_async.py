@@ -0,0 +1,136 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import banco_async
+from banco_async import LimiteRequisicoes, mapear, rodar
+
+
+class Relogio:
+    # Relógio falso: asyncio.sleep só avança o tempo, sem esperar de verdade
+    def __init__(self):
+        self.agora = 0.0
+        self.esperas = []
+        self._dormir = asyncio.sleep
+
+    def monotonic(self):
+        return self.agora
+
+    async def sleep(self, segundos):
+        self.esperas.append(segundos)
+        self.agora += segundos
+        await self._dormir(0)
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    relogio = Relogio()
+    monkeypatch.setattr(banco_async.time, "monotonic", relogio.monotonic)
+    monkeypatch.setattr(asyncio, "sleep", relogio.sleep)
+    # Sem variação aleatória na espera entre tentativas
+    monkeypatch.setattr(banco_async.random, "uniform", lambda inicio, fim: 1.0)
+    monkeypatch.setattr(banco_async, "limite", LimiteRequisicoes(por_segundo=1000, rajada=1000))
+    return relogio
+
+
+class Falhas:
+    # Função que falha com o erro informado nas primeiras chamadas e depois responde
+    def __init__(self, erro, falhas):
+        self.erro = erro
+        self.falhas = falhas
+        self.chamadas = 0
+
+    def __call__(self, valor):
+        self.chamadas += 1
+        if self.chamadas <= self.falhas:
+            raise self.erro
+        return valor * 2
+
+
+def test_erro_transitorio_tenta_de_novo_com_espera_exponencial(relogio):
+    funcao = Falhas(ConnectionError("timeout"), falhas=2)
+    assert rodar(mapear(funcao, [(21,)])) == [42]
+    assert funcao.chamadas == 3
+    assert relogio.esperas == [0.5, 1.0]
+
+
+def test_erro_transitorio_desiste_depois_das_tentativas(relogio):
+    funcao = Falhas(ConnectionError("timeout"), falhas=10)
+    resultado, = rodar(mapear(funcao, [(1,)]))
+    assert isinstance(resultado, ConnectionError)
+    assert funcao.chamadas == banco_async.TENTATIVAS
+    assert relogio.esperas == [0.5, 1.0, 2.0]
+
+
+@pytest.mark.parametrize("erro", [ValueError("lote inválido"), TypeError("argumento")])
+def test_erro_de_programacao_nao_tenta_de_novo(relogio, erro):
+    funcao = Falhas(erro, falhas=1)
+    resultado, = rodar(mapear(funcao, [(1,)]))
+    assert resultado is erro
+    assert funcao.chamadas == 1 and relogio.esperas == []
+
+
+def test_sem_repetir_a_primeira_falha_volta(relogio):
+    funcao = Falhas(ConnectionError("timeout"), falhas=1)
+    resultado, = rodar(mapear(funcao, [(1,)], repetir=False))
+    assert isinstance(resultado, ConnectionError)
+    assert funcao.chamadas == 1
+
+
+def test_falha_de_um_item_nao_cancela_os_outros(relogio):
+    def funcao(valor):
+        if valor == 2:
+            raise ValueError("ruim")
+        return valor
+    resultados = rodar(mapear(funcao, [(1,), (2,), (3,)]))
+    assert resultados[0] == 1 and isinstance(resultados[1], ValueError) and resultados[2] == 3
+
+
+def test_mapear_respeita_a_concorrencia(relogio):
+    trava = threading.Lock()
+    em_andamento = []
+    maximo = []
+
+    def funcao(valor):
+        with trava:
+            em_andamento.append(valor)
+            maximo.append(len(em_andamento))
+        time.sleep(0.01)
+        with trava:
+            em_andamento.remove(valor)
+        return valor
+
+    assert rodar(mapear(funcao, [(valor,) for valor in range(12)], concorrencia=3)) == list(range(12))
+    assert max(maximo) <= 3
+
+
+def test_limite_segura_as_requisicoes_acima_da_media(relogio):
+    limite = LimiteRequisicoes(por_segundo=50, rajada=10)
+    inicios = []
+
+    async def requisicao():
+        await limite.aguardar()
+        inicios.append(relogio.agora)
+
+    async def muitas():
+        # Uma por vez: cada espera avança o relógio antes da próxima requisição
+        for _ in range(300):
+            await requisicao()
+
+    rodar(muitas())
+    # A rajada passa sem esperar; depois, nenhum intervalo de 1 s tem mais que média + rajada
+    assert inicios[:10] == [0.0] * 10
+    for posicao, inicio in enumerate(inicios):
+        no_intervalo = sum(1 for outro in inicios[posicao:] if outro < inicio + 1.0)
+        assert no_intervalo <= 50 + 10
+    assert inicios[-1] == pytest.approx((300 - 10) / 50)
+
+
+def test_limite_e_compartilhado_entre_requisicoes_simultaneas(monkeypatch):
+    # Todas pedem a ficha no mesmo instante: cada uma recebe uma espera diferente, na fila
+    monkeypatch.setattr(banco_async.time, "monotonic", lambda: 100.0)
+    limite = LimiteRequisicoes(por_segundo=10, rajada=2)
+    esperas = [limite._reservar() for _ in range(6)]
+    assert esperas == pytest.approx([0.0, 0.0, 0.1, 0.2, 0.3, 0.4])
@@ -0,0 +1,78 @@
+import pandas as pd
+
+import banco_dados
+from banco_dados import diferencas_historico, salvar_lancamentos
+from benchmarks.supabase_falso import ClienteFalso
+from compactacao import compactar_historico, valores_em_centavos, valores_em_reais
+from resumos import ResumoMensal
+
+
+def historico_exemplo():
+    return compactar_historico(pd.DataFrame({
+        "Banco": ["BB", "BB", "C6"],
+        "Data": pd.to_datetime(["2024-01-05", "2024-01-20", "2024-02-01"]),
+        "Tipo Lançamento": ["Pix", "Pix", "Compra"],
+        "Descrição": ["mercado central", "salario", "padaria"],
+        "Valor": [-10.0, 25.5, -3.0],
+        "Tag": ["Mercado", "Salário", "Outros"],
+    }, index=pd.Index([1, 2, 3], name="id")))
+
+
+def no_editor(historico):
+    # Como o app entrega o histórico ao editor: id como coluna e índice de posições
+    return valores_em_reais(historico).reset_index()
+
+
+def test_edicao_de_tag_atualiza_resumo():
+    historico = historico_exemplo()
+    editado = no_editor(historico)
+    editado.loc[editado["id"] == 1, "Tag"] = "Lazer"
+
+    novos, alterados, ids_excluidos = diferencas_historico(historico, valores_em_centavos(editado))
+
+    assert novos.empty and ids_excluidos == []
+    assert list(alterados.index) == [1]
+    assert pd.api.types.is_datetime64_any_dtype(alterados["Data"])
+    resumo = ResumoMensal(historico)
+    resumo.remover(historico.loc[alterados.index])
+    resumo.adicionar(alterados)
+    por_tag = resumo.tabela.groupby(level="Tag")["Despesas"].sum()
+    assert por_tag["Lazer"] == -1000
+    assert "Mercado" not in por_tag.index
+    assert resumo.tabela["Quantidade"].sum() == 3
+
+
+def test_linha_incluida_sem_id_e_novo_lancamento():
+    historico = historico_exemplo()
+    editado = no_editor(historico)
+    incluida = {"id": None, "Banco": "C6", "Data": pd.Timestamp("2024-03-01"), "Tipo Lançamento": "Pix",
+                "Descrição": "aluguel", "Valor": -800.0, "Tag": "Moradia"}
+    editado = pd.concat([editado, pd.DataFrame([incluida])], ignore_index=True)
+    editado = editado[editado["id"] != 3]
+
+    novos, alterados, ids_excluidos = diferencas_historico(historico, valores_em_centavos(editado))
+
+    assert list(novos["Descrição"]) == ["aluguel"]
+    assert "id" not in novos.columns
+    assert novos["Valor"].tolist() == [-80000]
+    assert alterados.empty
+    assert ids_excluidos == [3]
+
+
+def test_salvar_lancamentos_informa_gravados_e_ignorados(monkeypatch):
+    falso = ClienteFalso()
+    monkeypatch.setattr(banco_dados, "cliente", lambda: falso)
+    monkeypatch.setattr(banco_dados, "armazenamento", banco_dados.ArmazenamentoSupabase)
+    extrato = pd.DataFrame({
+        "Banco": "C6", "Conta": [None, None, "111", "222"], "Data": pd.Timestamp("2024-01-05"),
+        "Tipo Lançamento": "Compra", "Descrição": ["cafe", "cafe", "x", "y"], "Valor": [-5.0, -5.0, -1.0, -1.0],
+        "FITID": [None, None, "F1", "F1"], "Tag": "Outros", "Arquivo": "a.ofx",
+    })
+
+    primeiro = salvar_lancamentos("u", extrato)
+    segundo = salvar_lancamentos("u", extrato)
+
+    assert sum(r["gravados"] for r in primeiro) == 4
+    assert len(falso.lancamentos.linhas) == 4
+    assert sum(r["gravados"] for r in segundo) == 0
+    assert sum(r["quantidade"] for r in segundo) == 4
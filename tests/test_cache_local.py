@@ -0,0 +1,109 @@
+import pandas as pd
+import pytest
+
+import banco_dados
+import cache_local
+from banco_dados import diferencas_historico, salvar_edicao_historico, salvar_lancamentos
+from banco_local import ArmazenamentoSQLite
+from cache_local import ler_cache, registrar_edicao, sincronizar_historico
+from compactacao import valores_em_centavos, valores_em_reais
+
+
+def usar_sqlite(monkeypatch, tmp_path):
+    local = ArmazenamentoSQLite(str(tmp_path / "lancamentos.sqlite3"))
+    monkeypatch.setattr(banco_dados, "armazenamento", lambda: local)
+    monkeypatch.setattr(cache_local, "DIRETORIO_CACHE", str(tmp_path / "cache"))
+
+
+def extrato(*descricoes):
+    return pd.DataFrame({
+        "Banco": "C6", "Data": pd.Timestamp("2024-01-05"), "Tipo Lançamento": "Compra",
+        "Descrição": list(descricoes), "Valor": -5.0, "Tag": "Outros",
+    })
+
+
+def test_edicao_e_exclusao_de_outra_sessao_recarregam_a_copia_local(monkeypatch, tmp_path):
+    usar_sqlite(monkeypatch, tmp_path)
+    salvar_lancamentos("u", extrato("cafe", "pao", "leite"), deduplicar=False)
+    historico, novos, _ = sincronizar_historico("u")
+    assert novos is None and len(historico) == 3
+
+    # Inclusões continuam vindo pela carga incremental por id
+    salvar_lancamentos("u", extrato("suco"), deduplicar=False)
+    historico, novos, _ = sincronizar_historico("u")
+    assert list(novos["Descrição"]) == ["suco"] and len(historico) == 4
+
+    # Outra sessão edita uma linha e exclui outra: a cópia local não serve mais
+    alterado = historico.iloc[[0]].assign(Tag="Alimentação")
+    salvar_edicao_historico("u", historico.iloc[:0], alterado, [int(historico.index[1])])
+    historico, novos, _ = sincronizar_historico("u")
+    assert novos is None
+    assert len(historico) == 3
+    assert historico.loc[alterado.index[0], "Tag"] == "Alimentação"
+
+
+@pytest.mark.filterwarnings("error::FutureWarning")
+def test_usuario_novo_sincroniza_vazio_e_depois_edita(monkeypatch, tmp_path):
+    usar_sqlite(monkeypatch, tmp_path)
+    historico, _, _ = sincronizar_historico("novo")
+    assert historico.empty and historico.index.name == "id"
+
+    salvar_lancamentos("novo", extrato("cafe", "pao"), deduplicar=False)
+    sincronizar_historico("novo")
+    # Outra sessão abre a cópia local e edita pelo editor (id como coluna)
+    historico, _ = ler_cache("novo")
+    assert historico.index.name == "id"
+    editado = valores_em_reais(historico).reset_index()
+    editado.loc[0, "Tag"] = "Alimentação"
+    novos, alterados, ids_excluidos = diferencas_historico(historico, valores_em_centavos(editado))
+    assert novos.empty and ids_excluidos == []
+    assert list(alterados["Tag"]) == ["Alimentação"]
+
+
+def editar(historico, descricao_alterada, id_excluido):
+    # Edição feita pelo editor do app: muda a tag de uma descrição e remove uma linha
+    editado = valores_em_reais(historico).reset_index()
+    editado.loc[editado["Descrição"] == descricao_alterada, "Tag"] = "Alimentação"
+    editado = editado[editado["id"] != id_excluido]
+    return diferencas_historico(historico, valores_em_centavos(editado))
+
+
+def test_edicao_do_proprio_app_continua_na_copia_local(monkeypatch, tmp_path):
+    usar_sqlite(monkeypatch, tmp_path)
+    salvar_lancamentos("u", extrato("cafe", "pao", "leite"), deduplicar=False)
+    historico, _, _ = sincronizar_historico("u")
+    novos, alterados, ids_excluidos = editar(historico, "cafe", int(historico.index[1]))
+    resultados = salvar_edicao_historico("u", novos, alterados, ids_excluidos)
+    editados = sum(r["gravados"] for r in resultados if r["operacao"] in ("atualizar", "excluir"))
+    assert registrar_edicao("u", alterados, ids_excluidos, editados)
+
+    # A próxima sincronização segue incremental, já com a edição
+    historico, novos, _ = sincronizar_historico("u")
+    assert novos is not None and novos.empty
+    assert list(historico["Descrição"]) == ["cafe", "leite"]
+    assert list(historico["Tag"]) == ["Alimentação", "Outros"]
+    assert historico["Valor"].dtype == "int64"
+
+    # Uma edição de outra sessão entre a sincronização e a gravação descarta a cópia
+    salvar_edicao_historico("u", historico.iloc[:0], historico.iloc[[1]].assign(Tag="Mercado"), [])
+    novos, alterados, ids_excluidos = editar(historico, "leite", int(historico.index[0]))
+    resultados = salvar_edicao_historico("u", novos, alterados, ids_excluidos)
+    editados = sum(r["gravados"] for r in resultados if r["operacao"] in ("atualizar", "excluir"))
+    assert not registrar_edicao("u", alterados, ids_excluidos, editados)
+    historico, novos, _ = sincronizar_historico("u")
+    assert novos is None
+    assert list(historico["Descrição"]) == ["leite"]
+
+
+def test_edicao_de_linha_ja_excluida_descarta_a_copia_local(monkeypatch, tmp_path):
+    usar_sqlite(monkeypatch, tmp_path)
+    salvar_lancamentos("u", extrato("cafe", "pao"), deduplicar=False)
+    historico, _, _ = sincronizar_historico("u")
+    # Outra sessão exclui "cafe"; esta sessão altera a mesma linha: o UPDATE não acha a linha
+    salvar_edicao_historico("u", historico.iloc[:0], historico.iloc[:0], [int(historico.index[0])])
+    novos, alterados, ids_excluidos = editar(historico, "cafe", None)
+    resultados = salvar_edicao_historico("u", novos, alterados, ids_excluidos)
+    editados = sum(r["gravados"] for r in resultados if r["operacao"] in ("atualizar", "excluir"))
+    assert editados == 0
+    assert not registrar_edicao("u", alterados, ids_excluidos, editados)
+    assert ler_cache("u") is None
@@ -0,0 +1,59 @@
+import random
+
+import pandas as pd
+import pytest
+
+from categorizacao import CATEGORIAS, Categorizador
+from normalizacao import normalizar_descricao
+
+
+def categorizar_como_antes(descricao, regras_usuario, categorias=CATEGORIAS):
+    # Laço que o app usava antes do autômato: regras do usuário, depois a primeira palavra-chave contida
+    desc_norm = normalizar_descricao(descricao)
+    for chave_desc, categoria in regras_usuario.items():
+        if chave_desc == desc_norm:
+            return categoria
+    for palavra, categoria in categorias.items():
+        if palavra in desc_norm:
+            return categoria
+    return "Outros"
+
+
+def test_igual_ao_laco_com_as_categorias_do_app():
+    regras = {"pix enviado joao silva": "Mesada", "compra com cartao padaria": "Lazer"}
+    descricoes = [
+        "PIX ENVIADO 0205 1020 Joao Silva", "Compra com cartão 1505 Padaria", "SUPERMERCADO BOM PRECO",
+        "Drogaria São João", "BB Rende Fácil", "bb rende facil", "Posto Ipiranga", "Pet shop seguros",
+        "rge sul 1234 memo", "comercial zaffari supermercado", "TED recebida", "", "manutencao impostos",
+    ]
+    categorizador = Categorizador(regras)
+    for descricao in descricoes:
+        assert categorizador.categorizar(descricao) == categorizar_como_antes(descricao, regras), descricao
+    serie = pd.Series(descricoes * 3)
+    assert list(categorizador.categorizar_serie(serie)) == [categorizar_como_antes(d, regras) for d in serie]
+
+
+@pytest.mark.parametrize("categorias, descricao, esperada", [
+    # A primeira na ordem do dicionário vale, mesmo aparecendo depois no texto ou dentro de outra
+    ({"mercado": "A", "supermercado": "B"}, "supermercado", "A"),
+    ({"supermercado": "B", "mercado": "A"}, "supermercado", "B"),
+    ({"hers": "A", "his": "B", "she": "C", "he": "D"}, "ushers", "A"),
+    ({"his": "B", "she": "C", "he": "D"}, "ushers", "C"),
+    ({"abcd": "A", "bc": "B"}, "xabcx", "B"),
+    ({"aab": "A", "ab": "B"}, "aaab", "A"),
+])
+def test_palavras_sobrepostas_respeitam_a_ordem(categorias, descricao, esperada):
+    assert Categorizador(categorias=categorias).categorizar(descricao) == esperada
+    assert categorizar_como_antes(descricao, {}, categorias) == esperada
+
+
+def test_igual_ao_laco_com_palavras_aleatorias():
+    # Alfabeto pequeno, para as palavras se sobreporem e exercitarem os links de falha do autômato
+    gerador = random.Random(11)
+    for _ in range(200):
+        palavras = {"".join(gerador.choice("ab c") for _ in range(gerador.randint(1, 5))).strip() or "a": None for _ in range(8)}
+        categorias = {palavra: f"tag{posicao}" for posicao, palavra in enumerate(palavras)}
+        categorizador = Categorizador(categorias=categorias)
+        for _ in range(20):
+            texto = "".join(gerador.choice("ab c") for _ in range(gerador.randint(0, 12)))
+            assert categorizador.categorizar(texto) == categorizar_como_antes(texto, {}, categorias), (categorias, texto)
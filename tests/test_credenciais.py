@@ -0,0 +1,98 @@
+import multiprocessing
+import os
+import threading
+import time
+
+import pytest
+import streamlit_authenticator as stauth
+import yaml
+
+import credenciais
+from credenciais import cadastrar_usuario, carregar_config, limitar_verificacao
+
+
+def autenticador(config):
+    return limitar_verificacao(stauth.Authenticate(
+        config["credentials"], config["cookie"]["name"], config["cookie"]["key"], config["cookie"]["expiry_days"]
+    ))
+
+
+@pytest.fixture
+def caminho(tmp_path):
+    return str(tmp_path / "config.yaml")
+
+
+def test_verificacoes_de_senha_simultaneas_respeitam_o_limite(monkeypatch, caminho):
+    cadastrar_usuario("ana", "Ana", stauth.Hasher.hash("segredo"), caminho)
+    modelo = autenticador(carregar_config(caminho)).authentication_controller.authentication_model
+    trava = threading.Lock()
+    em_andamento = []
+    maximo = []
+
+    def verificar_medindo(senha, senha_hash):
+        with trava:
+            em_andamento.append(senha)
+            maximo.append(len(em_andamento))
+        time.sleep(0.02)
+        with trava:
+            em_andamento.remove(senha)
+        # Sem o bcrypt de verdade, para o teste não depender da velocidade da máquina
+        return senha == "segredo"
+
+    monkeypatch.setattr(stauth.Hasher, "check_pw", staticmethod(verificar_medindo))
+    resultados = []
+    threads = [threading.Thread(target=lambda senha=senha: resultados.append(modelo.check_credentials("ana", senha))) for senha in ["segredo", "errada"] * 4]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(resultados) == [False] * 4 + [True] * 4
+    assert max(maximo) <= credenciais.BCRYPT_SIMULTANEOS
+    # A classe da biblioteca não é alterada: só a instância do app passa pelo limite
+    assert stauth.Hasher.check_pw is verificar_medindo
+
+
+def test_config_e_relida_so_quando_o_arquivo_muda(monkeypatch, caminho):
+    leituras = []
+    ler = credenciais._ler
+    monkeypatch.setattr(credenciais, "_ler", lambda arquivo: leituras.append(arquivo) or ler(arquivo))
+
+    assert carregar_config(caminho)["credentials"]["usernames"] == {}
+    carregar_config(caminho)
+    assert len(leituras) == 1
+
+    # Outro processo grava o arquivo direto (sem passar pelo cache deste processo)
+    with open(caminho) as arquivo:
+        config = yaml.safe_load(arquivo)
+    config["credentials"]["usernames"] = {"bia": {"name": "Bia", "password": stauth.Hasher.hash("x")}}
+    with open(caminho, "w") as arquivo:
+        yaml.dump(config, arquivo)
+    estado = os.stat(caminho)
+    os.utime(caminho, ns=(estado.st_atime_ns, estado.st_mtime_ns + 1_000_000))
+    assert list(carregar_config(caminho)["credentials"]["usernames"]) == ["bia"]
+    assert len(leituras) == 2
+
+    # Cada chamada recebe uma cópia: o Authenticate pode alterar a sua sem afetar o cache
+    carregar_config(caminho)["credentials"]["usernames"].clear()
+    assert list(carregar_config(caminho)["credentials"]["usernames"]) == ["bia"]
+
+
+def _cadastrar_varios(caminho, prefixo, quantidade, senha_hash):
+    # Roda em outro processo: só a trava no arquivo (fcntl) separa as gravações
+    for numero in range(quantidade):
+        cadastrar_usuario(f"{prefixo}{numero}", prefixo, senha_hash, caminho)
+
+
+@pytest.mark.skipif(credenciais.fcntl is None, reason="sem fcntl, a trava vale só dentro do processo")
+def test_cadastros_de_processos_diferentes_nao_se_apagam(caminho):
+    carregar_config(caminho)
+    senha_hash = stauth.Hasher.hash("segredo")
+    contexto = multiprocessing.get_context("spawn")
+    processos = [contexto.Process(target=_cadastrar_varios, args=(caminho, prefixo, 15, senha_hash)) for prefixo in ("ana", "bia")]
+    for processo in processos:
+        processo.start()
+    for processo in processos:
+        processo.join(60)
+        assert processo.exitcode == 0
+    assert len(carregar_config(caminho)["credentials"]["usernames"]) == 30
+    assert not cadastrar_usuario("ana0", "Ana", senha_hash, caminho)
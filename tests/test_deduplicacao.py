@@ -0,0 +1,43 @@
+import pandas as pd
+
+from deduplicacao import calcular_chaves
+
+
+def registros(quantidade=1, **colunas):
+    base = {
+        "usuario": "u", "banco": "C6", "data": "2024-01-05", "tipo_lancamento": "Compra",
+        "descricao": "cafe", "valor": -5.0,
+    }
+    base.update(colunas)
+    return pd.DataFrame(base, index=range(quantidade))
+
+
+def test_compras_identicas_no_mesmo_dia_tem_chaves_diferentes():
+    chaves = calcular_chaves(registros(3))
+    assert chaves.nunique() == 3
+    assert chaves[1] == chaves[0] + "#1"
+
+
+def test_mesmo_fitid_em_contas_diferentes():
+    df = registros(2)
+    chaves = calcular_chaves(df, fitids=pd.Series(["F1", "F1"]), contas=pd.Series(["111", "222"]))
+    assert list(chaves) == ["fitid:C6:111:F1", "fitid:C6:222:F1"]
+
+
+def test_conta_entra_no_hash_sem_fitid():
+    df = registros(2)
+    chaves = calcular_chaves(df, contas=pd.Series(["111", "222"]))
+    assert chaves.nunique() == 2
+    assert not chaves.str.contains("#").any()
+
+
+def test_repeticoes_recomecam_em_cada_arquivo():
+    # O mesmo lançamento em dois extratos sobrepostos continua sendo um só
+    df = registros(4)
+    chaves = calcular_chaves(df, arquivos=pd.Series(["a.ofx", "a.ofx", "b.ofx", "b.ofx"]))
+    assert list(chaves[:2]) == list(chaves[2:])
+    assert chaves[0] != chaves[1]
+
+
+def test_chave_estavel_para_o_mesmo_conteudo():
+    assert calcular_chaves(registros()).equals(calcular_chaves(registros()))
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from compactacao import compactar_historico
+from filtros import FiltroHistorico
+
+
+def historico_exemplo(quantidade=400):
+    gerador = np.random.default_rng(7)
+    descricoes = ["Padaria Pão Quente", "Mercado Central", "Uber *Trip", "PIX João da Silva", "Supermercado Bom Preço", ""]
+    df = pd.DataFrame({
+        "Banco": gerador.choice(["C6", "Nubank", "BB"], quantidade),
+        "Data": pd.Timestamp("2024-01-01") + pd.to_timedelta(gerador.integers(0, 120, quantidade), unit="D"),
+        "Tipo Lançamento": gerador.choice(["Compra", "Pix"], quantidade),
+        "Descrição": gerador.choice(descricoes, quantidade),
+        "Valor": gerador.normal(-50, 30, quantidade).round(2),
+        "Tag": gerador.choice(["Mercado", "Transporte", None], quantidade),
+    }, index=pd.RangeIndex(1, quantidade + 1, name="id"))
+    return compactar_historico(df)
+
+
+def filtrar_como_antes(historico, bancos, tags, tipos, data_inicio, data_fim, texto=""):
+    # Máscara do pandas que o app usava antes do FiltroHistorico (linhas ordenadas por data, como ele devolve)
+    filtrado = historico[
+        historico["Banco"].isin(bancos) &
+        historico["Tag"].isin(tags) &
+        historico["Tipo Lançamento"].isin(tipos) &
+        (historico["Data"] >= pd.Timestamp(data_inicio)) &
+        (historico["Data"] <= pd.Timestamp(data_fim))
+    ]
+    if texto:
+        filtrado = filtrado[filtrado["Descrição"].str.contains(texto, case=False, na=False)]
+    return filtrado.sort_values("Data", kind="stable")
+
+
+@pytest.mark.parametrize("bancos, tags, tipos, data_inicio, data_fim, texto", [
+    (["C6", "Nubank", "BB"], ["Mercado", "Transporte", None], ["Compra", "Pix"], "2024-01-01", "2024-12-31", ""),
+    (["C6"], ["Mercado", "Transporte", None], ["Compra", "Pix"], "2024-01-01", "2024-12-31", ""),
+    (["C6", "BB"], ["Transporte", None], ["Pix"], "2024-01-01", "2024-12-31", ""),
+    (["C6", "Nubank", "BB"], ["Mercado"], ["Compra", "Pix"], "2024-02-10", "2024-03-05", ""),
+    (["C6", "Nubank", "BB"], ["Mercado", "Transporte", None], ["Compra", "Pix"], "2024-01-01", "2024-12-31", "central"),
+    (["C6", "Nubank"], ["Mercado", "Transporte", None], ["Compra"], "2024-01-15", "2024-04-01", "uber"),
+    (["C6", "Nubank", "BB"], ["Mercado", "Transporte", None], ["Compra", "Pix"], "2024-01-01", "2024-12-31", "PÃO"),
+    ([], ["Mercado"], ["Compra"], "2024-01-01", "2024-12-31", ""),
+])
+def test_filtrar_igual_a_mascara_do_pandas(bancos, tags, tipos, data_inicio, data_fim, texto):
+    historico = historico_exemplo()
+    esperado = filtrar_como_antes(historico, bancos, tags, tipos, data_inicio, data_fim, texto)
+    obtido = FiltroHistorico(historico).filtrar(bancos, tags, tipos, data_inicio, data_fim, texto)
+    pd.testing.assert_frame_equal(obtido, esperado)
+
+
+def test_busca_por_inicio_de_palavra_em_vez_de_trecho():
+    # Mudança documentada: cada palavra buscada casa com o início de alguma palavra da descrição
+    historico = historico_exemplo()
+    filtro = FiltroHistorico(historico)
+    todos = (["C6", "Nubank", "BB"], ["Mercado", "Transporte", None], ["Compra", "Pix"], "2024-01-01", "2024-12-31")
+    # "mercado" no meio de "Supermercado" casava com o trecho, mas não é início de palavra
+    assert set(filtrar_como_antes(historico, *todos, "mercado")["Descrição"]) == {"Mercado Central", "Supermercado Bom Preço"}
+    assert set(filtro.filtrar(*todos, "mercado")["Descrição"]) == {"Mercado Central"}
+    # Várias palavras: todas precisam aparecer, em qualquer ordem e não necessariamente juntas
+    assert filtrar_como_antes(historico, *todos, "quente padaria").empty
+    assert set(filtro.filtrar(*todos, "quente padaria")["Descrição"]) == {"Padaria Pão Quente"}
+    assert set(filtro.filtrar(*todos, "jo sil")["Descrição"]) == {"PIX João da Silva"}
+
+
+def test_data_inicial_depois_da_final_devolve_vazio():
+    historico = historico_exemplo()
+    filtrado = FiltroHistorico(historico).filtrar(["C6", "Nubank", "BB"], ["Mercado"], ["Compra", "Pix"], "2024-03-01", "2024-02-01", "mercado")
+    assert filtrado.empty
+    assert list(filtrado.columns) == list(historico.columns)
@@ -0,0 +1,12 @@
+from benchmarks.gerador_ofx import gerar_ofx
+from importacao import importar_arquivos
+
+
+def test_arquivo_que_nao_e_ofx_ou_cortado_vem_com_erro():
+    completo = gerar_ofx("C6", 10)
+    arquivos = [("extrato.ofx", completo, "C6"), ("foto.ofx", b"\x89PNG...", "C6"), ("cortado.ofx", completo[:len(completo) // 2], "C6")]
+    df, relatorio = importar_arquivos(arquivos, {}, max_processos=1)
+    assert len(df) == 10
+    assert [item["erro"] is None for item in relatorio] == [True, False, False]
+    assert "não é um arquivo OFX" in relatorio[1]["erro"]
+    assert "incompleto" in relatorio[2]["erro"]
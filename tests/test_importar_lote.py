@@ -0,0 +1,44 @@
+import re
+
+import pytest
+
+import banco_dados
+from benchmarks.gerador_ofx import gerar_ofx
+from importar_lote import importar_pasta
+
+
+@pytest.fixture
+def pasta(tmp_path):
+    (tmp_path / "a_bb.ofx").write_bytes(gerar_ofx("BB", 30))
+    (tmp_path / "b_desconhecido.ofx").write_bytes(re.sub(rb"<BANKID>\d+", b"<BANKID>999", gerar_ofx("BB", 5)))
+    (tmp_path / "c_c6.ofx").write_bytes(gerar_ofx("C6", 20, semente=1))
+    (tmp_path / "d_cortado.ofx").write_bytes(gerar_ofx("C6", 20)[:1500])
+    (tmp_path / "notas.txt").write_text("não é extrato")
+    return tmp_path
+
+
+def test_dry_run_numera_todos_os_arquivos_e_avisa_os_pulados(monkeypatch, pasta):
+    def salvar(*args, **kwargs):
+        raise AssertionError("o dry-run não deveria gravar")
+    monkeypatch.setattr(banco_dados, "salvar_lancamentos", salvar)
+    linhas = []
+    resumo = importar_pasta(str(pasta), "ana", max_processos=1, dry_run=True, regras_usuario={}, progresso=linhas.append)
+
+    assert resumo["arquivos"] == 4
+    assert resumo["lancamentos"] == 50 and resumo["gravados"] == 0
+    assert [erro["arquivo"] for erro in resumo["erros"]] == [str(pasta / "b_desconhecido.ofx"), str(pasta / "d_cortado.ofx")]
+    # Uma linha por arquivo, com a posição entre todos os .ofx da pasta (inclusive os pulados).
+    # O pulado aparece quando é lido, que pode ser antes do resultado do arquivo anterior
+    linhas = sorted(linhas)
+    assert [linha.split("]")[0] + "]" for linha in linhas] == ["[1/4]", "[2/4]", "[3/4]", "[4/4]"]
+    assert "a_bb.ofx: 30 lançamentos (Banco do Brasil" in linhas[0]
+    assert "b_desconhecido.ofx: ERRO banco não reconhecido" in linhas[1]
+    assert "c_c6.ofx: 20 lançamentos (C6" in linhas[2]
+    assert "d_cortado.ofx: ERRO" in linhas[3]
+
+
+def test_dry_run_com_o_banco_informado_importa_todos(pasta):
+    linhas = []
+    resumo = importar_pasta(str(pasta), "ana", banco="Banco do Brasil", max_processos=1, dry_run=True, regras_usuario={}, progresso=linhas.append)
+    assert resumo["lancamentos"] == 55
+    assert [erro["arquivo"] for erro in resumo["erros"]] == [str(pasta / "d_cortado.ofx")]
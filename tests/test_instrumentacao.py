@@ -0,0 +1,18 @@
+import tracemalloc
+
+from instrumentacao import Medicoes
+
+
+def test_tracemalloc_so_para_quando_nenhuma_sessao_detalhada_mede():
+    primeira, segunda = Medicoes(detalhado=True), Medicoes(detalhado=True)
+    primeira.encerrar()
+    assert tracemalloc.is_tracing()
+    assert segunda.resumo()["pico_memoria_mb"] is not None
+    segunda.encerrar()
+    assert not tracemalloc.is_tracing()
+
+
+def test_resumo_sempre_tem_bytes_e_pico():
+    resumo = Medicoes().resumo()
+    assert resumo["bytes"] == 0
+    assert resumo["pico_memoria_mb"] is None
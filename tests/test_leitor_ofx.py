@@ -0,0 +1,88 @@
+import io
+import re
+
+import pandas as pd
+import pytest
+
+from benchmarks.gerador_ofx import gerar_ofx
+from leitor_ofx import ler_extrato, ler_transacoes
+
+BLOCOS = [64 * 1024, 1000, 37]
+
+
+def transacoes_tag_a_tag(conteudo):
+    # Referência simples: o arquivo inteiro na memória, campo a campo de cada <STMTTRN>
+    texto = conteudo.decode("latin1")
+    transacoes = []
+    for bloco in re.findall(r"<STMTTRN>(.*?)</STMTTRN>", texto, re.S):
+        campos = dict(re.findall(r"<([A-Z]+)>([^<]*)", bloco))
+        transacoes.append((campos.get("FITID", "").strip(), campos["TRNAMT"].strip(), campos.get("MEMO", "").strip()))
+    return transacoes
+
+
+def lidas(conteudo, tamanho_bloco):
+    return [(t["fitid"] or "", f"{t['valor']:.2f}", t["memo"]) for t in ler_transacoes(io.BytesIO(conteudo), tamanho_bloco)]
+
+
+def trocar_ordem(transacao):
+    # Mesma transação com os campos em outra ordem (MEMO antes de TRNAMT, FITID por último)
+    campos = re.findall(r"<([A-Z]+)>([^<]*)", transacao)
+    ordem = ["MEMO", "TRNTYPE", "DTPOSTED", "TRNAMT", "CHECKNUM", "FITID"]
+    campos.sort(key=lambda campo: ordem.index(campo[0]) if campo[0] in ordem else len(ordem))
+    return "".join(f"<{tag}>{texto}" for tag, texto in campos if tag != "STMTTRN")
+
+
+@pytest.mark.parametrize("tamanho_bloco", BLOCOS)
+def test_transacoes_posteriores_com_outra_ordem_de_tags(tamanho_bloco):
+    # Grande o bastante para os blocos de 64 KiB também passarem pela leitura rápida, por formato
+    original = gerar_ofx("BB", 2000).decode("latin1")
+    transacoes = re.findall(r"<STMTTRN>(.*?)</STMTTRN>", original, re.S)
+    # A primeira define o formato; a partir da décima, metade das transações vem com outra ordem
+    alteradas = [
+        trocar_ordem(transacao) if posicao >= 10 and posicao % 2 else transacao
+        for posicao, transacao in enumerate(transacoes)
+    ]
+    inicio, fim = original.index("<STMTTRN>"), original.rindex("</STMTTRN>") + len("</STMTTRN>")
+    corpo = "".join(f"<STMTTRN>{transacao}</STMTTRN>" for transacao in alteradas)
+    conteudo = (original[:inicio] + corpo + original[fim:]).encode("latin1")
+    esperadas = transacoes_tag_a_tag(conteudo)
+    assert len(esperadas) == 2000
+    assert lidas(conteudo, tamanho_bloco) == esperadas
+
+
+@pytest.mark.parametrize("tamanho_bloco", BLOCOS)
+def test_transacao_posterior_sem_campo_ou_com_campo_a_mais(tamanho_bloco):
+    conteudo = gerar_ofx("BB", 2000)
+    # Perto do fim, uma transação sem FITID e outras com um campo que a primeira não tem
+    final = conteudo.rindex(b"<STMTTRN>", 0, conteudo.rindex(b"<STMTTRN>"))
+    final = conteudo.rindex(b"<STMTTRN>", 0, final)
+    trecho = re.sub(rb"<FITID>\d+\n<CHECKNUM>(\d+)", rb"<CHECKNUM>\1", conteudo[final:], count=1)
+    conteudo = conteudo[:final] + trecho.replace(b"<CHECKNUM>", b"<NAME>fulano\n<CHECKNUM>", 2)
+    lidas_agora = lidas(conteudo, tamanho_bloco)
+    assert lidas_agora == transacoes_tag_a_tag(conteudo)
+    assert sum(1 for fitid, _, _ in lidas_agora if not fitid) == 1
+
+
+def test_ler_extrato_igual_a_ler_transacoes():
+    conteudo = gerar_ofx("C6", 500)
+    extrato = ler_extrato(io.BytesIO(conteudo), 1000)
+    esperado = pd.DataFrame(list(ler_transacoes(io.BytesIO(conteudo))))
+    esperado["data"] = pd.to_datetime(esperado["data"])
+    pd.testing.assert_frame_equal(extrato, esperado)
+
+
+@pytest.mark.parametrize("leitor", [ler_extrato, lambda arquivo, tamanho: list(ler_transacoes(arquivo, tamanho))])
+@pytest.mark.parametrize("tamanho_bloco", BLOCOS)
+def test_arquivo_que_nao_e_ofx(leitor, tamanho_bloco):
+    for conteudo in (b"Data,Descricao,Valor\n01/01/2024,Padaria,-10.00\n", b"", "<html><body>erro</body></html>".encode()):
+        with pytest.raises(ValueError, match="não é um arquivo OFX"):
+            leitor(io.BytesIO(conteudo), tamanho_bloco)
+
+
+@pytest.mark.parametrize("leitor", [ler_extrato, lambda arquivo, tamanho: list(ler_transacoes(arquivo, tamanho))])
+@pytest.mark.parametrize("tamanho_bloco", BLOCOS)
+def test_arquivo_cortado(leitor, tamanho_bloco):
+    conteudo = gerar_ofx("BB", 200)
+    for corte in (len(conteudo) // 2, conteudo.rindex(b"</STMTTRN>"), conteudo.rindex(b"</OFX>")):
+        with pytest.raises(ValueError, match="incompleto"):
+            leitor(io.BytesIO(conteudo[:corte]), tamanho_bloco)
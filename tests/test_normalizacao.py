@@ -0,0 +1,40 @@
+import random
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from normalizacao import _BRANCOS_UNICODE, normalizar_descricao, normalizar_serie
+
+EXEMPLOS = [
+    "pix  enviado  0205 1020 ipva sefaz rsmemo",
+    "compra com cartao 1505 1930 supermercado memo",
+    "Pix - Enviado - 28/09 17:38 Farmácia São João",
+    "TED 10h20 RS MEMO Ação  ",
+    " PAGAMENTO BOLETO 20240501\tENERGIA\n",
+    "ﬁnanciamento ½ 12345678901 - - -",
+    "",
+]
+
+
+def test_normalizar_serie_igual_a_funcao_escalar():
+    serie = pd.Series(EXEMPLOS + [None, np.nan, 1234], index=range(10, 20), dtype=object)
+    pd.testing.assert_series_equal(normalizar_serie(serie), serie.map(normalizar_descricao))
+
+
+def test_normalizar_serie_igual_em_textos_aleatorios():
+    # Acentos, ligaduras, dígitos de outros alfabetos e espaços do Unicode, que o RE2 trata diferente do Python
+    gerador = random.Random(5)
+    pedacos = list("aAbZ09 -:h\t\n\x0b\x1c\x85\xa0 　çÇãÉİßẞﬁ½²٣/.") + [
+        "memo", "rs memo", "rsmemo", "RS MEMO", "10:20", "10h20", "20240501", "1234", "12345678901", " - ",
+    ]
+    textos = ["".join(gerador.choice(pedacos) for _ in range(gerador.randint(0, 14))) for _ in range(20_000)]
+    serie = pd.Series(textos, dtype=object)
+    pd.testing.assert_series_equal(normalizar_serie(serie), serie.map(normalizar_descricao))
+
+
+def test_brancos_unicode_sao_os_do_python():
+    caracteres = [chr(codigo) for codigo in range(0x110000) if not 0xD800 <= codigo <= 0xDFFF]
+    casados = pc.match_substring_regex(pa.array(caracteres), _BRANCOS_UNICODE).to_pylist()
+    assert {c for c, casou in zip(caracteres, casados) if casou} == {c for c in caracteres if c.isspace()} - {" "}
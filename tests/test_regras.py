@@ -0,0 +1,84 @@
+import multiprocessing
+from contextlib import closing
+
+import pandas as pd
+
+import regras
+from regras import _conectar, _versao, carregar_regras_usuario, salvar_regras_usuario
+
+
+def lancamentos(*pares):
+    return pd.DataFrame({
+        "Tipo Lançamento": "Pix",
+        "Descrição": [descricao for descricao, _ in pares],
+        "Tag": [tag for _, tag in pares],
+    })
+
+
+def versao(caminho, usuario):
+    with closing(_conectar(caminho)) as conexao:
+        return _versao(conexao, usuario)
+
+
+def test_regras_do_csv_antigo_entram_uma_vez(monkeypatch, tmp_path):
+    csv = tmp_path / "categorias.csv"
+    csv.write_text("descricao,tag\nPIX Padaria,Alimentação\nuber trip,Transporte\n", encoding="utf-8")
+    monkeypatch.setattr(regras, "CSV_LEGADO", str(csv))
+    caminho = str(tmp_path / "regras.sqlite3")
+
+    assert carregar_regras_usuario("ana", caminho) == {"pix padaria": "Alimentação", "uber trip": "Transporte"}
+    assert versao(caminho, "ana") == 1
+    # Mudanças no CSV (ou uma regra apagada pelo usuário) não trazem o CSV de volta
+    csv.write_text("descricao,tag\nfarmacia,Saúde\n", encoding="utf-8")
+    salvar_regras_usuario("ana", lancamentos(("Mercado", "Mercado")), caminho)
+    regras_ana = carregar_regras_usuario("ana", caminho)
+    assert "farmacia" not in regras_ana and regras_ana["pix mercado"] == "Mercado"
+    # Cada usuário novo parte do CSV do momento em que entrou
+    assert carregar_regras_usuario("bia", caminho) == {"farmacia": "Saúde"}
+
+
+def test_versao_muda_a_cada_alteracao(monkeypatch, tmp_path):
+    monkeypatch.setattr(regras, "CSV_LEGADO", str(tmp_path / "sem_csv.csv"))
+    caminho = str(tmp_path / "regras.sqlite3")
+    assert carregar_regras_usuario("ana", caminho) == {}
+    assert versao(caminho, "ana") == 1
+
+    assert salvar_regras_usuario("ana", lancamentos(("Padaria", "Alimentação"), ("Uber", "Transporte")), caminho) == 2
+    assert versao(caminho, "ana") == 2
+    # Nada mudou: sem gravação e sem versão nova
+    assert salvar_regras_usuario("ana", lancamentos(("Padaria", "Alimentação")), caminho) == 0
+    assert versao(caminho, "ana") == 2
+    assert salvar_regras_usuario("ana", lancamentos(("Padaria", "Lazer")), caminho) == 1
+    assert versao(caminho, "ana") == 3
+    assert carregar_regras_usuario("ana", caminho) == {"pix padaria": "Lazer", "pix uber": "Transporte"}
+
+    # Gravação por outra conexão (outro processo do app): o cache do processo é relido pela versão
+    with closing(_conectar(caminho)) as conexao:
+        regras._gravar(conexao, "ana", {"pix uber": "Viagem"})
+    assert versao(caminho, "ana") == 4
+    assert carregar_regras_usuario("ana", caminho)["pix uber"] == "Viagem"
+
+
+def _gravar_varias(caminho, prefixo, quantidade):
+    # Roda em outro processo, com a sua própria conexão ao mesmo arquivo
+    regras.CSV_LEGADO = ""
+    for numero in range(quantidade):
+        salvar_regras_usuario("ana", lancamentos((f"{prefixo} {numero}", "Outros")), caminho)
+
+
+def test_gravacoes_concorrentes_nao_perdem_regras(monkeypatch, tmp_path):
+    monkeypatch.setattr(regras, "CSV_LEGADO", "")
+    caminho = str(tmp_path / "regras.sqlite3")
+    carregar_regras_usuario("ana", caminho)
+    quantidade = 25
+    contexto = multiprocessing.get_context("spawn")
+    processos = [contexto.Process(target=_gravar_varias, args=(caminho, prefixo, quantidade)) for prefixo in ("loja", "mercado")]
+    for processo in processos:
+        processo.start()
+    for processo in processos:
+        processo.join(60)
+        assert processo.exitcode == 0
+
+    regras_ana = carregar_regras_usuario("ana", caminho)
+    assert len(regras_ana) == 2 * quantidade
+    assert versao(caminho, "ana") == 1 + 2 * quantidade
@@ -0,0 +1,45 @@
+import pandas as pd
+
+from compactacao import compactar_historico
+from resumos import SEM_VALOR, ResumoMensal
+
+
+def historico_exemplo():
+    return compactar_historico(pd.DataFrame({
+        "Banco": ["BB", "BB", "C6", "C6"],
+        "Data": pd.to_datetime(["2024-01-05", "2024-01-20", "2024-02-01", "2024-02-03"]),
+        "Tipo Lançamento": ["Pix", "Pix", "Compra", "Compra"],
+        "Descrição": ["mercado central", "salario", "padaria", "farmacia"],
+        "Valor": [-10.0, 25.5, -3.0, -7.25],
+        "Tag": ["Mercado", "Salário", None, "Saúde"],
+    }, index=pd.Index([1, 2, 3, 4], name="id")))
+
+
+def mesma_tabela(resumo, esperado):
+    pd.testing.assert_frame_equal(resumo.tabela.sort_index(), esperado.tabela.sort_index(), check_dtype=False)
+
+
+def test_adicionar_aos_poucos_da_o_mesmo_resumo_do_historico_inteiro():
+    historico = historico_exemplo()
+    resumo = ResumoMensal()
+    resumo.adicionar(historico.iloc[:1])
+    resumo.adicionar(historico.iloc[1:])
+    mesma_tabela(resumo, ResumoMensal(historico))
+
+
+def test_remover_tira_a_chave_que_fica_sem_lancamentos():
+    historico = historico_exemplo()
+    resumo = ResumoMensal(historico)
+    # A linha sem tag entra como SEM_VALOR e sai do resumo como qualquer outra
+    resumo.remover(historico.loc[[1, 3]])
+    mesma_tabela(resumo, ResumoMensal(historico.drop(index=[1, 3])))
+    assert SEM_VALOR not in resumo.tabela.index.get_level_values("Tag")
+    assert resumo.tabela["Quantidade"].sum() == 2
+
+
+def test_adicionar_e_remover_vazio_nao_muda_o_resumo():
+    historico = historico_exemplo()
+    resumo = ResumoMensal(historico)
+    resumo.adicionar(historico.iloc[:0])
+    resumo.remover(historico.iloc[:0])
+    mesma_tabela(resumo, ResumoMensal(historico))
@@ -0,0 +1,42 @@
+import pandas as pd
+import pytest
+
+import similaridade
+from categorizacao import Categorizador
+from similaridade import LIMIAR_CONFIANCA, IndiceSimilaridade
+
+EXEMPLOS = {
+    "pix enviado padaria pao quente 1235": "Alimentação",
+    "pix enviado padaria pao doce": "Lazer",
+    "pix enviado posto pao quente": "Lazer",
+}
+
+
+def test_quase_copia_vence_vizinhos_medianos(monkeypatch):
+    consulta = ["pix enviado padaria pao quente 1234"]
+    # Pela votação, os dois vizinhos de ~0,73 somam mais que a quase cópia de ~0,94
+    monkeypatch.setattr(similaridade, "SIMILARIDADE_QUASE_IGUAL", 1.1)
+    tags, _ = IndiceSimilaridade(EXEMPLOS).sugerir(consulta)
+    assert list(tags) == ["Lazer"]
+
+    monkeypatch.undo()
+    tags, confiancas = IndiceSimilaridade(EXEMPLOS).sugerir(consulta)
+    assert list(tags) == ["Alimentação"]
+    assert confiancas[0] == pytest.approx(0.941, abs=1e-3)
+
+
+def test_sem_quase_copia_vale_a_votacao():
+    tags, confiancas = IndiceSimilaridade(EXEMPLOS).sugerir(["pix enviado posto pao doce"])
+    assert list(tags) == ["Lazer"]
+    assert confiancas[0] < similaridade.SIMILARIDADE_QUASE_IGUAL
+
+
+def test_sugestao_com_pouca_confianca_fica_em_outros():
+    indice = IndiceSimilaridade(EXEMPLOS)
+    descricoes = pd.Series(["PIX ENVIADO PADARIA PAO QUENTE 1234", "PIX ENVIADO FARMACIA SAO JOAO", "TED RECEBIDA"])
+    _, confiancas = indice.sugerir([descricao.lower() for descricao in descricoes])
+    assert confiancas[0] >= LIMIAR_CONFIANCA > confiancas[1]
+
+    tags, confiancas = Categorizador(categorias={}, indice=indice).categorizar_com_confianca(descricoes)
+    assert list(tags) == ["Alimentação", "Outros", "Outros"]
+    assert confiancas.iloc[0] >= similaridade.SIMILARIDADE_QUASE_IGUAL and confiancas.iloc[1:].isna().all()